@@ -1,9 +1,15 @@
 import os
 import google.generativeai as genai
-from models import RiceListing, MarketAnalysis, User, db
+from market_stats import market_summary
+from snapshot_cache import snapshot_cache
+from response_cache import response_cache
+from sse import text_tokens
+from intents import match as match_intent
+from price_history import recent_closes, trend_from_closes, forecast_from_closes
+from price_model import get_model
 import json
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # Configure Gemini AI
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
@@ -13,41 +19,46 @@ else:
     print("Warning: GOOGLE_API_KEY not found")
 
 def get_real_time_market_data():
+    """Get real-time market data, shared across workers until a listing changes"""
+    return snapshot_cache.get_or_compute('market_data', _compute_market_data)
+
+def _compute_market_data():
     """Get real-time market data from database and external sources"""
     try:
-        # Get current listings from database
-        listings = RiceListing.query.filter_by(is_available=True).all()
+        summary = market_summary()
+        closes = recent_closes()
         market_data = {}
         
         rice_types = ['Basmati', 'Sona Masoori', 'Ponni', 'Brown Rice', 'Jasmine', 'Parboiled']
         
         for rice_type in rice_types:
-            type_listings = [l for l in listings if l.rice_type == rice_type]
+            totals = summary.get(rice_type)
             
-            if type_listings:
-                prices = [l.price_per_kg for l in type_listings]
-                avg_price = sum(prices) / len(prices)
-                max_price = max(prices)
-                min_price = min(prices)
+            if totals:
+                avg_price = totals['average_price']
+                max_price = totals['max_price']
+                min_price = totals['min_price']
                 
-                # Calculate trend based on recent price variations
-                recent_trend = 'stable'
-                if max_price - min_price > avg_price * 0.1:
-                    recent_trend = 'volatile'
-                elif avg_price > 55:
-                    recent_trend = 'increasing'
-                elif avg_price < 40:
-                    recent_trend = 'decreasing'
+                # Trend from daily price history; without history, guess from current prices
+                recent_trend = trend_from_closes(closes.get(rice_type))
+                if recent_trend is None:
+                    recent_trend = 'stable'
+                    if max_price - min_price > avg_price * 0.1:
+                        recent_trend = 'volatile'
+                    elif avg_price > 55:
+                        recent_trend = 'increasing'
+                    elif avg_price < 40:
+                        recent_trend = 'decreasing'
                 
-                demand_level = 'high' if len(type_listings) > 5 else 'medium' if len(type_listings) > 2 else 'low'
+                demand_level = 'high' if totals['listings_count'] > 5 else 'medium' if totals['listings_count'] > 2 else 'low'
                 
                 market_data[rice_type] = {
                     'current_price': round(avg_price, 2),
                     'price_range': f"₹{min_price}-{max_price}",
                     'trend': recent_trend,
                     'demand': demand_level,
-                    'listings_count': len(type_listings),
-                    'total_quantity': sum(l.quantity for l in type_listings),
+                    'listings_count': totals['listings_count'],
+                    'total_quantity': totals['total_quantity'],
                     'last_updated': datetime.now().strftime('%H:%M')
                 }
             else:
@@ -73,84 +84,120 @@ def get_real_time_market_data():
 
 def get_ai_response(message, user):
     """Get real-time AI response using Gemini API with live market data"""
+    return ''.join(stream_ai_response(message, user))
+
+def stream_ai_response(message, user):
+    """
+    Yield the AI response in pieces as Gemini generates them
+    
+    Falls back to the live-data response, cut into tokens the same way, when
+    the API is not configured, fails or returns no text before sending
+    anything. Both paths share one market snapshot.
+    
+    Raises:
+        Exception: Gemini failed after part of the answer was sent; the
+            partial answer must not be saved as if it were complete
+    """
+    market_data = get_real_time_market_data()
+    sent = False
     try:
-        if not GOOGLE_API_KEY:
-            return get_dynamic_fallback_response(message, user)
-            
-        # Initialize the model
-        model = genai.GenerativeModel('gemini-pro')
-        
-        # Get real-time market data
-        market_data = get_real_time_market_data()
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')
-        
-        # Create comprehensive real-time context
-        context = f"""
-        You are an expert AI assistant for GreenBridge, India's premier rice trading platform.
-        Current Time: {current_time}
-        
-        User Profile:
-        - Name: {user.full_name}
-        - Type: {user.user_type.title()}
-        - Location: {user.location}
-        
-        LIVE MARKET DATA (Real-time as of {current_time}):
-        {json.dumps(market_data, indent=2)}
-        
-        Your expertise includes:
-        - Real-time rice price analysis and market forecasting
-        - Live market trend interpretation with current data
-        - Quality grading and assessment guidance
-        - Regional market condition analysis
-        - Storage, handling, and trading best practices
-        - Seasonal patterns and monsoon impact analysis
-        - Export/import trends and government policy effects
-        - Supply chain optimization and logistics
-        
-        Instructions:
-        - Use ONLY the live market data provided above for price information
-        - Provide specific, actionable advice based on current real-time conditions
-        - Include actual current prices and trends from the live data
-        - Give location-specific advice when relevant to {user.location}
-        - Use practical language suitable for farmers and traders
-        - Include confidence levels for predictions when making forecasts
-        - Suggest optimal timing for buying/selling based on current trends
-        - Reference specific rice varieties and their current market performance
-        
-        User Question: {message}
-        
-        Provide a comprehensive, data-driven response using the real-time market information.
-        """
-        
-        # Generate response
-        response = model.generate_content(context)
-        return response.text
-        
+        if GOOGLE_API_KEY:
+            # Initialize the model
+            model = genai.GenerativeModel('gemini-pro')
+            for chunk in model.generate_content(_chat_prompt(message, user, market_data), stream=True):
+                text = _chunk_text(chunk)
+                if text:
+                    sent = True
+                    yield text
+            if sent:
+                return
     except Exception as e:
         print(f"Error generating AI response: {e}")
-        return get_dynamic_fallback_response(message, user)
+        if sent:
+            raise
+    yield from text_tokens(get_dynamic_fallback_response(message, user, market_data))
 
-def get_dynamic_fallback_response(message, user):
-    """Generate dynamic responses with real market data when AI API unavailable"""
-    market_data = get_real_time_market_data()
+def _chunk_text(chunk):
+    """
+    Text of one streamed Gemini chunk
+    
+    chunk.text raises ValueError for chunks without text parts, such as the
+    last chunk carrying only a finish reason or a blocked prompt's feedback.
+    """
+    if not chunk.candidates:
+        return ''
+    return ''.join(part.text for part in chunk.candidates[0].content.parts)
+
+def _chat_prompt(message, user, market_data):
+    """Chat prompt with the user's profile and live market data"""
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S IST')
+    
+    # Create comprehensive real-time context
+    context = f"""
+    You are an expert AI assistant for GreenBridge, India's premier rice trading platform.
+    Current Time: {current_time}
+    
+    User Profile:
+    - Name: {user.full_name}
+    - Type: {user.user_type.title()}
+    - Location: {user.location}
+    
+    LIVE MARKET DATA (Real-time as of {current_time}):
+    {json.dumps(market_data, indent=2)}
+    
+    Your expertise includes:
+    - Real-time rice price analysis and market forecasting
+    - Live market trend interpretation with current data
+    - Quality grading and assessment guidance
+    - Regional market condition analysis
+    - Storage, handling, and trading best practices
+    - Seasonal patterns and monsoon impact analysis
+    - Export/import trends and government policy effects
+    - Supply chain optimization and logistics
+    
+    Instructions:
+    - Use ONLY the live market data provided above for price information
+    - Provide specific, actionable advice based on current real-time conditions
+    - Include actual current prices and trends from the live data
+    - Give location-specific advice when relevant to {user.location}
+    - Use practical language suitable for farmers and traders
+    - Include confidence levels for predictions when making forecasts
+    - Suggest optimal timing for buying/selling based on current trends
+    - Reference specific rice varieties and their current market performance
+    
+    User Question: {message}
+    
+    Provide a comprehensive, data-driven response using the real-time market information.
+    """
+    
+    return context
+
+def get_dynamic_fallback_response(message, user, market_data=None):
+    """
+    Generate dynamic responses with real market data when AI API unavailable
+    
+    Intent and rice types come from one pass of the compiled keyword matcher;
+    pass market_data to reuse a snapshot the caller already holds.
+    """
+    if market_data is None:
+        market_data = get_real_time_market_data()
     current_time = datetime.now().strftime('%H:%M')
-    message_lower = message.lower()
+    intent, rice_types = match_intent(message)
     
-    if any(word in message_lower for word in ['price', 'cost', 'rate', 'किमत', 'ధర']):
-        # Extract rice type from message
-        rice_type = next((rice for rice in market_data.keys() if rice.lower() in message_lower), 'Basmati')
+    if intent == 'price':
+        rice_type = next((rice for rice in rice_types if rice in market_data), 'Basmati')
         data = market_data.get(rice_type, market_data['Basmati'])
         trend_advice = get_trading_advice(data['trend'], user.user_type)
         
         return f"Live Market Update ({current_time}): {rice_type} is currently ₹{data['current_price']}/kg with {data['trend']} trend and {data['demand']} demand. Range: {data['price_range']}. {trend_advice} Based on {data['listings_count']} active listings."
     
-    elif any(word in message_lower for word in ['trend', 'market', 'analysis', 'बाजार', 'మార్కెట్']):
+    elif intent == 'market':
         best_performer = max(market_data.items(), key=lambda x: x[1]['current_price'])
         worst_performer = min(market_data.items(), key=lambda x: x[1]['current_price'])
         
         return f"Live Market Analysis ({current_time}): {best_performer[0]} leads at ₹{best_performer[1]['current_price']}/kg ({best_performer[1]['trend']}), while {worst_performer[0]} at ₹{worst_performer[1]['current_price']}/kg offers value. {'Focus on premium varieties for better margins.' if user.user_type == 'seller' else 'Consider bulk purchases in stable-priced varieties.'}"
     
-    elif any(word in message_lower for word in ['sell', 'selling', 'बेचना', 'అమ్మకం']):
+    elif intent == 'sell':
         high_demand_rice = [rice for rice, data in market_data.items() if data['demand'] == 'high']
         if high_demand_rice and user.user_type == 'seller':
             rice = high_demand_rice[0]
@@ -159,7 +206,7 @@ def get_dynamic_fallback_response(message, user):
         else:
             return f"Selling Advisory ({current_time}): Monitor market trends for optimal timing. Current high-demand varieties offer best margins. Quality grading significantly impacts final prices."
     
-    elif any(word in message_lower for word in ['buy', 'buying', 'purchase', 'खरीदना', 'కొనుగోలు']):
+    elif intent == 'buy':
         stable_rice = [rice for rice, data in market_data.items() if data['trend'] == 'stable']
         if stable_rice:
             rice = stable_rice[0]
@@ -168,7 +215,7 @@ def get_dynamic_fallback_response(message, user):
         else:
             return f"Buying Advisory ({current_time}): Market shows mixed trends. Monitor price movements before large purchases. Consider splitting orders across multiple suppliers for better rates."
     
-    elif any(word in message_lower for word in ['quality', 'grade', 'grading', 'गुणवत्ता', 'నాణ్యత']):
+    elif intent == 'quality':
         avg_price = sum(data['current_price'] for data in market_data.values()) / len(market_data)
         return f"Quality Assessment ({current_time}): Grade A commands ₹{avg_price * 1.15:.2f}/kg (15% premium), Grade B at ₹{avg_price:.2f}/kg baseline. Key factors: <5% broken grains, 12-14% moisture, minimal impurities. Current market favors premium grades."
     
@@ -192,36 +239,40 @@ def get_trading_advice(trend, user_type):
         return "Stable market - good for planned transactions." if user_type == 'buyer' else "Consistent pricing for regular sales."
 
 def get_market_analysis():
+    """Get comprehensive market analysis, shared across workers until a listing changes"""
+    return snapshot_cache.get_or_compute('market_analysis', _compute_market_analysis)
+
+def _compute_market_analysis():
     """Get comprehensive market analysis"""
     try:
         # Get recent market data from database
         market_data = {}
         
         rice_types = ['Basmati', 'Sona Masoori', 'Ponni', 'Brown Rice']
+        summary = market_summary(rice_types)
+        closes = recent_closes()
         
         for rice_type in rice_types:
-            # Get recent listings for this rice type
-            listings = RiceListing.query.filter_by(
-                rice_type=rice_type, 
-                is_available=True
-            ).all()
+            stats = summary.get(rice_type)
             
-            if listings:
-                prices = [listing.price_per_kg for listing in listings]
-                avg_price = sum(prices) / len(prices)
+            if stats:
+                avg_price = stats['average_price']
+                listings_count = stats['listings_count']
                 
-                # Determine trend (simplified logic)
-                if avg_price > 50:
-                    trend = 'increasing'
-                elif avg_price < 40:
-                    trend = 'decreasing'
-                else:
-                    trend = 'stable'
+                # Determine trend from daily price history, or from price level without history
+                trend = trend_from_closes(closes.get(rice_type))
+                if trend is None:
+                    if avg_price > 50:
+                        trend = 'increasing'
+                    elif avg_price < 40:
+                        trend = 'decreasing'
+                    else:
+                        trend = 'stable'
                 
                 # Determine demand level based on number of listings
-                if len(listings) > 5:
+                if listings_count > 5:
                     demand_level = 'high'
-                elif len(listings) > 2:
+                elif listings_count > 2:
                     demand_level = 'medium'
                 else:
                     demand_level = 'low'
@@ -230,9 +281,11 @@ def get_market_analysis():
                     'average_price': round(avg_price, 2),
                     'price_trend': trend,
                     'demand_level': demand_level,
-                    'total_listings': len(listings),
-                    'total_quantity': sum(listing.quantity for listing in listings),
-                    'insights': f"{rice_type} shows {trend} price trend with {demand_level} demand. {len(listings)} active listings available."
+                    'total_listings': listings_count,
+                    'total_quantity': stats['total_quantity'],
+                    'weekly_trend': closes.get(rice_type, []),
+                    'forecast': forecast_from_closes(closes.get(rice_type)),
+                    'insights': f"{rice_type} shows {trend} price trend with {demand_level} demand. {listings_count} active listings available."
                 }
             else:
                 # Default data if no listings
@@ -271,55 +324,57 @@ def get_market_analysis():
             }
         }
 
-def get_price_prediction(rice_type, quantity):
+def get_price_prediction(rice_type, quantity, grade=None, region=None):
     """Get price prediction for rice type and quantity"""
+    return get_price_predictions([(rice_type, quantity, grade, region)])[0]
+
+def get_price_predictions(items):
+    """
+    Get price predictions for many (rice_type, quantity, grade, region) tuples
+    
+    Results are in the same order as items. All items share one model lookup
+    or, before a model is trained, one market summary query.
+    """
     try:
-        # Get current market data
-        current_listings = RiceListing.query.filter_by(
-            rice_type=rice_type,
-            is_available=True
-        ).all()
+        # Trained model: deterministic and needs no database access
+        model = get_model()
+        if model:
+            return model.predict_many(items)
         
-        if current_listings:
-            current_prices = [listing.price_per_kg for listing in current_listings]
-            base_price = sum(current_prices) / len(current_prices)
-        else:
-            # Default prices if no current data
-            default_prices = {
-                'Basmati': 65,
-                'Sona Masoori': 45,
-                'Ponni': 42,
-                'Brown Rice': 55
-            }
-            base_price = default_prices.get(rice_type, 50)
-        
-        # Apply quantity-based adjustments
-        quantity_factor = 1.0
-        if quantity > 1000:  # Bulk discount
-            quantity_factor = 0.95
-        elif quantity > 5000:
-            quantity_factor = 0.90
-        elif quantity < 50:  # Small quantity premium
-            quantity_factor = 1.05
-        
-        # Add some market volatility (±5%)
-        market_factor = random.uniform(0.95, 1.05)
-        
-        predicted_price = base_price * quantity_factor * market_factor
-        
-        # Calculate confidence based on available data
-        confidence = 0.85 if current_listings else 0.70
-        
-        return {
-            'predicted_price': round(predicted_price, 2),
-            'confidence': confidence,
-            'factors': {
-                'base_price': round(base_price, 2),
-                'quantity_adjustment': f"{((quantity_factor - 1) * 100):+.1f}%",
-                'market_volatility': f"{((market_factor - 1) * 100):+.1f}%"
-            }
+        # No model trained yet: estimate from current market averages
+        summary = market_summary(sorted({item[0] for item in items}))
+        default_prices = {
+            'Basmati': 65,
+            'Sona Masoori': 45,
+            'Ponni': 42,
+            'Brown Rice': 55
         }
         
+        predictions = []
+        for rice_type, quantity, grade, region in items:
+            stats = summary.get(rice_type)
+            base_price = stats['average_price'] if stats else default_prices.get(rice_type, 50)
+            
+            # Apply quantity-based adjustments
+            quantity_factor = 1.0
+            if quantity > 5000:
+                quantity_factor = 0.90
+            elif quantity > 1000:  # Bulk discount
+                quantity_factor = 0.95
+            elif quantity < 50:  # Small quantity premium
+                quantity_factor = 1.05
+            
+            predictions.append({
+                'predicted_price': round(base_price * quantity_factor, 2),
+                # Confidence based on available data
+                'confidence': 0.85 if stats else 0.70,
+                'factors': {
+                    'base_price': round(base_price, 2),
+                    'quantity_adjustment': f"{((quantity_factor - 1) * 100):+.1f}%"
+                }
+            })
+        return predictions
+        
     except Exception as e:
         print(f"Error predicting price: {e}")
         raise e
@@ -340,8 +395,10 @@ def generate_market_insights(rice_type):
         Keep the response concise and practical for farmers and buyers.
         """
         
-        response = model.generate_content(prompt)
-        return response.text
+        # Same prompt for every viewer until the market changes or the entry expires
+        return response_cache.get_or_generate(
+            prompt, lambda: model.generate_content(prompt).text, model='gemini-pro'
+        )
         
     except Exception as e:
         print(f"Error generating market insights: {e}")
@@ -1,6 +1,6 @@
 import os
 import logging
-from flask import Flask
+from flask import Flask, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_babel import Babel
 from flask_login import LoginManager
@@ -18,6 +18,28 @@ db = SQLAlchemy(model_class=Base)
 babel = Babel()
 login_manager = LoginManager()
 
+# The templates are shared with greenbridge_app and name its flat endpoints;
+# these are the blueprint endpoints they resolve to here
+TEMPLATE_ENDPOINTS = {
+    'index': 'main.index',
+    'set_language': 'main.set_language',
+    'register': 'auth.register',
+    'login': 'auth.login',
+    'logout': 'auth.logout',
+    'buyer_dashboard': 'buyer.dashboard',
+    'search': 'buyer.search',
+    'seller_dashboard': 'seller.dashboard',
+    'new_listing': 'seller.new_listing',
+    'chat': 'ai.chat',
+    'market_analysis': 'ai.market_analysis',
+}
+
+def build_template_endpoint(error, endpoint, values):
+    """url_for fallback mapping the templates' flat endpoint names to blueprints"""
+    if endpoint not in TEMPLATE_ENDPOINTS:
+        raise error
+    return url_for(TEMPLATE_ENDPOINTS[endpoint], **values)
+
 def create_app():
     """Application factory pattern"""
     app = Flask(__name__)
@@ -69,11 +91,18 @@ def create_app():
     with app.app_context():
         # Import models here to avoid circular imports
         import models
+        # Queue users without coordinates for background geocoding
+        import geocoding
+        # Keep market aggregates and price history in step with listing writes
+        import market_stats
+        import grid_stats
+        import price_history
         db.create_all()
         logging.info("Database tables created successfully")
         
         # Create sample data for demo
         models.create_sample_data()
+        market_stats.ensure_aggregates()
     
     # Register blueprints
     from routes import main_bp, auth_bp, buyer_bp, seller_bp, ai_bp
@@ -82,6 +111,11 @@ def create_app():
     app.register_blueprint(buyer_bp, url_prefix='/buyer')
     app.register_blueprint(seller_bp, url_prefix='/seller')
     app.register_blueprint(ai_bp, url_prefix='/ai')
+    app.url_build_error_handlers.append(build_template_endpoint)
+    
+    # CLI commands
+    from commands import register_commands
+    register_commands(app)
     
     # Context processors
     @app.context_processor
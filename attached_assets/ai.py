@@ -1,11 +1,15 @@
 from flask import Blueprint, render_template, request, jsonify, session
 from datetime import datetime, timedelta
 from ..models import *
+from ..ai_service import get_price_prediction
+from ..response_cache import response_cache
 import json
 import numpy as np
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
 import os
 import logging
+import time
 
 # Import Gemini AI client libraries
 import google.generativeai as genai
@@ -17,7 +21,8 @@ if not GEMINI_API_KEY:
     raise EnvironmentError("GEMINI_API_KEY environment variable not set")
 
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro-latest')
+GEMINI_MODEL = 'gemini-1.5-pro-latest'
+model = genai.GenerativeModel(GEMINI_MODEL)
 
 # Set up safety settings
 safety_settings = {
@@ -33,12 +38,32 @@ logger = logging.getLogger(__name__)
 
 bp = Blueprint('ai', __name__, url_prefix='/ai')
 
-def call_gemini(prompt: str, max_retries=3) -> str:
+GEMINI_FAILURE_MESSAGE = "I'm experiencing technical difficulties. Please try again later."
+
+# Per-rice-type insight calls run in parallel on a bounded pool
+INSIGHT_WORKERS = int(os.environ.get('INSIGHT_WORKERS', '5'))
+INSIGHT_DEADLINE_SECONDS = float(os.environ.get('INSIGHT_DEADLINE_SECONDS', '8'))
+# Total time one insight call may take, retries included; calls past the page
+# deadline can still finish within this and fill the cache
+INSIGHT_CALL_DEADLINE_SECONDS = float(os.environ.get('INSIGHT_CALL_DEADLINE_SECONDS', '15'))
+insight_executor = ThreadPoolExecutor(max_workers=INSIGHT_WORKERS, thread_name_prefix='insights')
+
+def call_gemini(prompt: str, max_retries=3, deadline=None) -> str:
     """
     Send a prompt to Gemini AI and return the generated text
     with enhanced error handling and retry logic
+    
+    With a deadline (seconds), each attempt's request timeout is the time
+    left, and no attempt starts once it has passed.
     """
+    deadline_at = time.monotonic() + deadline if deadline else None
     for attempt in range(max_retries):
+        request_options = None
+        if deadline_at is not None:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            request_options = {'timeout': remaining}
         try:
             response = model.generate_content(
                 prompt,
@@ -47,7 +72,8 @@ def call_gemini(prompt: str, max_retries=3) -> str:
                     temperature=0.4,
                     top_p=0.95,
                     top_k=40
-                )
+                ),
+                request_options=request_options
             )
             return response.text.strip()
         
@@ -57,7 +83,20 @@ def call_gemini(prompt: str, max_retries=3) -> str:
                 print("sss")# Wait before retrying
     
     logger.error("All Gemini attempts failed. Using fallback response")
-    return "I'm experiencing technical difficulties. Please try again later."
+    return GEMINI_FAILURE_MESSAGE
+
+def cached_gemini(prompt: str, deadline=None) -> str:
+    """
+    call_gemini through the shared response cache
+    
+    Identical prompts are answered from the cache until the market snapshot
+    changes or the entry expires; failed calls are not cached.
+    """
+    def generate():
+        text = call_gemini(prompt, deadline=deadline)
+        return None if text == GEMINI_FAILURE_MESSAGE else text
+
+    return response_cache.get_or_generate(prompt, generate, model=GEMINI_MODEL) or GEMINI_FAILURE_MESSAGE
 
 @bp.route('/chat', methods=['GET', 'POST'])
 def chat():
@@ -141,9 +180,8 @@ def price_prediction():
     if not all([rice_type, quantity]):
         return jsonify({'error': 'Rice type and quantity are required'}), 400
 
-    # Get historical data for prediction
-    historical_data = RiceListing.query.filter_by(rice_type=rice_type).all()
-    predicted_price = predict_price(rice_type, float(quantity), historical_data)
+    grade = data.get('grade')
+    predicted_price = predict_price(rice_type, float(quantity), grade=grade, region=region)
 
     # Generate comprehensive report with Gemini
     insights_prompt = (
@@ -161,7 +199,7 @@ def price_prediction():
     )
     
     try:
-        full_report = call_gemini(insights_prompt)
+        full_report = cached_gemini(insights_prompt)
     except Exception as e:
         logger.error(f"Prediction report error: {str(e)}")
         full_report = f"Predicted price: ₹{predicted_price:.2f}/kg for {quantity}kg of {rice_type}. Detailed analysis unavailable."
@@ -172,9 +210,35 @@ def price_prediction():
     })
 
 
-def analyze_market_trends(listings):
-    """Analyze market trends from recent listings and generate AI-driven insights"""
+def _insight_prompt(rice_type, avg_price, price_trend, transactions):
+    return (
+        f"Generate farmer-friendly market analysis for {rice_type} rice:\n"
+        f"- Current average price: ₹{avg_price:.2f}/kg\n"
+        f"- Price trend: {price_trend}\n"
+        f"- Total recent transactions: {transactions}\n\n"
+        "Include:\n"
+        "1. Practical implications for farmers\n"
+        "2. Cost-benefit analysis\n"
+        "3. Regional price variations\n"
+        "4. Recommended actions\n"
+        "5. Market outlook (next 3 months)\n"
+        "6. Alternative crop suggestions\n"
+        "Format in clear bullet points."
+    )
+
+def analyze_market_trends(listings, deadline=INSIGHT_DEADLINE_SECONDS):
+    """
+    Analyze market trends from recent listings and generate AI-driven insights
+    
+    Insight calls for all rice types run concurrently, so the page waits about
+    as long as the slowest call, capped at `deadline` seconds. Rice types whose
+    call has not finished by then get the plain summary. Calls already running
+    may finish within INSIGHT_CALL_DEADLINE_SECONDS and fill the response cache
+    for the next request; calls still queued behind other requests are
+    cancelled, so a backlog never outlives the pages that asked for it.
+    """
     analysis = defaultdict(dict)
+    pending = {}
     
     for rice_type in ['Basmati', 'Sona Masoori', 'Ponni', 'Brown Rice', 'Jasmine']:
         type_listings = [l for l in listings if l.rice_type == rice_type]
@@ -182,7 +246,6 @@ def analyze_market_trends(listings):
             continue
 
         prices = [l.price_per_kg for l in type_listings]
-        quantities = [l.quantity for l in type_listings]
         
         avg_price = np.mean(prices) if prices else 0
         price_trend = 'stable'
@@ -192,53 +255,28 @@ def analyze_market_trends(listings):
             elif prices[-1] < prices[0]:
                 price_trend = 'decreasing'
 
-        # Generate AI insights using Gemini
-        prompt = (
-            f"Generate farmer-friendly market analysis for {rice_type} rice:\n"
-            f"- Current average price: ₹{avg_price:.2f}/kg\n"
-            f"- Price trend: {price_trend}\n"
-            f"- Total recent transactions: {len(type_listings)}\n\n"
-            "Include:\n"
-            "1. Practical implications for farmers\n"
-            "2. Cost-benefit analysis\n"
-            "3. Regional price variations\n"
-            "4. Recommended actions\n"
-            "5. Market outlook (next 3 months)\n"
-            "6. Alternative crop suggestions\n"
-            "Format in clear bullet points."
-        )
-        try:
-            insights = call_gemini(prompt)
-        except Exception:
-            insights = f"{rice_type} market: ₹{avg_price:.2f}/kg ({price_trend} trend). Detailed analysis unavailable."
-
         analysis[rice_type] = {
             'average_price': round(avg_price, 2),
             'price_trend': price_trend,
-            'insights': insights
+            'insights': f"{rice_type} market: ₹{avg_price:.2f}/kg ({price_trend} trend). Detailed analysis unavailable."
         }
+        prompt = _insight_prompt(rice_type, avg_price, price_trend, len(type_listings))
+        pending[insight_executor.submit(cached_gemini, prompt, INSIGHT_CALL_DEADLINE_SECONDS)] = rice_type
 
-    return analysis
-
+    done, not_done = wait(pending, timeout=deadline)
+    for future in done:
+        try:
+            analysis[pending[future]]['insights'] = future.result()
+        except Exception as e:
+            logger.error(f"Insight generation failed for {pending[future]}: {str(e)}")
+    if not_done:
+        cancelled = [pending[future] for future in not_done if future.cancel()]
+        logger.warning(f"Insights past the {deadline}s deadline: {', '.join(sorted(pending[f] for f in not_done))}"
+                       f" ({len(cancelled)} never started)")
 
-def predict_price(rice_type, quantity, historical_data):
-    """Enhanced price prediction based on historical data and market factors"""
-    if not historical_data:
-        return 0  # Default price
+    return analysis
 
-    # Calculate weighted average with recent bias
-    weights = np.linspace(1.0, 0.5, len(historical_data))
-    prices = np.array([l.price_per_kg for l in historical_data])
-    avg_price = np.average(prices, weights=weights)
 
-    # Apply quantity adjustment
-    if quantity > 1000:
-        avg_price *= 0.92  # 8% bulk discount
-    elif quantity < 100:
-        avg_price *= 1.08  # 8% small quantity premium
-        
-    # Seasonal adjustment (example: +5% during festival seasons)
-    if datetime.now().month in [9, 10]:  # Festive season
-        avg_price *= 1.05
-        
-    return round(avg_price, 2)
\ No newline at end of file
+def predict_price(rice_type, quantity, grade=None, region=None):
+    """Price prediction from the trained price model, or market averages until one is trained"""
+    return get_price_prediction(rice_type, quantity, grade=grade, region=region)['predicted_price']
@@ -1,12 +1,16 @@
 from flask import Blueprint, render_template, request, session, jsonify, redirect, url_for
 from ..models import RiceListing, User
-import requests
+from ..http_client import http_client, CircuitOpenError
 from flask_login import login_required
 from .. import db
+from sqlalchemy.orm import joinedload
 import math
 
 bp = Blueprint('buyer', __name__, url_prefix='/buyer')
 
+# Overpass is asked to give up after 25 s; stop waiting shortly before that
+OVERPASS_DEADLINE = 20
+
 @bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -15,10 +19,10 @@ def dashboard():
 @bp.route('/search')
 def search():
     rice_type = request.args.get('rice_type')
-    listings = RiceListing.query.filter_by(
-        rice_type=rice_type,
-        is_available=True
-    ).all() if rice_type else RiceListing.query.filter_by(is_available=True).all()
+    query = RiceListing.query.options(joinedload(RiceListing.seller)).filter_by(is_available=True)
+    if rice_type:
+        query = query.filter_by(rice_type=rice_type)
+    listings = query.all()
 
     # Get buyer's location
     buyer = User.query.get(session.get('user_id'))
@@ -32,7 +36,7 @@ def search():
     # Format listings for map display
     map_listings = []
     for listing in listings:
-        seller = User.query.get(listing.seller_id)
+        seller = listing.seller
         if seller.latitude and seller.longitude:
             map_listings.append({
                 'id': listing.id,
@@ -80,7 +84,7 @@ def nearby_mills():
     """
     
     try:
-        response = requests.post(overpass_url, data=overpass_query)
+        response = http_client.post(overpass_url, data=overpass_query, deadline=OVERPASS_DEADLINE)
         data = response.json()
         
         mills = []
@@ -96,6 +100,8 @@ def nearby_mills():
                 })
         
         return jsonify(mills)
+    except CircuitOpenError:
+        return jsonify({'error': 'Rice mill search is temporarily unavailable'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1 @@
+"""Latency, query count and allocation benchmarks for the hot routes and services"""
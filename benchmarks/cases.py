@@ -0,0 +1,104 @@
+"""
+Benchmark cases for the hot routes and service functions
+
+build_cases(app) returns (name, callable) pairs. Route cases go through the
+Flask test client exactly as a browser would hit them; service cases call the
+function inside their own app context, so every call starts with a fresh
+session just like a request does.
+"""
+from models import User, RiceListing
+from sqlalchemy import func
+
+BUYER_MOBILE = '9000000001'
+PASSWORD = 'password123'
+
+def _client(app, user_id):
+    """Test client already logged in as user_id"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+def _expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+    return response
+
+def build_cases(app):
+    """
+    Build the benchmark cases against a loaded database
+
+    Returns:
+        List of (name, callable) pairs; each callable runs one iteration
+    """
+    from ai_service import (get_real_time_market_data, _compute_market_data,
+                            get_dynamic_fallback_response, get_price_prediction)
+
+    with app.app_context():
+        buyer = User.query.filter_by(mobile_number=BUYER_MOBILE).first()
+        # The seller with the most listings is the slowest dashboard to render
+        seller_id = (
+            RiceListing.query.with_entities(RiceListing.seller_id)
+            .group_by(RiceListing.seller_id)
+            .order_by(func.count(RiceListing.id).desc())
+            .limit(1).scalar()
+        )
+        if buyer is None or seller_id is None:
+            raise RuntimeError("Benchmark database needs the sample buyer and at least one listing")
+        buyer_id, buyer_type = buyer.id, buyer.user_type
+
+    anonymous = app.test_client()
+    as_buyer = _client(app, buyer_id)
+    as_seller = _client(app, seller_id)
+
+    class _Sender:
+        user_type = buyer_type
+
+    def login():
+        _expect(anonymous.post('/auth/login', data={'mobile_number': BUYER_MOBILE, 'password': PASSWORD}), 302)
+
+    def buyer_dashboard():
+        _expect(as_buyer.get('/buyer/dashboard'), 200)
+
+    def seller_dashboard():
+        _expect(as_seller.get('/seller/dashboard'), 200)
+
+    def search():
+        _expect(as_buyer.get('/buyer/search?rice_type=Basmati&max_distance=100'), 200)
+
+    def api_search():
+        _expect(as_buyer.get('/buyer/api/search?rice_type=Basmati&max_distance=100'), 200)
+
+    def find_farmers():
+        _expect(as_buyer.post('/buyer/api/find-farmers',
+                              json={'riceType': 'Sona Masoori', 'quantity': 10, 'unit': 'quintal'}), 200)
+
+    def market_data():
+        with app.app_context():
+            get_real_time_market_data()
+
+    def market_data_uncached():
+        with app.app_context():
+            _compute_market_data()
+
+    def fallback_response():
+        with app.app_context():
+            get_dynamic_fallback_response("What is the price of Basmati today?", _Sender())
+
+    def price_prediction():
+        with app.app_context():
+            get_price_prediction('Basmati', 500, grade='A', region='Telangana')
+
+    return [
+        ('login', login),
+        ('buyer_dashboard', buyer_dashboard),
+        ('seller_dashboard', seller_dashboard),
+        ('search', search),
+        ('api_search', api_search),
+        ('find_farmers', find_farmers),
+        ('market_data', market_data),
+        ('market_data_uncached', market_data_uncached),
+        ('fallback_response', fallback_response),
+        ('price_prediction', price_prediction),
+    ]
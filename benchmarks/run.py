@@ -0,0 +1,295 @@
+"""
+Benchmark runner
+
+    python -m benchmarks.run run --scale small --scale medium
+    python -m benchmarks.run run --scale small --save
+    python -m benchmarks.run compare --scale small --threshold 0.25
+
+Each scale runs in its own process against its own SQLite database under
+instance/, filled once by datagen with a fixed seed and reused afterwards. A
+case is timed over many iterations for p50/p95/p99 latency, then run once more
+to count SQL statements and once under tracemalloc for peak allocation.
+Baselines are JSON files in benchmarks/baselines/, one per scale; compare
+exits non-zero when a case regresses beyond the threshold.
+"""
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import click
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+INSTANCE_DIR = os.path.join(ROOT, 'instance')
+
+SCALES = {
+    'small': {'users': 1000, 'listings': 5000, 'chat_messages': 1000, 'analyses': 50},
+    'medium': {'users': 10000, 'listings': 50000, 'chat_messages': 10000, 'analyses': 200},
+    'large': {'users': 100000, 'listings': 500000, 'chat_messages': 50000, 'analyses': 500},
+}
+DEFAULT_ITERATIONS = 50
+DEFAULT_WARMUP = 5
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_APP = 'application:app'
+
+# Changes smaller than these are noise, whatever the relative change
+MIN_LATENCY_DELTA_MS = 0.5
+MIN_PEAK_DELTA_KB = 64
+
+def _scale_environment(scale):
+    """Point the app's database and caches at files private to this scale"""
+    os.makedirs(INSTANCE_DIR, exist_ok=True)
+    prefix = os.path.join(INSTANCE_DIR, f"bench_{scale}")
+    os.environ['DATABASE_URL'] = f"sqlite:///{prefix}.db"
+    os.environ['SNAPSHOT_CACHE_PATH'] = f"{prefix}_snapshots.db"
+    os.environ['GEOCODE_CACHE_PATH'] = f"{prefix}_geocode.db"
+    os.environ['RESPONSE_CACHE_PATH'] = f"{prefix}_responses.db"
+    os.environ['CHAT_JOBS_PATH'] = f"{prefix}_chat_jobs.db"
+    os.environ['PRICE_MODEL_PATH'] = f"{prefix}_price_model.json"
+
+def _load_app(app_path):
+    module_name, _, attr = app_path.partition(':')
+    return getattr(importlib.import_module(module_name), attr or 'app')
+
+def _prepare(app, scale, echo):
+    """Generate the scale's data and price model unless already there"""
+    from datagen import generate
+    from models import db, RiceListing
+    from price_model import train, save
+
+    with app.app_context():
+        if db.session.query(RiceListing.id).count() < SCALES[scale]['listings']:
+            echo(f"Generating {scale} dataset...")
+            generate(echo=lambda message: None, **SCALES[scale])
+        if not os.path.exists(os.environ['PRICE_MODEL_PATH']):
+            save(train())
+
+def measure(name, func, engine, iterations, warmup):
+    """Latency percentiles, SQL statements and peak allocation for one case"""
+    from queries import count_queries
+
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    with count_queries(engine) as statements:
+        func()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(np.mean(timings)), 3),
+        'queries': len(statements),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+def run_scale(scale, iterations, warmup, app_path, only=None, echo=click.echo):
+    """Benchmark every case at one scale; must run in a fresh process"""
+    _scale_environment(scale)
+    app = _load_app(app_path)
+    _prepare(app, scale, echo)
+
+    from benchmarks.cases import build_cases
+    from models import db
+
+    with app.app_context():
+        engine = db.engine
+
+    results = {}
+    for name, func in build_cases(app):
+        if only and name not in only:
+            continue
+        try:
+            results[name] = measure(name, func, engine, iterations, warmup)
+        except Exception as e:
+            results[name] = {'error': str(e)}
+            echo(f"  {name}: failed: {e}")
+            continue
+        echo(f"  {name}: p95 {results[name]['p95_ms']} ms")
+
+    return {
+        'scale': scale,
+        'rows': SCALES[scale],
+        'iterations': iterations,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': results,
+    }
+
+def _run_in_subprocess(scale, iterations, warmup, app_path, only):
+    """Run one scale in a child process, since the app binds its database at import"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        output = f.name
+    try:
+        command = [sys.executable, '-m', 'benchmarks.run', 'worker', '--scale', scale,
+                   '--iterations', str(iterations), '--warmup', str(warmup),
+                   '--app', app_path, '--output', output]
+        for name in only:
+            command += ['--case', name]
+        subprocess.run(command, cwd=ROOT, check=True)
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.unlink(output)
+
+def baseline_path(scale):
+    return os.path.join(BASELINE_DIR, f"{scale}.json")
+
+def compare_results(baseline, current, threshold):
+    """
+    Compare two result documents case by case
+
+    Returns:
+        List of (case, metric, baseline value, current value) regressions
+    """
+    regressions = []
+    for name, now in current['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            continue
+        if 'error' in now or 'error' in before:
+            if 'error' in now and 'error' not in before:
+                regressions.append((name, 'error', None, now['error']))
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if (now[metric] > before[metric] * (1 + threshold)
+                    and now[metric] - before[metric] > MIN_LATENCY_DELTA_MS):
+                regressions.append((name, metric, before[metric], now[metric]))
+        if now['queries'] > before['queries']:
+            regressions.append((name, 'queries', before['queries'], now['queries']))
+        if (now['peak_kb'] > before['peak_kb'] * (1 + threshold)
+                and now['peak_kb'] - before['peak_kb'] > MIN_PEAK_DELTA_KB):
+            regressions.append((name, 'peak_kb', before['peak_kb'], now['peak_kb']))
+    return regressions
+
+def format_table(results):
+    lines = [f"{results['scale']} ({results['rows']['listings']} listings, {results['iterations']} iterations)",
+             f"{'case':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}"]
+    for name, row in results['cases'].items():
+        if 'error' in row:
+            lines.append(f"{name:<22}failed: {row['error']}")
+            continue
+        lines.append(f"{name:<22}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+                     f"{row['queries']:>9}{row['peak_kb']:>10.1f}")
+    return '\n'.join(lines)
+
+@click.group()
+def cli():
+    """Benchmark the hot routes and service functions"""
+
+_scale_option = click.option('--scale', 'scales', multiple=True, type=click.Choice(list(SCALES)),
+                             help='Data scale; repeat for several (default: small)')
+_common_options = [
+    click.option('--iterations', default=DEFAULT_ITERATIONS, show_default=True, help='Timed calls per case'),
+    click.option('--warmup', default=DEFAULT_WARMUP, show_default=True, help='Untimed calls per case'),
+    click.option('--app', 'app_path', default=DEFAULT_APP, show_default=True, help='module:attribute of the Flask app'),
+    click.option('--case', 'only', multiple=True, help='Only run these cases'),
+]
+
+def _common(func):
+    for option in reversed(_common_options):
+        func = option(func)
+    return func
+
+@cli.command()
+@_scale_option
+@_common
+@click.option('--save', is_flag=True, help='Store the results as the baseline for each scale')
+@click.option('--output', type=click.Path(), help='Also write all results to this JSON file')
+def run(scales, iterations, warmup, app_path, only, save, output):
+    """Run the benchmarks and print a summary per scale"""
+    all_results = []
+    for scale in scales or ('small',):
+        click.echo(f"Running {scale}...")
+        results = _run_in_subprocess(scale, iterations, warmup, app_path, only)
+        all_results.append(results)
+        click.echo(format_table(results))
+        if save:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(baseline_path(scale), 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            click.echo(f"Saved baseline {baseline_path(scale)}")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(all_results, f, indent=2, sort_keys=True)
+
+@cli.command()
+@_scale_option
+@_common
+@click.option('--threshold', default=DEFAULT_THRESHOLD, show_default=True,
+              help='Relative slowdown or allocation growth that counts as a regression')
+@click.option('--results', 'results_path', type=click.Path(exists=True),
+              help='Compare this results file from `run --output` instead of running again')
+def compare(scales, iterations, warmup, app_path, only, threshold, results_path):
+    """Run the benchmarks and fail on regressions against the saved baselines"""
+    if results_path:
+        with open(results_path) as f:
+            runs = {results['scale']: results for results in json.load(f)}
+        scales = scales or tuple(runs)
+    else:
+        scales = scales or ('small',)
+
+    failed = False
+    for scale in scales:
+        if not os.path.exists(baseline_path(scale)):
+            raise click.ClickException(f"No baseline for {scale}; create one with `run --scale {scale} --save`")
+        with open(baseline_path(scale)) as f:
+            baseline = json.load(f)
+        if results_path:
+            if scale not in runs:
+                raise click.ClickException(f"{results_path} has no results for {scale}")
+            current = runs[scale]
+        else:
+            click.echo(f"Running {scale}...")
+            current = _run_in_subprocess(scale, iterations, warmup, app_path, only)
+        click.echo(format_table(current))
+
+        regressions = compare_results(baseline, current, threshold)
+        for name, metric, before, now in regressions:
+            click.echo(f"REGRESSION {scale}/{name} {metric}: {before} -> {now}")
+        new_cases = sorted(set(current['cases']) - set(baseline['cases']))
+        if new_cases:
+            click.echo(f"No baseline yet for: {', '.join(new_cases)}")
+        if not regressions:
+            click.echo(f"{scale}: no regressions beyond {threshold:.0%}")
+        failed = failed or bool(regressions)
+
+    if failed:
+        sys.exit(1)
+
+@cli.command(hidden=True)
+@click.option('--scale', required=True, type=click.Choice(list(SCALES)))
+@_common
+@click.option('--output', required=True, type=click.Path())
+def worker(scale, iterations, warmup, app_path, only, output):
+    """Benchmark one scale in this process and write the results"""
+    results = run_scale(scale, iterations, warmup, app_path, only)
+    with open(output, 'w') as f:
+        json.dump(results, f)
+
+if __name__ == '__main__':
+    cli()
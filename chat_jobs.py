@@ -0,0 +1,224 @@
+"""
+Background jobs for AI chat
+
+A chat request is stored as a job in a local SQLite queue and answered by a
+small pool of worker threads, so the request that submits it returns at once
+with a job id instead of holding a web worker for the whole model call. The
+worker generates the answer, saves the ChatMessage and records the result on
+the job; clients poll, or long-poll with a wait, for the outcome. Jobs are
+claimed atomically, so every process's workers can share one queue file, and
+jobs left queued or stuck running by a dead process are picked up again.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from models import db, User, ChatMessage
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'chat_jobs.db')
+CHAT_JOB_WORKERS = int(os.environ.get('CHAT_JOB_WORKERS', '4'))
+# A job running longer than this is assumed lost with its worker and requeued
+CHAT_JOB_STALE_SECONDS = float(os.environ.get('CHAT_JOB_STALE_SECONDS', '300'))
+# Finished jobs are kept this long for clients to collect
+CHAT_JOB_RETENTION_SECONDS = float(os.environ.get('CHAT_JOB_RETENTION_SECONDS', '86400'))
+# Idle workers look for jobs queued by other processes this often
+IDLE_POLL_SECONDS = 2.0
+MAX_WAIT_SECONDS = 25
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+FINISHED = (DONE, FAILED)
+# Error codes stored on failed jobs; routes turn them into translated messages
+GENERATION_FAILED, USER_NOT_FOUND = 'generation_failed', 'user_not_found'
+JOB_FIELDS = ('id', 'user_id', 'message', 'status', 'response', 'message_id', 'error',
+              'created_at', 'started_at', 'finished_at')
+
+def _generate(message, user):
+    # Imported here: ai_service pulls in the Gemini client and market snapshot
+    from ai_service import get_ai_response
+    return get_ai_response(message, user)
+
+class ChatJobQueue:
+    """SQLite-backed chat job queue with a pool of daemon worker threads"""
+
+    def __init__(self, path, workers=CHAT_JOB_WORKERS, generate=_generate):
+        self.path = path
+        self.workers = workers
+        self.generate = generate
+        self._threads = []
+        self._app = None
+        self._local = threading.local()
+        self._ready = False
+        self._lock = threading.Lock()
+        # Signalled when a job is queued or finishes in this process
+        self._changed = threading.Condition()
+
+    def submit(self, user_id, message, app=None):
+        """
+        Queue a chat message for a background answer
+
+        Args:
+            user_id: Id of the user asking
+            message: Chat message text
+            app: Flask app for the workers; defaults to the current app
+
+        Returns:
+            The new job as a dict
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO chat_jobs (id, user_id, message, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, user_id, message, QUEUED, now)
+        )
+        conn.commit()
+        self._start(app or current_app._get_current_object())
+        self._notify()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """The job as a dict, or None if it does not exist or has been pruned"""
+        row = self._connect().execute(
+            f"SELECT {', '.join(JOB_FIELDS)} FROM chat_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return dict(zip(JOB_FIELDS, row)) if row else None
+
+    def wait(self, job_id, timeout):
+        """
+        Long-poll: return the job once it finishes or after timeout seconds
+
+        Jobs finishing in this process wake the caller at once; jobs answered
+        by another process are noticed on the next check of the queue file.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in FINISHED or remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(remaining, IDLE_POLL_SECONDS))
+
+    def counts(self):
+        """Number of jobs per status"""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM chat_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _start(self, app):
+        self._connect()
+        with self._lock:
+            self._app = app
+            alive = [thread for thread in self._threads if thread.is_alive()]
+            if not alive:
+                self._recover()
+            for index in range(len(alive), self.workers):
+                thread = threading.Thread(target=self._run, name=f'chat-jobs-{index}', daemon=True)
+                thread.start()
+                alive.append(thread)
+            self._threads = alive
+
+    def _recover(self):
+        """Requeue jobs stuck running and drop old finished ones"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE chat_jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?",
+                (QUEUED, RUNNING, now - CHAT_JOB_STALE_SECONDS)
+            )
+            conn.execute(
+                "DELETE FROM chat_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                FINISHED + (now - CHAT_JOB_RETENTION_SECONDS,)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Chat job queue error: {e}")
+
+    def _claim(self):
+        """Atomically mark the oldest queued job running; None if the queue is empty"""
+        conn = self._connect()
+        row = conn.execute(
+            "UPDATE chat_jobs SET status = ?, started_at = ? "
+            "WHERE id = (SELECT id FROM chat_jobs WHERE status = ? ORDER BY created_at LIMIT 1) "
+            "AND status = ? RETURNING id, user_id, message",
+            (RUNNING, time.time(), QUEUED, QUEUED)
+        ).fetchone()
+        conn.commit()
+        return row
+
+    def _run(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Chat job queue error: {e}")
+                job = None
+            if job is None:
+                with self._changed:
+                    self._changed.wait(IDLE_POLL_SECONDS)
+                continue
+
+            with self._app.app_context():
+                try:
+                    self._process(*job)
+                except Exception as e:
+                    print(f"Chat job {job[0]} failed: {e}")
+                    db.session.rollback()
+                    self._finish(job[0], FAILED, error=GENERATION_FAILED)
+                finally:
+                    db.session.remove()
+            self._notify()
+
+    def _process(self, job_id, user_id, message):
+        user = db.session.get(User, user_id)
+        if user is None:
+            self._finish(job_id, FAILED, error=USER_NOT_FOUND)
+            return
+
+        response = self.generate(message, user)
+        chat_message = ChatMessage(user_id=user_id, message=message, response=response)
+        db.session.add(chat_message)
+        db.session.commit()
+        self._finish(job_id, DONE, response=response, message_id=chat_message.id)
+
+    def _finish(self, job_id, status, response=None, message_id=None, error=None):
+        try:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE chat_jobs SET status = ?, response = ?, message_id = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, response, message_id, error, time.time(), job_id)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Chat job queue error: {e}")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS chat_jobs ("
+                        "id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, message TEXT NOT NULL, "
+                        "status TEXT NOT NULL, response TEXT, message_id INTEGER, error TEXT, "
+                        "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_chat_jobs_status ON chat_jobs (status, created_at)")
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+chat_jobs = ChatJobQueue(os.environ.get('CHAT_JOBS_PATH', DEFAULT_JOBS_PATH))
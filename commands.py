@@ -0,0 +1,87 @@
+"""
+Flask CLI commands for maintenance jobs
+
+Run with `flask --app application <command>`.
+"""
+import click
+
+def register_commands(app):
+    """Attach maintenance commands to the app's CLI"""
+
+    @app.cli.command('geocode-backfill')
+    @click.option('--batch-size', default=None, type=int, help='Users per batch')
+    @click.option('--rate', default=None, type=float, help='Max Nominatim requests per second')
+    @click.option('--restart', is_flag=True, help='Ignore saved progress and start from the first user')
+    def geocode_backfill(batch_size, rate, restart):
+        """Geocode every user that has a location but no coordinates"""
+        from geocoding import backfill, GEOCODE_BATCH_SIZE, GEOCODE_RATE_LIMIT
+
+        processed, geocoded = backfill(
+            batch_size=batch_size or GEOCODE_BATCH_SIZE,
+            rate=rate or GEOCODE_RATE_LIMIT,
+            restart=restart,
+            echo=click.echo
+        )
+        click.echo(f"Done: geocoded {geocoded} of {processed} users")
+
+    @app.cli.command('rebuild-market-aggregates')
+    def rebuild_market_aggregates():
+        """Recompute market aggregates from the listings table"""
+        from market_stats import rebuild
+
+        groups = rebuild()
+        click.echo(f"Rebuilt {groups} market aggregate groups")
+
+    @app.cli.command('rollup-prices')
+    @click.option('--days', default=None, type=int, help='Rebuild this many most recent days instead of resuming')
+    def rollup_prices(days):
+        """Compact price events into daily OHLC rollups"""
+        from datetime import datetime, timedelta
+        from price_history import rollup
+
+        start = datetime.utcnow().date() - timedelta(days=days - 1) if days else None
+        rows = rollup(start=start)
+        click.echo(f"Wrote {rows} daily price rollups")
+
+    @app.cli.command('train-price-model')
+    @click.option('--ridge', default=None, type=float, help='Ridge regularisation strength')
+    def train_price_model(ridge):
+        """Fit the price model from price history and report holdout accuracy"""
+        from price_model import train, save, MODEL_PATH, RIDGE_LAMBDA
+
+        try:
+            model = train(ridge_lambda=RIDGE_LAMBDA if ridge is None else ridge)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        save(model)
+        click.echo(f"Saved {len(model.coefficients)} coefficients to {MODEL_PATH}")
+        for key, value in sorted(model.report.items()):
+            click.echo(f"  {key}: {value}")
+
+    @app.cli.command('generate-data')
+    @click.option('--users', default=10000, show_default=True, help='Users to create')
+    @click.option('--listings', default=50000, show_default=True, help='Rice listings to create')
+    @click.option('--chat-messages', default=20000, show_default=True, help='Chat messages to create')
+    @click.option('--analyses', default=500, show_default=True, help='Market analysis rows to create')
+    @click.option('--days', default=None, type=int, help='Days of history to spread rows over')
+    @click.option('--seed', default=None, type=int, help='Random seed')
+    @click.option('--chunk-size', default=None, type=int, help='Rows per insert batch')
+    def generate_data(users, listings, chat_messages, analyses, days, seed, chunk_size):
+        """Bulk-load a deterministic synthetic marketplace for scale testing"""
+        import time
+        from datagen import generate, DEFAULT_CHUNK_SIZE, DEFAULT_HISTORY_DAYS, DEFAULT_SEED
+
+        started = time.perf_counter()
+        try:
+            counts = generate(
+                users=users, listings=listings, chat_messages=chat_messages, analyses=analyses,
+                days=days or DEFAULT_HISTORY_DAYS,
+                seed=DEFAULT_SEED if seed is None else seed,
+                chunk_size=chunk_size or DEFAULT_CHUNK_SIZE,
+                echo=click.echo
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        summary = ', '.join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        click.echo(f"Generated {summary} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,266 @@
+"""
+Synthetic marketplace data for scale testing
+
+generate() bulk-loads users, listings, price events, chat messages and market
+analyses with Core executemany inserts, so millions of rows load in minutes.
+Everything is drawn from one seeded numpy generator: the same arguments on an
+empty database always produce the same rows. Users are scattered around the
+gazetteer's districts, weighted towards the Telangana and Andhra Pradesh rice
+belt where most of the marketplace trades.
+
+Bulk inserts bypass the ORM flush hooks, so price events are written directly
+and market aggregates, daily rollups and cached snapshots are rebuilt at the end.
+"""
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+import gazetteer
+from models import db, User, RiceListing, ChatMessage, MarketAnalysis, PriceEvent
+
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_HISTORY_DAYS = 180
+SELLER_FRACTION = 0.3
+AVAILABLE_FRACTION = 0.9
+# Standard deviation (degrees, ~15 km) of user locations around a district centre
+LOCATION_SPREAD_DEG = 0.15
+# Mobile numbers of generated users start with this digit, clear of real and sample numbers
+MOBILE_PREFIX = '6'
+
+# Relative weight of a district by state; other states are sparse buyer markets
+STATE_WEIGHTS = {'Telangana': 6.0, 'Andhra Pradesh': 5.0}
+OTHER_STATE_WEIGHT = 1.0
+
+RICE_TYPES = {
+    'Basmati': 65,
+    'Sona Masoori': 45,
+    'Ponni': 42,
+    'Brown Rice': 55,
+    'Jasmine': 70,
+    'Kolam': 48,
+    'Matta': 52,
+    'Idli Rice': 38,
+}
+GRADES = ('A', 'B', 'C')
+GRADE_WEIGHTS = (0.5, 0.35, 0.15)
+GRADE_FACTORS = (1.08, 1.0, 0.9)
+
+CHAT_TEMPLATES = (
+    ("What is the price of {rice} today?", "{rice} is trading around ₹{price}/kg in {place}."),
+    ("Where can I buy {rice} near {place}?", "There are several {rice} sellers within 50 km of {place}."),
+    ("Should I sell my {rice} now?", "{rice} prices in {place} have been steady; selling now is reasonable."),
+    ("{rice} ధర ఎంత?", "{place}లో {rice} ధర సుమారు ₹{price}/kg."),
+    ("{rice} का भाव क्या है?", "{place} में {rice} लगभग ₹{price}/kg पर बिक रहा है।"),
+)
+
+def _places():
+    names = np.array([f"{name}, {state}" for name, state, _, _, _ in gazetteer.PLACES], dtype=object)
+    coords = np.array([(lat, lng) for _, _, lat, lng, _ in gazetteer.PLACES])
+    weights = np.array([STATE_WEIGHTS.get(state, OTHER_STATE_WEIGHT) for _, state, _, _, _ in gazetteer.PLACES])
+    return names, coords, weights / weights.sum()
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+def _insert_returning_ids(model, rows):
+    """Insert rows in one executemany and return their ids in insertion order"""
+    last_id = db.session.execute(select(func.coalesce(func.max(model.id), 0))).scalar()
+    db.session.execute(model.__table__.insert(), rows)
+    ids = db.session.execute(
+        select(model.id).where(model.id > last_id).order_by(model.id).limit(len(rows))
+    ).scalars().all()
+    return np.array(ids, dtype=np.int64)
+
+def _price_walks(rng, days):
+    """Daily price multiplier per rice type: a slow random walk around 1.0"""
+    steps = rng.normal(0, 0.004, size=(len(RICE_TYPES), days))
+    return np.exp(np.cumsum(steps, axis=1))
+
+def generate(users=10000, listings=50000, chat_messages=20000, analyses=500, days=DEFAULT_HISTORY_DAYS,
+             seed=DEFAULT_SEED, chunk_size=DEFAULT_CHUNK_SIZE, echo=print):
+    """
+    Bulk-load a synthetic marketplace
+
+    Args:
+        users: Number of users; SELLER_FRACTION of them are sellers
+        listings: Number of rice listings, each with a 'listed' price event
+        chat_messages: Number of chat messages from random users
+        analyses: Number of market analysis rows
+        days: Listings and messages are spread over this many days up to now
+        seed: Random seed; the same seed gives the same data
+        chunk_size: Rows per INSERT batch and commit
+        echo: Progress callback taking one string
+
+    Returns:
+        Dict with the number of rows written per table
+    """
+    from market_stats import rebuild, region_for
+    from price_history import rollup
+
+    rng = np.random.default_rng(seed)
+    place_names, place_coords, place_weights = _places()
+    rice_names = np.array(list(RICE_TYPES), dtype=object)
+    base_prices = np.array(list(RICE_TYPES.values()), dtype=np.float64)
+    walks = _price_walks(rng, days)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    password_hash = generate_password_hash('password123')
+    first_mobile = db.session.execute(
+        select(func.count(User.id)).where(User.mobile_number.like(f"{MOBILE_PREFIX}%"))
+    ).scalar()
+
+    # Users: district, jittered coordinates, role
+    user_ids, user_places, seller_ids, seller_places = [], [], [], []
+    for offset, size in _chunks(users, chunk_size):
+        places = rng.choice(len(place_names), size=size, p=place_weights)
+        coords = place_coords[places] + rng.normal(0, LOCATION_SPREAD_DEG, size=(size, 2))
+        is_seller = rng.random(size) < SELLER_FRACTION
+        joined = rng.integers(0, days * 86400, size=size)
+        rows = [
+            {
+                'full_name': f"{'Farmer' if seller else 'Buyer'} {first_mobile + offset + i + 1}",
+                'mobile_number': f"{MOBILE_PREFIX}{first_mobile + offset + i:09d}",
+                'location': place_names[place],
+                'latitude': round(lat, 5),
+                'longitude': round(lng, 5),
+                'password_hash': password_hash,
+                'user_type': 'seller' if seller else 'buyer',
+                'created_at': start + timedelta(seconds=seconds),
+                'is_active': True,
+            }
+            for i, (place, (lat, lng), seller, seconds) in enumerate(
+                zip(places.tolist(), coords.tolist(), is_seller.tolist(), joined.tolist()))
+        ]
+        ids = _insert_returning_ids(User, rows)
+        db.session.commit()
+        user_ids.append(ids)
+        user_places.append(places)
+        seller_ids.append(ids[is_seller])
+        seller_places.append(places[is_seller])
+        echo(f"users: {offset + size}/{users}")
+
+    user_ids = np.concatenate(user_ids) if user_ids else np.array([], dtype=np.int64)
+    user_places = np.concatenate(user_places) if user_places else np.array([], dtype=np.int64)
+    seller_ids = np.concatenate(seller_ids) if seller_ids else np.array([], dtype=np.int64)
+    seller_places = np.concatenate(seller_places) if seller_places else np.array([], dtype=np.int64)
+    if listings and not len(seller_ids):
+        existing = db.session.execute(select(User.id, User.location).where(User.user_type == 'seller')).all()
+        if not existing:
+            raise ValueError("No sellers to attach listings to; generate some users first")
+        lookup = {name: i for i, name in enumerate(place_names)}
+        seller_ids = np.array([row.id for row in existing], dtype=np.int64)
+        seller_places = np.array([lookup.get(row.location, 0) for row in existing], dtype=np.int64)
+
+    # Regional price level per district, fixed for the whole run
+    place_factors = rng.normal(1.0, 0.04, size=len(place_names))
+    regions = [region_for(name) for name in place_names]
+
+    # Listings and their 'listed' price events
+    for offset, size in _chunks(listings, chunk_size):
+        sellers = rng.integers(0, len(seller_ids), size=size)
+        types = rng.integers(0, len(rice_names), size=size)
+        grades = rng.choice(len(GRADES), size=size, p=GRADE_WEIGHTS)
+        quantities = np.round(rng.lognormal(np.log(800), 1.0, size=size), -1) + 10
+        listed_day = rng.integers(0, days, size=size)
+        listed_seconds = listed_day * 86400 + rng.integers(0, 86400, size=size)
+        places = seller_places[sellers]
+        prices = (base_prices[types] * walks[types, listed_day] * np.array(GRADE_FACTORS)[grades]
+                  * place_factors[places] * np.where(quantities > 1000, 0.95, 1.0)
+                  * rng.normal(1.0, 0.02, size=size))
+        prices = np.round(prices, 2)
+        available = rng.random(size) < AVAILABLE_FRACTION
+
+        rows = []
+        for seller, rice_type, grade, quantity, price, seconds, is_available, place in zip(
+                seller_ids[sellers].tolist(), types.tolist(), grades.tolist(), quantities.tolist(),
+                prices.tolist(), listed_seconds.tolist(), available.tolist(), places.tolist()):
+            created_at = start + timedelta(seconds=seconds)
+            rows.append({
+                'seller_id': seller,
+                'rice_type': rice_names[rice_type],
+                'quantity': quantity,
+                'price_per_kg': price,
+                'quality_grade': GRADES[grade],
+                'harvest_date': (created_at - timedelta(days=30 + seconds % 60)).date(),
+                'description': f"Grade {GRADES[grade]} {rice_names[rice_type]} from {place_names[place]}",
+                'is_available': is_available,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        ids = _insert_returning_ids(RiceListing, rows)
+        db.session.execute(PriceEvent.__table__.insert(), [
+            {
+                'listing_id': listing_id,
+                'rice_type': row['rice_type'],
+                'region': regions[place],
+                'quality_grade': row['quality_grade'],
+                'price_per_kg': row['price_per_kg'],
+                'quantity': row['quantity'],
+                'event_type': 'listed',
+                'created_at': row['created_at'],
+            }
+            for listing_id, row, place in zip(ids.tolist(), rows, places.tolist())
+        ])
+        db.session.commit()
+        echo(f"listings: {offset + size}/{listings}")
+
+    # Chat messages from random users about random rice types
+    if chat_messages:
+        if not len(user_ids):
+            user_ids = np.array(db.session.execute(select(User.id)).scalars().all(), dtype=np.int64)
+            user_places = rng.integers(0, len(place_names), size=len(user_ids))
+        for offset, size in _chunks(chat_messages, chunk_size):
+            who = rng.integers(0, len(user_ids), size=size)
+            types = rng.integers(0, len(rice_names), size=size)
+            templates = rng.integers(0, len(CHAT_TEMPLATES), size=size)
+            sent = rng.integers(0, days * 86400, size=size)
+            rows = []
+            for user, place, rice_type, template, seconds in zip(
+                    user_ids[who].tolist(), user_places[who].tolist(), types.tolist(),
+                    templates.tolist(), sent.tolist()):
+                values = {'rice': rice_names[rice_type], 'place': place_names[place].split(',')[0],
+                          'price': int(RICE_TYPES[rice_names[rice_type]])}
+                message, response = CHAT_TEMPLATES[template]
+                rows.append({'user_id': user, 'message': message.format(**values),
+                             'response': response.format(**values),
+                             'created_at': start + timedelta(seconds=seconds)})
+            db.session.execute(ChatMessage.__table__.insert(), rows)
+            db.session.commit()
+            echo(f"chat messages: {offset + size}/{chat_messages}")
+
+    # Market analyses per rice type and region
+    region_names = sorted(set(regions))
+    for offset, size in _chunks(analyses, chunk_size):
+        types = rng.integers(0, len(rice_names), size=size)
+        region_index = rng.integers(0, len(region_names), size=size)
+        analysed_day = rng.integers(0, days, size=size)
+        rows = []
+        for rice_type, region, day in zip(types.tolist(), region_index.tolist(), analysed_day.tolist()):
+            series = np.round(base_prices[rice_type] * walks[rice_type, max(day - 4, 0):day + 1], 2).tolist()
+            change = (series[-1] - series[0]) / series[0]
+            rows.append({
+                'rice_type': rice_names[rice_type],
+                'region': region_names[region],
+                'average_price': series[-1],
+                'price_trend': 'increasing' if change > 0.03 else 'decreasing' if change < -0.03 else 'stable',
+                'demand_level': ('high', 'medium', 'low')[(rice_type + region + day) % 3],
+                'supply_level': ('high', 'medium', 'low')[(rice_type * 7 + day) % 3],
+                'analysis_data': json.dumps({'weekly_trend': series}),
+                'date_analyzed': start + timedelta(days=day),
+            })
+        db.session.execute(MarketAnalysis.__table__.insert(), rows)
+        db.session.commit()
+        echo(f"market analyses: {offset + size}/{analyses}")
+
+    groups = rebuild()
+    echo(f"rebuilt {groups} market aggregate groups")
+    bars = rollup(start=start.date())
+    echo(f"wrote {bars} daily price rollups")
+
+    return {'users': users, 'listings': listings, 'price_events': listings,
+            'chat_messages': chat_messages, 'market_analyses': analyses}
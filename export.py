@@ -0,0 +1,158 @@
+"""
+Streaming CSV and NDJSON export
+
+Rows are read with a server-side cursor (yield_per) as plain column tuples, so
+no ORM objects pile up in the session, and each chunk is encoded and sent
+before the next one is fetched. Memory stays flat however many rows match.
+"""
+import csv
+import io
+import json
+from datetime import date
+from operator import itemgetter
+
+from flask import Response, stream_with_context
+from sqlalchemy import Date, func, select
+
+from models import db, User, RiceListing, MarketAnalysis, ChatMessage
+from spatial_index import bounding_box_filter
+from utils import batch_distances
+
+EXPORT_CHUNK_SIZE = 1000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+LISTING_COLUMNS = (
+    RiceListing.id, RiceListing.rice_type, RiceListing.quantity, RiceListing.price_per_kg,
+    RiceListing.quality_grade, RiceListing.harvest_date, RiceListing.created_at,
+    RiceListing.seller_id, User.full_name.label('seller_name'), User.location.label('seller_location'),
+    User.latitude, User.longitude
+)
+
+MARKET_ANALYSIS_COLUMNS = (
+    MarketAnalysis.id, MarketAnalysis.rice_type, MarketAnalysis.region, MarketAnalysis.average_price,
+    MarketAnalysis.price_trend, MarketAnalysis.demand_level, MarketAnalysis.supply_level,
+    MarketAnalysis.date_analyzed, MarketAnalysis.analysis_data
+)
+
+def column_names(columns):
+    return [column.key for column in columns]
+
+def _temporal_keys(statement):
+    """Selected columns holding dates or datetimes, which JSON and CSV need as ISO strings"""
+    keys = []
+    for key, column in zip(statement.selected_columns.keys(), statement.selected_columns):
+        try:
+            if issubclass(column.type.python_type, date):
+                keys.append(key)
+        except NotImplementedError:
+            pass
+    return keys
+
+def stream_chunks(statement, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of row dicts from a server-side cursor, chunk_size rows at a time"""
+    keys = list(statement.selected_columns.keys())
+    temporal = _temporal_keys(statement)
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        rows = [dict(zip(keys, row)) for row in partition]
+        for key in temporal:
+            for row in rows:
+                if row[key] is not None:
+                    row[key] = row[key].isoformat()
+        yield rows
+
+def encode_csv(columns, chunks):
+    """Header line, then one string per chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    values = itemgetter(*columns)
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(map(values, rows))
+        yield buffer.getvalue()
+
+def encode_ndjson(chunks):
+    """One JSON object per line, one string per chunk of rows"""
+    for rows in chunks:
+        if rows:
+            yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+def export_response(name, fmt, columns, chunks):
+    """Streaming download of row chunks as CSV or NDJSON"""
+    body = encode_csv(columns, chunks) if fmt == 'csv' else encode_ndjson(chunks)
+    return Response(
+        stream_with_context(body),
+        content_type=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{name}.{fmt}"'}
+    )
+
+def listing_chunks(rice_type=None, origin=None, max_distance=None):
+    """
+    Available listings with their sellers, using the buyer search filters
+
+    Args:
+        rice_type: Only this rice type
+        origin: (latitude, longitude) of the buyer; adds distance_km and,
+            with max_distance, keeps only listings within that radius
+        max_distance: Search radius in kilometers
+
+    Yields:
+        Lists of row dicts ordered by listing id
+    """
+    statement = (
+        select(*LISTING_COLUMNS)
+        .join(User, RiceListing.seller_id == User.id)
+        .where(RiceListing.is_available == True)
+        .order_by(RiceListing.id)
+    )
+    if rice_type:
+        statement = statement.where(RiceListing.rice_type == rice_type)
+    if origin and max_distance:
+        statement = statement.where(*bounding_box_filter(origin[0], origin[1], max_distance))
+
+    for rows in stream_chunks(statement):
+        if origin:
+            for row in rows:
+                row['distance_km'] = None
+            located = [row for row in rows if row['latitude'] is not None and row['longitude'] is not None]
+            distances, order = batch_distances(
+                origin[0], origin[1],
+                [row['latitude'] for row in located], [row['longitude'] for row in located],
+                max_distance=max_distance
+            )
+            for distance, index in zip(distances, order):
+                located[index]['distance_km'] = round(float(distance), 2)
+            # Rows stay in id order; sorting a stream by distance would need every row in memory
+            if max_distance:
+                rows = [row for row in rows if row['distance_km'] is not None]
+        yield rows
+
+def market_analysis_chunks(rice_type=None, region=None, since=None):
+    """Market analysis rows, oldest first"""
+    statement = select(*MARKET_ANALYSIS_COLUMNS).order_by(MarketAnalysis.date_analyzed, MarketAnalysis.id)
+    if rice_type:
+        statement = statement.where(MarketAnalysis.rice_type == rice_type)
+    if region:
+        statement = statement.where(MarketAnalysis.region == region)
+    if since:
+        statement = statement.where(MarketAnalysis.date_analyzed >= since)
+    return stream_chunks(statement)
+
+def chat_activity_chunks(since=None):
+    """Chat message counts and distinct users per day; message text is never exported"""
+    # Typed so the day is ISO-formatted like other dates; PostgreSQL returns a date object
+    day = func.date(ChatMessage.created_at, type_=Date).label('day')
+    statement = select(
+        day,
+        func.count(ChatMessage.id).label('messages'),
+        func.count(func.distinct(ChatMessage.user_id)).label('users')
+    ).group_by(day).order_by(day)
+    if since:
+        statement = statement.where(ChatMessage.created_at >= since)
+    return stream_chunks(statement)
@@ -0,0 +1,132 @@
+"""
+Full-text search over listing descriptions
+
+Uses an FTS5 external-content table kept in sync by triggers on SQLite, and a
+generated tsvector column with a GIN index on PostgreSQL. Both use tokenizers
+without language-specific stemming so English, Hindi and Telugu text index the
+same way, and every query term is matched as a prefix.
+"""
+import logging
+
+from sqlalchemy import column, func, literal_column, or_, table, text
+
+# Letters, numbers and combining marks all belong to words: Devanagari and
+# Telugu vowel signs and viramas are marks (M*), which unicode61 would
+# otherwise treat as separators and cut every Hindi and Telugu word apart
+SQLITE_TOKENIZER = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+
+# Characters with special meaning in FTS5 or tsquery syntax
+QUERY_SPECIAL_CHARS = '"\'&|!():*<>\\^+-{}[],;'
+MAX_QUERY_TERMS = 8
+
+class ListingSearchIndex:
+    """Full-text index over text columns of a listing model"""
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = tuple(columns)
+        self.table_name = model.__tablename__
+        self.fts_name = f"{self.table_name}_fts"
+        self.vector_name = 'search_vector'
+
+    def install(self, engine):
+        """Create the index, sync triggers and initial contents if missing"""
+        with engine.begin() as conn:
+            if engine.dialect.name == 'sqlite':
+                self._install_sqlite(conn)
+            elif engine.dialect.name == 'postgresql':
+                self._install_postgres(conn)
+            else:
+                logging.warning(f"Full-text search not supported on {engine.dialect.name}")
+
+    def match(self, query, search_text):
+        """
+        Restrict a query to rows matching search_text
+
+        Args:
+            query: Query selecting from the listing table
+            search_text: Free text typed by the user
+
+        Returns:
+            Tuple of (query, rank) where rank is a labelled column; lower is a better match
+        """
+        terms = self.terms(search_text)
+        if not terms:
+            return query.filter(text('1 = 0')), literal_column('0').label('rank')
+
+        dialect = query.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            fts = table(self.fts_name, column('rowid'))
+            expression = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+            query = query.join(fts, fts.c.rowid == self.model.id).filter(
+                literal_column(self.fts_name).op('MATCH')(expression)
+            )
+            # bm25() is negative, more negative for better matches
+            return query, func.bm25(literal_column(self.fts_name)).label('rank')
+
+        if dialect == 'postgresql':
+            vector = literal_column(f"{self.table_name}.{self.vector_name}")
+            tsquery = func.to_tsquery('simple', ' & '.join(f"{term}:*" for term in terms))
+            query = query.filter(vector.op('@@')(tsquery))
+            return query, (-func.ts_rank(vector, tsquery)).label('rank')
+
+        # No index available: fall back to substring matching, unranked
+        for term in terms:
+            query = query.filter(or_(*[getattr(self.model, name).contains(term) for name in self.columns]))
+        return query, literal_column('0').label('rank')
+
+    @staticmethod
+    def terms(search_text):
+        """Split free text into safe query terms"""
+        cleaned = ''.join(' ' if char in QUERY_SPECIAL_CHARS else char for char in search_text or '')
+        return [term.lower() for term in cleaned.split()][:MAX_QUERY_TERMS]
+
+    def _install_sqlite(self, conn):
+        existing = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.fts_name}
+        ).scalar()
+        tokenize = SQLITE_TOKENIZER.replace("'", "''")
+        if existing is not None and tokenize not in existing:
+            # Built with an older tokenizer; rebuild it from the listing table
+            conn.execute(text(f"DROP TABLE {self.fts_name}"))
+            existing = None
+
+        columns = ', '.join(self.columns)
+        new_values = ', '.join(f"new.{name}" for name in self.columns)
+        old_values = ', '.join(f"old.{name}" for name in self.columns)
+
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_name} USING fts5("
+            f"{columns}, content='{self.table_name}', content_rowid='id', "
+            f"tokenize='{tokenize}')"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts_name}_ai AFTER INSERT ON {self.table_name} BEGIN "
+            f"INSERT INTO {self.fts_name}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts_name}_ad AFTER DELETE ON {self.table_name} BEGIN "
+            f"INSERT INTO {self.fts_name}({self.fts_name}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {self.fts_name}_au AFTER UPDATE OF {columns} ON {self.table_name} BEGIN "
+            f"INSERT INTO {self.fts_name}({self.fts_name}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {self.fts_name}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+
+        if existing is None:
+            # Index rows written before the FTS table existed
+            conn.execute(text(f"INSERT INTO {self.fts_name}({self.fts_name}) VALUES ('rebuild')"))
+            logging.info(f"Built full-text index {self.fts_name}")
+
+    def _install_postgres(self, conn):
+        document = " || ' ' || ".join(f"coalesce({name}, '')" for name in self.columns)
+        conn.execute(text(
+            f"ALTER TABLE {self.table_name} ADD COLUMN IF NOT EXISTS {self.vector_name} tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table_name}_{self.vector_name} "
+            f"ON {self.table_name} USING GIN ({self.vector_name})"
+        ))
@@ -0,0 +1,201 @@
+"""
+Offline gazetteer of Indian districts, rice-trade mandals and major cities
+
+Answers common geocoding lookups (district headquarters in Telangana and Andhra
+Pradesh, major markets elsewhere) without a network call. Coordinates are town
+centres to roughly 1 km, which is all distance-based search needs.
+"""
+import re
+
+# (place, state, latitude, longitude, aliases)
+PLACES = [
+    # Telangana district headquarters
+    ("Adilabad", "Telangana", 19.6641, 78.5320, ()),
+    ("Kothagudem", "Telangana", 17.5500, 80.6167, ("Bhadradri Kothagudem",)),
+    ("Hanamkonda", "Telangana", 18.0072, 79.5584, ("Hanumakonda",)),
+    ("Hyderabad", "Telangana", 17.3850, 78.4867, ("హైదరాబాద్", "हैदराबाद")),
+    ("Secunderabad", "Telangana", 17.4399, 78.4983, ()),
+    ("Jagtial", "Telangana", 18.7950, 78.9120, ("Jagityal",)),
+    ("Jangaon", "Telangana", 17.7240, 79.1520, ("Janagama",)),
+    ("Bhupalpally", "Telangana", 18.4322, 79.8640, ("Jayashankar Bhupalpally",)),
+    ("Gadwal", "Telangana", 16.2350, 77.7990, ("Jogulamba Gadwal",)),
+    ("Kamareddy", "Telangana", 18.3200, 78.3400, ()),
+    ("Karimnagar", "Telangana", 18.4386, 79.1288, ("కరీంనగర్",)),
+    ("Khammam", "Telangana", 17.2473, 80.1514, ("ఖమ్మం",)),
+    ("Asifabad", "Telangana", 19.3600, 79.2800, ("Kumuram Bheem Asifabad",)),
+    ("Mahabubabad", "Telangana", 17.6000, 80.0000, ()),
+    ("Mahabubnagar", "Telangana", 16.7488, 77.9856, ("Mahbubnagar", "Palamuru")),
+    ("Mancherial", "Telangana", 18.8700, 79.4400, ()),
+    ("Medak", "Telangana", 18.0460, 78.2630, ()),
+    ("Medchal", "Telangana", 17.6290, 78.4810, ("Medchal Malkajgiri",)),
+    ("Mulugu", "Telangana", 18.1900, 79.9400, ()),
+    ("Nagarkurnool", "Telangana", 16.4800, 78.3100, ()),
+    ("Nalgonda", "Telangana", 17.0575, 79.2684, ("నల్గొండ",)),
+    ("Narayanpet", "Telangana", 16.7450, 77.4960, ()),
+    ("Nirmal", "Telangana", 19.0960, 78.3440, ()),
+    ("Nizamabad", "Telangana", 18.6725, 78.0941, ("నిజామాబాద్",)),
+    ("Peddapalli", "Telangana", 18.6140, 79.3740, ()),
+    ("Sircilla", "Telangana", 18.3880, 78.8100, ("Rajanna Sircilla",)),
+    ("Rangareddy", "Telangana", 17.2700, 78.3800, ("Ranga Reddy",)),
+    ("Sangareddy", "Telangana", 17.6240, 78.0870, ()),
+    ("Siddipet", "Telangana", 18.1020, 78.8520, ()),
+    ("Suryapet", "Telangana", 17.1400, 79.6200, ()),
+    ("Vikarabad", "Telangana", 17.3380, 77.9040, ()),
+    ("Wanaparthy", "Telangana", 16.3620, 78.0620, ()),
+    ("Warangal", "Telangana", 17.9689, 79.5941, ("వరంగల్",)),
+    ("Bhongir", "Telangana", 17.5100, 78.8900, ("Bhuvanagiri", "Yadadri Bhuvanagiri")),
+
+    # Telangana rice-trade mandals
+    ("Miryalaguda", "Telangana", 16.8722, 79.5625, ()),
+    ("Huzurnagar", "Telangana", 16.8950, 79.8720, ()),
+    ("Kodad", "Telangana", 16.9980, 79.9650, ()),
+    ("Huzurabad", "Telangana", 18.2000, 79.4100, ()),
+    ("Jammikunta", "Telangana", 18.2870, 79.4730, ()),
+    ("Armoor", "Telangana", 18.7900, 78.2900, ()),
+    ("Bodhan", "Telangana", 18.6620, 77.8890, ()),
+    ("Narsampet", "Telangana", 17.9280, 79.8940, ()),
+
+    # Andhra Pradesh district headquarters
+    ("Srikakulam", "Andhra Pradesh", 18.2949, 83.8938, ()),
+    ("Parvathipuram", "Andhra Pradesh", 18.7800, 83.4250, ("Parvathipuram Manyam",)),
+    ("Vizianagaram", "Andhra Pradesh", 18.1067, 83.3956, ()),
+    ("Visakhapatnam", "Andhra Pradesh", 17.6868, 83.2185, ("Vizag", "Vishakhapatnam")),
+    ("Paderu", "Andhra Pradesh", 18.0700, 82.6700, ("Alluri Sitharama Raju",)),
+    ("Anakapalli", "Andhra Pradesh", 17.6910, 83.0040, ()),
+    ("Kakinada", "Andhra Pradesh", 16.9891, 82.2475, ()),
+    ("Amalapuram", "Andhra Pradesh", 16.5780, 82.0060, ("Konaseema",)),
+    ("Rajahmundry", "Andhra Pradesh", 17.0005, 81.8040, ("Rajamahendravaram", "East Godavari")),
+    ("Bhimavaram", "Andhra Pradesh", 16.5440, 81.5210, ("West Godavari",)),
+    ("Eluru", "Andhra Pradesh", 16.7107, 81.0952, ()),
+    ("Machilipatnam", "Andhra Pradesh", 16.1875, 81.1389, ("Krishna",)),
+    ("Vijayawada", "Andhra Pradesh", 16.5062, 80.6480, ("NTR", "Bezawada")),
+    ("Guntur", "Andhra Pradesh", 16.3067, 80.4365, ("గుంటూరు",)),
+    ("Tenali", "Andhra Pradesh", 16.2430, 80.6400, ()),
+    ("Narasaraopet", "Andhra Pradesh", 16.2350, 80.0480, ("Palnadu",)),
+    ("Bapatla", "Andhra Pradesh", 15.9040, 80.4670, ()),
+    ("Ongole", "Andhra Pradesh", 15.5057, 80.0499, ("Prakasam",)),
+    ("Nellore", "Andhra Pradesh", 14.4426, 79.9865, ("SPSR Nellore",)),
+    ("Tirupati", "Andhra Pradesh", 13.6288, 79.4192, ()),
+    ("Rayachoti", "Andhra Pradesh", 14.0580, 78.7510, ("Annamayya",)),
+    ("Chittoor", "Andhra Pradesh", 13.2172, 79.1003, ()),
+    ("Puttaparthi", "Andhra Pradesh", 14.1650, 77.8110, ("Sri Sathya Sai",)),
+    ("Anantapur", "Andhra Pradesh", 14.6819, 77.6006, ("Anantapuramu",)),
+    ("Kurnool", "Andhra Pradesh", 15.8281, 78.0373, ()),
+    ("Nandyal", "Andhra Pradesh", 15.4786, 78.4836, ()),
+    ("Kadapa", "Andhra Pradesh", 14.4673, 78.8242, ("YSR Kadapa", "Cuddapah")),
+
+    # Major markets elsewhere in India
+    ("Bangalore", "Karnataka", 12.9716, 77.5946, ("Bengaluru",)),
+    ("Mysuru", "Karnataka", 12.2958, 76.6394, ("Mysore",)),
+    ("Raichur", "Karnataka", 16.2076, 77.3463, ()),
+    ("Chennai", "Tamil Nadu", 13.0827, 80.2707, ("Madras",)),
+    ("Coimbatore", "Tamil Nadu", 11.0168, 76.9558, ()),
+    ("Madurai", "Tamil Nadu", 9.9252, 78.1198, ()),
+    ("Thanjavur", "Tamil Nadu", 10.7870, 79.1378, ("Tanjore",)),
+    ("Mumbai", "Maharashtra", 19.0760, 72.8777, ("Bombay",)),
+    ("Pune", "Maharashtra", 18.5204, 73.8567, ()),
+    ("Delhi", "Delhi", 28.7041, 77.1025, ("New Delhi",)),
+    ("Kolkata", "West Bengal", 22.5726, 88.3639, ("Calcutta",)),
+    ("Ahmedabad", "Gujarat", 23.0225, 72.5714, ()),
+    ("Amritsar", "Punjab", 31.6340, 74.8723, ()),
+    ("Karnal", "Haryana", 29.6857, 76.9905, ()),
+    ("Raipur", "Chhattisgarh", 21.2514, 81.6296, ()),
+    ("Bhubaneswar", "Odisha", 20.2961, 85.8245, ()),
+    ("Cuttack", "Odisha", 20.4625, 85.8830, ()),
+    ("Patna", "Bihar", 25.5941, 85.1376, ()),
+    ("Lucknow", "Uttar Pradesh", 26.8467, 80.9462, ()),
+]
+
+# State names and abbreviations that may appear at the end of an address
+STATE_ALIASES = {
+    'ap': 'Andhra Pradesh',
+    'ts': 'Telangana',
+    'tg': 'Telangana',
+}
+
+def normalize_place(text):
+    """Lowercase, trim and collapse punctuation/whitespace in a place name"""
+    text = re.sub(r'[^\w\s,\u0900-\u0dff]', ' ', (text or '').lower())
+    parts = [' '.join(part.split()) for part in text.split(',')]
+    return ', '.join(part for part in parts if part)
+
+def _build_index():
+    index = {}
+    states = dict(STATE_ALIASES)
+    place_states = {}
+    for name, state, lat, lng, aliases in PLACES:
+        state_key = normalize_place(state)
+        states[state_key] = state
+        for label in (name,) + tuple(aliases):
+            key = normalize_place(label)
+            index.setdefault(key, (lat, lng))
+            index.setdefault(f"{key}, {state_key}", (lat, lng))
+            place_states.setdefault(key, state)
+    return index, states, place_states
+
+_INDEX, _STATES, _PLACE_STATES = _build_index()
+
+# Trailing address parts that add no information once a place is matched
+REGION_WORDS = set(_STATES) | {'india'}
+
+def lookup(location_text, strict=True):
+    """
+    Resolve a location string from the bundled gazetteer
+
+    Args:
+        location_text: Free-text location, e.g. "Warangal, Telangana"
+        strict: Only match when the text names exactly one known place;
+            otherwise fall back to the most specific component that matches
+
+    Returns:
+        Tuple of (latitude, longitude) or None
+    """
+    key = normalize_place(location_text)
+    if not key:
+        return None
+    if key in _INDEX:
+        return _INDEX[key]
+
+    parts = key.split(', ')
+    while len(parts) > 1 and parts[-1] in REGION_WORDS:
+        parts.pop()
+    if len(parts) == 1 or not strict:
+        for part in parts:
+            if part in _INDEX:
+                return _INDEX[part]
+    return None
+
+def region_for(location_text, default=None):
+    """
+    Get the state a location belongs to
+
+    Uses an explicit state name in the text if there is one, otherwise the
+    state of the most specific known place.
+
+    Returns:
+        State name, or default if the location is not recognised
+    """
+    parts = normalize_place(location_text).split(', ')
+    for part in reversed(parts):
+        if part in _STATES:
+            return _STATES[part]
+    for part in parts:
+        if part in _PLACE_STATES:
+            return _PLACE_STATES[part]
+    return default
+
+def nearest(latitude, longitude, max_distance=25):
+    """
+    Find the closest gazetteer place to a coordinate
+
+    Returns:
+        "Place, State, India" string or None if nothing is within max_distance km
+    """
+    from utils import calculate_distance
+
+    best = None
+    for name, state, lat, lng, _ in PLACES:
+        distance = calculate_distance(latitude, longitude, lat, lng)
+        if distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, f"{name}, {state}, India")
+    return best[1] if best else None
@@ -0,0 +1,107 @@
+"""
+Persistent geocoding cache
+
+A small SQLite file shared by every worker process, so an address is only sent
+to Nominatim once per TTL no matter which worker sees it. Misses are cached too
+(for a shorter time) so repeated lookups of an unknown place stay off the
+network. The least recently used entries are evicted beyond max_entries.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'geocode_cache.db')
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+NEGATIVE_TTL_SECONDS = 24 * 3600
+MAX_ENTRIES = 20000
+
+# Cached value meaning "the geocoder had no answer"
+_MISS = 'null'
+
+class GeocodeCache:
+    """Key/value cache with TTL and LRU eviction stored in SQLite"""
+
+    def __init__(self, path, ttl=CACHE_TTL_SECONDS, negative_ttl=NEGATIVE_TTL_SECONDS,
+                 max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            Tuple of (hit, value); value is None for a cached negative result
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value FROM geocode_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            if row is None:
+                return False, None
+            conn.execute("UPDATE geocode_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return True, json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"Geocode cache error: {e}")
+            return False, None
+
+    def set(self, key, value):
+        """Store a value, or None to record that the lookup found nothing"""
+        now = time.time()
+        ttl = self.ttl if value is not None else self.negative_ttl
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value) if value is not None else _MISS, now + ttl, now)
+            )
+            self._evict(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Geocode cache error: {e}")
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM geocode_cache")
+        conn.commit()
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM geocode_cache WHERE key NOT IN "
+                "(SELECT key FROM geocode_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                        "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_geocode_cache_last_used ON geocode_cache (last_used)")
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+geocode_cache = GeocodeCache(os.environ.get('GEOCODE_CACHE_PATH', DEFAULT_CACHE_PATH))
@@ -0,0 +1,203 @@
+"""
+Background geocoding for users without coordinates
+
+New users, and users whose location text changes without fresh coordinates,
+are queued when their transaction commits. A single worker thread per process
+resolves them in batches, calling Nominatim no faster than GEOCODE_RATE_LIMIT
+requests per second, so request threads never wait on geocoding. backfill()
+walks the whole user table for the `flask geocode-backfill` command.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import object_session
+
+from models import db, User
+from utils import geocode_location, lookup_cached_location
+
+# Nominatim's usage policy allows at most one request per second
+GEOCODE_RATE_LIMIT = float(os.environ.get('GEOCODE_RATE_LIMIT', '1'))
+GEOCODE_BATCH_SIZE = int(os.environ.get('GEOCODE_BATCH_SIZE', '20'))
+BACKFILL_PROGRESS_FILE = 'geocode_backfill.json'
+
+class RateLimiter:
+    """Space calls at least 1/rate seconds apart across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+def geocode_users(users, limiter):
+    """
+    Set coordinates for users from their location text and commit
+
+    Each distinct location is resolved once; only lookups that miss the
+    gazetteer and cache count against the rate limit.
+
+    Returns:
+        Number of users that received coordinates
+    """
+    resolved = {}
+    for location in {user.location for user in users if user.location}:
+        hit, point = lookup_cached_location(location)
+        if not hit:
+            limiter.wait()
+            point = geocode_location(location)
+        resolved[location] = point
+
+    updated = 0
+    for user in users:
+        point = resolved.get(user.location)
+        if point:
+            user.latitude, user.longitude = point
+            updated += 1
+    db.session.commit()
+    return updated
+
+class GeocodingQueue:
+    """Queue of (user_id, location) pairs drained by a daemon thread"""
+
+    def __init__(self, batch_size=GEOCODE_BATCH_SIZE, rate=GEOCODE_RATE_LIMIT):
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, items, app=None):
+        """Queue (user_id, location) pairs and make sure the worker is running"""
+        for item in items:
+            self._queue.put(item)
+        self._start(app or current_app._get_current_object())
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _start(self, app):
+        with self._lock:
+            self._app = app
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='geocoding-queue', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = dict([self._queue.get()])
+            while len(batch) < self.batch_size:
+                try:
+                    user_id, location = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch[user_id] = location
+
+            with self._app.app_context():
+                try:
+                    self._process(batch)
+                except Exception as e:
+                    logging.error(f"Background geocoding failed: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def _process(self, batch):
+        users = User.query.filter(User.id.in_(batch.keys())).all()
+        # Skip users whose location changed again since they were queued
+        current = [user for user in users if user.location and user.location == batch[user.id]]
+        if current:
+            updated = geocode_users(current, self.limiter)
+            logging.info(f"Geocoded {updated} of {len(current)} queued users")
+
+geocoding_queue = GeocodingQueue()
+
+def backfill(batch_size=GEOCODE_BATCH_SIZE, rate=GEOCODE_RATE_LIMIT, restart=False, echo=print):
+    """
+    Geocode every user that has a location but no coordinates
+
+    Progress is saved to the instance folder after each batch, so an
+    interrupted run resumes after the last user it finished.
+
+    Returns:
+        Tuple of (users processed, users geocoded)
+    """
+    progress_path = os.path.join(current_app.instance_path, BACKFILL_PROGRESS_FILE)
+    last_id = 0
+    if not restart and os.path.exists(progress_path):
+        with open(progress_path) as f:
+            last_id = json.load(f).get('last_id', 0)
+        echo(f"Resuming after user {last_id}")
+
+    limiter = RateLimiter(rate)
+    processed = geocoded = 0
+    while True:
+        users = User.query.filter(
+            User.id > last_id,
+            User.location.isnot(None),
+            or_(User.latitude.is_(None), User.longitude.is_(None))
+        ).order_by(User.id).limit(batch_size).all()
+        if not users:
+            break
+
+        geocoded += geocode_users(users, limiter)
+        processed += len(users)
+        last_id = users[-1].id
+
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        with open(progress_path, 'w') as f:
+            json.dump({'last_id': last_id}, f)
+        echo(f"Processed {processed} users, geocoded {geocoded}")
+
+    # Finished: the next run starts over and retries users that failed this time
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return processed, geocoded
+
+def _pending(session):
+    return session.info.setdefault('geocoding_pending', {})
+
+@event.listens_for(User, 'after_insert')
+def _user_created(mapper, connection, target):
+    """Queue new users registered without coordinates"""
+    if target.location and (target.latitude is None or target.longitude is None):
+        session = object_session(target)
+        if session is not None:
+            _pending(session)[target.id] = target.location
+
+@event.listens_for(User, 'after_update')
+def _user_relocated(mapper, connection, target):
+    """Queue users whose location text changed without new coordinates"""
+    state = inspect(target)
+    if not state.attrs.location.history.has_changes() or not target.location:
+        return
+    if state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes():
+        return
+
+    session = object_session(target)
+    if session is not None:
+        _pending(session)[target.id] = target.location
+
+@event.listens_for(db.session, 'after_commit')
+def _enqueue_pending(session):
+    """Hand committed users to the background worker"""
+    pending = session.info.pop('geocoding_pending', None)
+    if pending and has_app_context():
+        geocoding_queue.enqueue(pending.items())
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('geocoding_pending', None)
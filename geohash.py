@@ -0,0 +1,93 @@
+"""
+Geohash cells for grouping coordinates into a grid
+
+A geohash names a latitude/longitude cell with a base-32 string; each extra
+character splits the cell 32 ways, and every cell's id is a prefix of the ids
+of the cells inside it.
+"""
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {char: index for index, char in enumerate(BASE32)}
+
+def encode(latitude, longitude, precision):
+    """Geohash of the cell containing a point"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+def bounds(cell):
+    """
+    Bounding box of a geohash cell
+
+    Returns:
+        Tuple of (min_lat, max_lat, min_lng, max_lng)
+
+    Raises:
+        ValueError: cell is not a valid geohash
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in cell.lower():
+        if char not in _DECODE:
+            raise ValueError(f"Invalid geohash: {cell!r}")
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            span = lng_range if even else lat_range
+            middle = (span[0] + span[1]) / 2
+            if value >> shift & 1:
+                span[0] = middle
+            else:
+                span[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+def cell_size(precision):
+    """Height and width in degrees of cells at a precision"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+def cells_in_box(min_lat, max_lat, min_lng, max_lng, precision, limit=None):
+    """
+    Geohashes of every cell at a precision overlapping a bounding box
+
+    Raises:
+        ValueError: the box covers more than limit cells
+    """
+    height, width = cell_size(precision)
+    rows = int((max_lat - min_lat) // height) + 2
+    columns = int((max_lng - min_lng) // width) + 2
+    if limit is not None and rows * columns > limit * 4:
+        raise ValueError(f"Box covers too many cells at precision {precision}")
+
+    cells = []
+    seen = set()
+    for row in range(rows):
+        latitude = min(min_lat + row * height, max_lat)
+        for column in range(columns):
+            cell = encode(latitude, min(min_lng + column * width, max_lng), precision)
+            if cell not in seen:
+                seen.add(cell)
+                cells.append(cell)
+    if limit is not None and len(cells) > limit:
+        raise ValueError(f"Box covers too many cells at precision {precision}")
+    return cells
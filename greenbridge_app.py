@@ -5,10 +5,14 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.middleware.proxy_fix import ProxyFix
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, joinedload
 from datetime import datetime, timezone, date
 import json
-import math
+from sqlalchemy import func, case
+from utils import calculate_distance
+from pagination import keyset_page, page_size_from, InvalidCursor
+from fulltext import ListingSearchIndex
+from sse import chat_stream, sse_response, text_tokens
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -120,29 +124,15 @@ class MarketAnalysis(db.Model):
     confidence_score = db.Column(db.Float, default=0.8)
     analysis_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
+# Full-text index over listing text, kept in sync by the database
+listing_search = ListingSearchIndex(RiceListing, ('description', 'variety'))
+
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
 # Utility functions
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    return R * c
-
 def get_ai_response(message, user):
     """Simple AI response for demonstration"""
     responses = {
@@ -267,6 +257,11 @@ def create_sample_data():
 def before_request():
     g.locale = session.get('language', 'en')
 
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    """Cursors that do not match the page's sort key are a client error"""
+    return jsonify({'error': _('Invalid cursor')}), 400
+
 @app.route('/')
 def index():
     total_farmers = User.query.filter_by(user_type='seller').count()
@@ -339,7 +334,8 @@ def logout():
 @login_required
 def buyer_dashboard():
     # Get nearby listings
-    listings = RiceListing.query.filter_by(is_available=True).limit(10).all()
+    listings = RiceListing.query.options(joinedload(RiceListing.seller))\
+                                .filter_by(is_available=True).limit(10).all()
     
     # Get market analysis
     analysis = {}
@@ -353,12 +349,28 @@ def buyer_dashboard():
 @app.route('/seller/dashboard')
 @login_required
 def seller_dashboard():
-    listings = RiceListing.query.filter_by(seller_id=current_user.id).all()
-    total_revenue = sum(listing.total_value() for listing in listings if listing.is_available)
+    listings, next_cursor = keyset_page(
+        RiceListing.query.filter_by(seller_id=current_user.id),
+        (RiceListing.id,),
+        request.args.get('cursor'),
+        page_size_from(request.args.get('page_size')),
+        descending=True
+    )
+    
+    # Totals cover every listing, not just the current page
+    is_available = RiceListing.is_available == True
+    total_listings, active_listings, total_revenue = db.session.query(
+        func.count(RiceListing.id),
+        func.coalesce(func.sum(case((is_available, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((is_available, RiceListing.quantity * RiceListing.price_per_kg), else_=0)), 0)
+    ).filter(RiceListing.seller_id == current_user.id).one()
     
     return render_template('seller/dashboard.html', 
                          listings=listings, 
-                         total_revenue=total_revenue)
+                         total_listings=total_listings,
+                         active_listings=active_listings,
+                         total_revenue=total_revenue,
+                         next_cursor=next_cursor)
 
 @app.route('/seller/new-listing', methods=['GET', 'POST'])
 @login_required
@@ -432,6 +444,32 @@ def chat_message():
             'error': 'Failed to process message'
         }), 500
 
+@app.route('/ai/chat/stream', methods=['GET', 'POST'])
+@login_required
+def chat_stream_message():
+    """Chat answer as server-sent events; the message is saved when the stream completes"""
+    data = request.get_json(silent=True) or {}
+    message = (data.get('message') or request.args.get('message', '')).strip()
+    
+    if not message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    user_id = current_user.id
+    
+    def save(response):
+        chat_msg = ChatMessage(
+            user_id=user_id,
+            message=message,
+            response=response,
+            message_type='general',
+            created_at=datetime.now(timezone.utc)
+        )
+        db.session.add(chat_msg)
+        db.session.commit()
+        return chat_msg.id
+    
+    return sse_response(chat_stream(text_tokens(get_ai_response(message, current_user)), save))
+
 @app.route('/api/market-data')
 @login_required
 def api_market_data():
@@ -474,28 +512,76 @@ def search():
     rice_type = request.args.get('rice_type', '')
     max_price = request.args.get('max_price', type=float)
     
-    # Build query
-    listings_query = RiceListing.query.filter_by(is_available=True)
+    listings, next_cursor = search_listings(query, rice_type, max_price)
+    
+    return render_template('buyer/search.html', 
+                         listings=listings, 
+                         query=query,
+                         rice_type=rice_type,
+                         max_price=max_price,
+                         next_cursor=next_cursor)
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    """Paged listing search API"""
+    listings, next_cursor = search_listings(
+        request.args.get('q', ''),
+        request.args.get('rice_type', ''),
+        request.args.get('max_price', type=float)
+    )
+    
+    return jsonify({
+        'success': True,
+        'listings': [{
+            'id': listing.id,
+            'rice_type': listing.rice_type,
+            'variety': listing.variety,
+            'quantity': listing.quantity,
+            'price_per_kg': listing.price_per_kg,
+            'quality_grade': listing.quality_grade,
+            'organic': listing.organic,
+            'seller_name': listing.seller.full_name,
+            'seller_location': listing.seller.location
+        } for listing in listings],
+        'next_cursor': next_cursor
+    })
+
+def search_listings(query, rice_type, max_price):
+    """
+    One page of search results plus the next cursor
+    
+    Keyword searches are ranked by full-text relevance; otherwise results
+    are ordered by (price, id).
+    """
+    filters = [RiceListing.is_available == True]
     
     if rice_type:
-        listings_query = listings_query.filter(RiceListing.rice_type == rice_type)
+        filters.append(RiceListing.rice_type == rice_type)
     
     if max_price:
-        listings_query = listings_query.filter(RiceListing.price_per_kg <= max_price)
+        filters.append(RiceListing.price_per_kg <= max_price)
+    
+    cursor = request.args.get('cursor')
+    page_size = page_size_from(request.args.get('page_size'))
     
-    if query:
-        listings_query = listings_query.filter(
-            RiceListing.description.contains(query) |
-            RiceListing.variety.contains(query)
+    if not query:
+        # Load sellers with their listings for the result cards
+        return keyset_page(
+            RiceListing.query.options(joinedload(RiceListing.seller)).filter(*filters),
+            (RiceListing.price_per_kg, RiceListing.id),
+            cursor,
+            page_size
         )
     
-    listings = listings_query.all()
+    # Page through matching ids by (rank, id), then load only that page
+    matches, rank = listing_search.match(db.session.query(RiceListing.id).filter(*filters), query)
+    rows, next_cursor = keyset_page(matches.add_columns(rank), (rank, RiceListing.id), cursor, page_size)
     
-    return render_template('buyer/search.html', 
-                         listings=listings, 
-                         query=query,
-                         rice_type=rice_type,
-                         max_price=max_price)
+    listings = RiceListing.query.options(joinedload(RiceListing.seller))\
+                                .filter(RiceListing.id.in_([row.id for row in rows])).all()
+    listings_by_id = {listing.id: listing for listing in listings}
+    return [listings_by_id[row.id] for row in rows if row.id in listings_by_id], next_cursor
 
 @app.route('/set-language/<language>')
 def set_language(language):
@@ -517,6 +603,7 @@ def _(text):
 # Create tables and sample data
 with app.app_context():
     db.create_all()
+    listing_search.install(db.engine)
     create_sample_data()
     logging.info("Database initialized successfully")
 
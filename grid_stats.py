@@ -0,0 +1,93 @@
+"""
+Market statistics on a geohash grid
+
+Listings are aggregated per rice type into geohash cells around their seller's
+coordinates, at several precisions, by the same incremental machinery as the
+per-state aggregates in market_stats. Reads are served from the aggregate rows
+by cell id; listings are never scanned.
+"""
+from sqlalchemy import select
+
+import geohash
+from market_stats import Grouping, register, stats_from_row
+from models import db, User, GridMarketAggregate
+
+# Stored precisions: ~156 km, ~39 km, ~4.9 km and ~1.2 km cells
+GRID_PRECISIONS = (3, 4, 5, 6)
+# Largest map zoom level served by each precision; higher zooms use the finest
+ZOOM_PRECISIONS = ((5, 3), (8, 4), (11, 5))
+MAX_CELLS = 400
+
+def precision_for_zoom(zoom):
+    """Grid precision to show at a web map zoom level (0-20)"""
+    for max_zoom, precision in ZOOM_PRECISIONS:
+        if zoom <= max_zoom:
+            return precision
+    return GRID_PRECISIONS[-1]
+
+def seller_cells(seller):
+    """Cell keys a seller's listings count towards, one per stored precision"""
+    latitude, longitude = seller['latitude'], seller['longitude']
+    if latitude is None or longitude is None:
+        return []
+    cell = geohash.encode(latitude, longitude, GRID_PRECISIONS[-1])
+    return [(cell[:precision],) for precision in GRID_PRECISIONS]
+
+def _cell_filter(key):
+    min_lat, max_lat, min_lng, max_lng = geohash.bounds(key[0])
+    return (User.latitude.between(min_lat, max_lat), User.longitude.between(min_lng, max_lng))
+
+def cell_stats(cells, rice_types=None):
+    """
+    Price statistics per rice type for each of the given cells
+
+    Returns:
+        Dict of cell -> rice_type -> {listings_count, average_price, min_price,
+        max_price, price_stddev, total_quantity}; empty cells are omitted
+    """
+    if not cells:
+        return {}
+    query = select(
+        GridMarketAggregate.cell,
+        GridMarketAggregate.rice_type,
+        GridMarketAggregate.listings_count,
+        GridMarketAggregate.price_sum,
+        GridMarketAggregate.price_sum_squares,
+        GridMarketAggregate.price_min.label('min_price'),
+        GridMarketAggregate.price_max.label('max_price'),
+        GridMarketAggregate.total_quantity
+    ).where(GridMarketAggregate.cell.in_(cells), GridMarketAggregate.listings_count > 0)
+    if rice_types:
+        query = query.where(GridMarketAggregate.rice_type.in_(rice_types))
+
+    stats = {}
+    for row in db.session.execute(query):
+        stats.setdefault(row.cell, {})[row.rice_type] = stats_from_row(row)
+    return stats
+
+def stats_at(latitude, longitude, zoom, rice_types=None):
+    """Statistics for the cell containing a point, at the precision for a zoom level"""
+    cell = geohash.encode(latitude, longitude, precision_for_zoom(zoom))
+    return {
+        'cell': cell,
+        'bounds': geohash.bounds(cell),
+        'rice_types': cell_stats([cell], rice_types).get(cell, {})
+    }
+
+def stats_in_box(min_lat, max_lat, min_lng, max_lng, zoom, rice_types=None):
+    """
+    Statistics for every non-empty cell overlapping a map viewport
+
+    Raises:
+        ValueError: the viewport covers more than MAX_CELLS cells at this zoom
+    """
+    cells = geohash.cells_in_box(min_lat, max_lat, min_lng, max_lng, precision_for_zoom(zoom), limit=MAX_CELLS)
+    return [
+        {'cell': cell, 'bounds': geohash.bounds(cell), 'rice_types': types}
+        for cell, types in sorted(cell_stats(cells, rice_types).items())
+    ]
+
+register(Grouping(
+    GridMarketAggregate.__table__, ('cell',), ('latitude', 'longitude'),
+    seller_cells, _cell_filter
+))
@@ -0,0 +1,214 @@
+"""
+Shared client for outbound HTTP calls (Nominatim, Overpass)
+
+One requests.Session per process keeps connections to each upstream alive.
+Every call gets a total deadline rather than a per-read timeout, a per-host
+concurrency limit so one slow upstream cannot occupy every worker thread, and
+a circuit breaker that fails fast after repeated upstream errors. Latency and
+error counters per upstream are available from http_client.stats().
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_DEADLINE = 10
+CONNECT_TIMEOUT = 3.05
+DEFAULT_HOST_CONCURRENCY = 4
+# Public OSM services are slow and shared by every worker; keep them to a couple of calls at once
+HOST_CONCURRENCY = {
+    'overpass-api.de': 2,
+    'nominatim.openstreetmap.org': 2,
+}
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+LATENCY_SAMPLES = 500
+CHUNK_SIZE = 64 * 1024
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without calling the upstream while its circuit is open"""
+
+class CircuitBreaker:
+    """Open after FAILURE_THRESHOLD consecutive failures, retry one call after RESET_TIMEOUT"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a call may go through now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                # Let a single trial call through to probe the upstream
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+class UpstreamStats:
+    """Request, error and latency counters for one upstream"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, elapsed_ms, ok):
+        self.requests += 1
+        self.errors += 0 if ok else 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.latencies.append(elapsed_ms)
+
+    def to_dict(self):
+        samples = sorted(self.latencies)
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 1) if samples else None
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'avg_ms': round(self.total_ms / self.requests, 1) if self.requests else None,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max_ms, 1),
+        }
+
+class HttpClient:
+    """Pooled HTTP client with deadlines, per-host limits and circuit breaking"""
+
+    def __init__(self, user_agent='GreenBridge Rice Platform', pool_size=10):
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._breakers = defaultdict(CircuitBreaker)
+        self._stats = defaultdict(UpstreamStats)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, deadline=DEFAULT_DEADLINE, **kwargs):
+        """
+        Send a request that must complete, body included, within deadline seconds
+
+        Raises:
+            CircuitOpenError: the upstream has been failing and was not called
+            requests.Timeout: no connection slot or response before the deadline
+            requests.RequestException: any other transport error
+        """
+        host = urlsplit(url).hostname or ''
+        deadline_at = time.monotonic() + deadline
+        with self._lock:
+            breaker = self._breakers[host]
+            stats = self._stats[host]
+
+        if not breaker.allow():
+            stats.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        semaphore = self._semaphore(host)
+        if not semaphore.acquire(timeout=max(deadline_at - time.monotonic(), 0)):
+            stats.rejected += 1
+            if breaker.state != 'closed':
+                # This was the half-open trial call; give it up so a later call can probe again
+                breaker.record_failure()
+            raise requests.Timeout(f"No free connection slot for {host} within {deadline}s")
+
+        start = time.monotonic()
+        ok = False
+        try:
+            remaining = max(deadline_at - time.monotonic(), 0.001)
+            response = self.session.request(
+                method, url, timeout=(min(CONNECT_TIMEOUT, remaining), remaining), stream=True, **kwargs
+            )
+            self._read_body(response, deadline_at, host)
+            # Rate limiting and server errors count against the upstream; client errors do not
+            ok = response.status_code < 500 and response.status_code != 429
+            return response
+        finally:
+            semaphore.release()
+            stats.record((time.monotonic() - start) * 1000, ok)
+            if ok:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+                if breaker.state == 'open':
+                    logging.warning(f"Circuit open for {host} after {breaker.failures} failures")
+
+    def stats(self):
+        """Counters and circuit state per upstream host"""
+        with self._lock:
+            return {
+                host: dict(stats.to_dict(), circuit=self._breakers[host].state)
+                for host, stats in self._stats.items()
+            }
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+                self._semaphores[host] = threading.BoundedSemaphore(limit)
+            return self._semaphores[host]
+
+    @staticmethod
+    def _read_body(response, deadline_at, host):
+        """Read the body as it arrives so a slowly trickling response still hits the deadline"""
+        raw = response.raw
+        read = getattr(raw, 'read1', None) or raw.read
+        chunks = []
+        while True:
+            chunk = read(CHUNK_SIZE, decode_content=True)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if time.monotonic() > deadline_at:
+                response.close()
+                raise requests.Timeout(f"{host} response exceeded its deadline")
+        response._content = b''.join(chunks)
+        response._content_consumed = True
+
+http_client = HttpClient()
@@ -0,0 +1,135 @@
+"""
+Intent and rice type matching for the fallback chat engine
+
+Every keyword and rice type name, in English, Hindi and Telugu script and in
+common Latin transliterations, is compiled once into an Aho-Corasick automaton.
+One pass over a message finds every keyword it contains, so matching costs the
+same however many keywords are added. English and Indian-script keywords match
+by substring, as the keyword scans they replaced did, so 'selling' and
+'बेचना है' both count. Transliterations are short and often turn up inside
+unrelated words ('sela' in 'selam'), so they only match as whole words.
+"""
+from collections import deque, namedtuple
+
+# Highest priority first: a message matching several intents gets the first
+INTENT_KEYWORDS = (
+    ('price', ('price', 'cost', 'rate', 'कीमत', 'किमत', 'दाम', 'भाव', 'ధర', 'రేటు')),
+    ('market', ('trend', 'market', 'analysis', 'बाजार', 'बाज़ार', 'रुझान', 'మార్కెట్', 'ధోరణి')),
+    ('sell', ('sell', 'selling', 'बेचना', 'बेचने', 'बिक्री', 'అమ్మకం', 'అమ్మాలి', 'అమ్ము')),
+    ('buy', ('buy', 'buying', 'purchase', 'खरीदना', 'खरीद', 'ख़रीद', 'కొనుగోలు', 'కొనాలి')),
+    ('quality', ('quality', 'grade', 'grading', 'गुणवत्ता', 'ग्रेड', 'నాణ్యత', 'గ్రేడ్')),
+)
+INTENTS = tuple(intent for intent, _ in INTENT_KEYWORDS)
+
+# Latin spellings of the Hindi and Telugu keywords; whole words only
+INTENT_TRANSLITERATIONS = {
+    'price': ('kimat', 'keemat', 'bhav', 'dhara'),
+    'market': ('bazaar', 'bazar', 'baazar'),
+    'sell': ('bechna', 'bechan', 'ammakam', 'ammali'),
+    'buy': ('kharidna', 'kharid', 'konugolu', 'konali'),
+    'quality': ('gunvatta', 'gunavatta', 'nanyata'),
+}
+
+RICE_TYPE_NAMES = {
+    'Basmati': ('basmati', 'बासमती', 'బాస్మతి'),
+    'Sona Masoori': ('sona masoori', 'sona masuri', 'sonamasoori', 'sonamasuri',
+                     'सोना मसूरी', 'సోనా మసూరి', 'సోనామసూరి'),
+    'Ponni': ('ponni', 'पोन्नी', 'పొన్ని'),
+    'Brown Rice': ('brown rice', 'brown', 'ब्राउन राइस', 'भूरा चावल', 'బ్రౌన్ రైస్'),
+    'Jasmine': ('jasmine', 'जैस्मिन', 'జాస్మిన్'),
+    'Parboiled': ('parboiled', 'उसना', 'सेला', 'ఉప్పుడు'),
+}
+RICE_TYPE_TRANSLITERATIONS = {
+    'Parboiled': ('ukda', 'sela'),
+}
+
+Match = namedtuple('Match', ['intent', 'rice_types'])
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton mapping keywords to labels"""
+
+    def __init__(self, keywords, whole_words=()):
+        """
+        Args:
+            keywords: Iterable of (keyword, label) pairs matched anywhere in the
+                text; keywords are casefolded
+            whole_words: Iterable of (keyword, label) pairs only matched when
+                not preceded or followed by a letter or digit
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        # Per node: (label, keyword length if it must be a whole word, else None)
+        self._outputs = [()]
+        for keyword, label, length in (
+                [(keyword, label, None) for keyword, label in keywords] +
+                [(keyword, label, len(keyword.casefold())) for keyword, label in whole_words]):
+            node = 0
+            for char in keyword.casefold():
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append(())
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._outputs[node] += ((label, length),)
+        self._link()
+
+    def _link(self):
+        """Breadth-first failure links; each node also inherits its suffix's outputs"""
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] += self._outputs[self._fail[child]]
+                pending.append(child)
+
+    def find(self, text):
+        """Labels of all keywords in text, in the order their matches end"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        text = text.casefold()
+        found = []
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for label, length in outputs[node]:
+                if length is None or _is_word(text, end - length, end):
+                    found.append(label)
+        return found
+
+def _is_word(text, start, end):
+    """Whether text[start:end] is not joined to a letter or digit on either side"""
+    return ((start == 0 or not text[start - 1].isalnum()) and
+            (end == len(text) or not text[end].isalnum()))
+
+_automaton = KeywordAutomaton(
+    [(keyword, ('intent', intent)) for intent, keywords in INTENT_KEYWORDS for keyword in keywords] +
+    [(name, ('rice_type', rice_type)) for rice_type, names in RICE_TYPE_NAMES.items() for name in names],
+    whole_words=(
+        [(keyword, ('intent', intent)) for intent, keywords in INTENT_TRANSLITERATIONS.items() for keyword in keywords] +
+        [(name, ('rice_type', rice_type)) for rice_type, names in RICE_TYPE_TRANSLITERATIONS.items() for name in names]
+    )
+)
+
+def match(message):
+    """
+    Intent and rice types mentioned in a chat message, in one pass
+
+    Returns:
+        Match(intent, rice_types): the highest-priority intent found, or None,
+        and rice types in the order they are mentioned
+    """
+    intents = set()
+    rice_types = []
+    for kind, value in _automaton.find(message):
+        if kind == 'intent':
+            intents.add(value)
+        elif value not in rice_types:
+            rice_types.append(value)
+    intent = next((intent for intent in INTENTS if intent in intents), None)
+    return Match(intent, rice_types)
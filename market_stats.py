@@ -0,0 +1,366 @@
+"""
+Incrementally maintained market aggregates
+
+Every flush that creates, edits, deletes or toggles the availability of a
+listing (or moves a seller) adds its delta to the matching aggregate rows in
+the same transaction. Count, sums and sum of squares are updated with atomic
+increments; min/max are widened on insert and only recomputed for a group when
+its current extreme price is removed.
+
+Each aggregate table is described by a Grouping that maps a listing's seller to
+the rows it counts towards: MarketAggregate by state here, and the geohash grid
+in grid_stats.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import case, event, func, inspect, select
+
+import gazetteer
+from models import db, User, RiceListing, MarketAggregate
+
+DEFAULT_REGION = 'Other'
+
+@lru_cache(maxsize=4096)
+def region_for(location):
+    """Market region (state) for a seller location"""
+    return gazetteer.region_for(location, default=DEFAULT_REGION)
+
+def seller_region(session, seller_id):
+    """Market region of a seller, without triggering an autoflush"""
+    return region_for(_seller_values(session, seller_id, ('location',))['location'])
+
+class Grouping:
+    """
+    How listings map to the rows of one aggregate table
+
+    Args:
+        table: Table with rice_type, the key columns and the statistics columns
+        key_columns: Columns that identify a row together with rice_type
+        seller_fields: User attributes the grouping depends on
+        keys_for: Function from a dict of seller field values to the list of
+            key tuples the seller's listings count towards
+        listing_filter: Optional function from a key tuple to SQL criteria on
+            User that narrow the listings when a group's extremes are recomputed
+    """
+
+    def __init__(self, table, key_columns, seller_fields, keys_for, listing_filter=None):
+        self.table = table
+        self.key_columns = tuple(key_columns)
+        self.seller_fields = tuple(seller_fields)
+        self.keys_for = keys_for
+        self.listing_filter = listing_filter or (lambda key: ())
+
+GROUPINGS = []
+
+LISTING_FIELDS = ('rice_type', 'price_per_kg', 'quantity', 'is_available', 'seller_id')
+
+def _track_old_values(attribute):
+    """
+    Load an attribute's previous value whenever it is set
+
+    Without this, setting an attribute expired by a commit records no old
+    value, and the aggregates would subtract the new value instead.
+    """
+    if not event.contains(attribute, 'set', _old_value_loaded):
+        event.listen(attribute, 'set', _old_value_loaded, active_history=True)
+
+def _old_value_loaded(target, value, oldvalue, initiator):
+    """Nothing to do; registering with active_history is what loads oldvalue"""
+
+def register(grouping):
+    """Keep an aggregate table up to date from now on"""
+    for name in grouping.seller_fields:
+        _track_old_values(getattr(User, name))
+    GROUPINGS.append(grouping)
+    return grouping
+
+class _Delta:
+    """Pending change to one (rice_type, region) aggregate"""
+
+    def __init__(self):
+        self.count = 0
+        self.price_sum = 0.0
+        self.price_sum_squares = 0.0
+        self.quantity = 0.0
+        self.added = []
+        self.removed = []
+
+    def add(self, price, quantity, sign):
+        self.count += sign
+        self.price_sum += sign * price
+        self.price_sum_squares += sign * price * price
+        self.quantity += sign * (quantity or 0)
+        (self.added if sign > 0 else self.removed).append(price)
+
+def _old_value(state, name):
+    """Attribute value as of the last flush"""
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.object, name)
+
+def _seller_values(session, seller_id, fields, old=False):
+    """Seller attributes from the identity map (as of the last flush if old), else the database"""
+    seller = session.identity_map.get(inspect(User).identity_key_from_primary_key((seller_id,)))
+    if seller is not None:
+        if old:
+            return {name: _old_value(inspect(seller), name) for name in fields}
+        return {name: getattr(seller, name) for name in fields}
+    row = session.connection().execute(
+        select(*[getattr(User, name) for name in fields]).where(User.id == seller_id)
+    ).first()
+    return dict(zip(fields, row or (None,) * len(fields)))
+
+def _collect(session, groupings):
+    """Work out aggregate deltas per grouping for everything written in this flush"""
+    deltas = {grouping: defaultdict(_Delta) for grouping in groupings}
+    fields = tuple(sorted({name for grouping in groupings for name in grouping.seller_fields}))
+    sellers = {}
+
+    def seller(seller_id, old=False):
+        if (seller_id, old) not in sellers:
+            sellers[(seller_id, old)] = _seller_values(session, seller_id, fields, old)
+        return sellers[(seller_id, old)]
+
+    def add(values, rice_type, price, quantity, sign, only=None):
+        for grouping in only or groupings:
+            for key in grouping.keys_for(values):
+                deltas[grouping][(rice_type,) + key].add(price, quantity, sign)
+
+    touched = set()
+
+    for listing in session.new:
+        if isinstance(listing, RiceListing) and listing.is_available:
+            add(seller(listing.seller_id), listing.rice_type, listing.price_per_kg, listing.quantity, 1)
+            touched.add(listing.id)
+
+    for listing in session.deleted:
+        if isinstance(listing, RiceListing):
+            state = inspect(listing)
+            if _old_value(state, 'is_available'):
+                add(seller(_old_value(state, 'seller_id'), old=True), _old_value(state, 'rice_type'),
+                    _old_value(state, 'price_per_kg'), _old_value(state, 'quantity'), -1)
+            touched.add(listing.id)
+
+    # Sellers whose move changes the groups their listings count towards
+    relocated = {}
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[name].history.has_changes() for name in fields):
+            continue
+        old_values, new_values = seller(obj.id, old=True), seller(obj.id)
+        moved = [grouping for grouping in groupings
+                 if grouping.keys_for(old_values) != grouping.keys_for(new_values)]
+        if moved:
+            relocated[obj.id] = moved
+
+    for listing in session.dirty:
+        if not isinstance(listing, RiceListing):
+            continue
+        state = inspect(listing)
+        if (not any(state.attrs[name].history.has_changes() for name in LISTING_FIELDS)
+                and listing.seller_id not in relocated):
+            continue
+        touched.add(listing.id)
+        if _old_value(state, 'is_available'):
+            add(seller(_old_value(state, 'seller_id'), old=True), _old_value(state, 'rice_type'),
+                _old_value(state, 'price_per_kg'), _old_value(state, 'quantity'), -1)
+        if listing.is_available:
+            add(seller(listing.seller_id), listing.rice_type, listing.price_per_kg, listing.quantity, 1)
+
+    # Listings of relocated sellers that were not themselves part of this flush
+    if relocated:
+        rows = session.connection().execute(
+            select(RiceListing.id, RiceListing.seller_id, RiceListing.rice_type,
+                   RiceListing.price_per_kg, RiceListing.quantity)
+            .where(RiceListing.seller_id.in_(relocated.keys()), RiceListing.is_available == True)
+        )
+        for listing_id, seller_id, rice_type, price, quantity in rows:
+            if listing_id in touched:
+                continue
+            add(seller(seller_id, old=True), rice_type, price, quantity, -1, only=relocated[seller_id])
+            add(seller(seller_id), rice_type, price, quantity, 1, only=relocated[seller_id])
+
+    return deltas
+
+def _least(column, value):
+    return case((column.is_(None), value), (column < value, column), else_=value)
+
+def _greatest(column, value):
+    return case((column.is_(None), value), (column > value, column), else_=value)
+
+def _group_criteria(grouping, group_key):
+    table = grouping.table
+    criteria = table.c.rice_type == group_key[0]
+    for name, value in zip(grouping.key_columns, group_key[1:]):
+        criteria &= table.c[name] == value
+    return criteria
+
+def _apply(conn, grouping, group_key, delta):
+    table = grouping.table
+    key = _group_criteria(grouping, group_key)
+    added_min = min(delta.added) if delta.added else None
+    added_max = max(delta.added) if delta.added else None
+
+    updated = conn.execute(table.update().where(key).values(
+        listings_count=table.c.listings_count + delta.count,
+        price_sum=table.c.price_sum + delta.price_sum,
+        price_sum_squares=table.c.price_sum_squares + delta.price_sum_squares,
+        total_quantity=table.c.total_quantity + delta.quantity,
+        price_min=_least(table.c.price_min, added_min) if delta.added else table.c.price_min,
+        price_max=_greatest(table.c.price_max, added_max) if delta.added else table.c.price_max,
+        updated_at=datetime.utcnow()
+    )).rowcount
+
+    if not updated:
+        if delta.count <= 0:
+            # Removing from a group that was never recorded; rebuild() repairs drift
+            logging.warning(f"{table.name} row missing for {'/'.join(map(str, group_key))}")
+            return
+        conn.execute(table.insert().values(
+            **dict(zip(('rice_type',) + grouping.key_columns, group_key)),
+            listings_count=delta.count, price_sum=delta.price_sum,
+            price_sum_squares=delta.price_sum_squares, total_quantity=delta.quantity,
+            price_min=added_min, price_max=added_max, updated_at=datetime.utcnow()
+        ))
+
+    if delta.removed:
+        _refresh_extremes(conn, grouping, group_key, min(delta.removed), max(delta.removed))
+
+def _refresh_extremes(conn, grouping, group_key, removed_min, removed_max):
+    """Recompute min/max if a removed price was the group's current extreme"""
+    table = grouping.table
+    key = _group_criteria(grouping, group_key)
+    row = conn.execute(select(table.c.listings_count, table.c.price_min, table.c.price_max).where(key)).first()
+    if row is None:
+        return
+
+    if row.listings_count <= 0:
+        conn.execute(table.update().where(key).values(
+            listings_count=0, price_sum=0, price_sum_squares=0, total_quantity=0,
+            price_min=None, price_max=None
+        ))
+        return
+
+    if (row.price_min is None or removed_min > row.price_min) and (row.price_max is None or removed_max < row.price_max):
+        return
+
+    # Groups are derived from seller fields in Python, so narrow in SQL and match the group here
+    rice_type, group = group_key[0], group_key[1:]
+    columns = [getattr(User, name) for name in grouping.seller_fields]
+    prices = [
+        row[0] for row in conn.execute(
+            select(RiceListing.price_per_kg, *columns)
+            .join(User, RiceListing.seller_id == User.id)
+            .where(RiceListing.rice_type == rice_type, RiceListing.is_available == True,
+                   *grouping.listing_filter(group))
+        )
+        if group in grouping.keys_for(dict(zip(grouping.seller_fields, row[1:])))
+    ]
+    conn.execute(table.update().where(key).values(
+        price_min=min(prices) if prices else None,
+        price_max=max(prices) if prices else None
+    ))
+
+def stats_from_row(row):
+    """Summary statistics from a row of listings_count, price_sum, price_sum_squares, min_price, max_price, total_quantity"""
+    mean = row.price_sum / row.listings_count
+    variance = max(row.price_sum_squares / row.listings_count - mean * mean, 0)
+    return {
+        'listings_count': row.listings_count,
+        'average_price': mean,
+        'min_price': row.min_price,
+        'max_price': row.max_price,
+        'price_stddev': variance ** 0.5,
+        'total_quantity': row.total_quantity
+    }
+
+def market_summary(rice_types=None):
+    """
+    Price statistics per rice type across all regions, in one GROUP BY query
+
+    Args:
+        rice_types: Optional list of rice types to restrict the summary to
+
+    Returns:
+        Dict of rice_type -> {listings_count, average_price, min_price,
+        max_price, price_stddev, total_quantity}; types without available
+        listings are omitted
+    """
+    count = func.sum(MarketAggregate.listings_count)
+    price_sum = func.sum(MarketAggregate.price_sum)
+    query = select(
+        MarketAggregate.rice_type,
+        count.label('listings_count'),
+        price_sum.label('price_sum'),
+        func.sum(MarketAggregate.price_sum_squares).label('price_sum_squares'),
+        func.min(MarketAggregate.price_min).label('min_price'),
+        func.max(MarketAggregate.price_max).label('max_price'),
+        func.sum(MarketAggregate.total_quantity).label('total_quantity')
+    ).where(MarketAggregate.listings_count > 0).group_by(MarketAggregate.rice_type)
+    if rice_types:
+        query = query.where(MarketAggregate.rice_type.in_(rice_types))
+
+    return {row.rice_type: stats_from_row(row) for row in db.session.execute(query)}
+
+def rebuild():
+    """Recompute every registered aggregate table from the listings table"""
+    fields = tuple(sorted({name for grouping in GROUPINGS for name in grouping.seller_fields}))
+    deltas = {grouping: defaultdict(_Delta) for grouping in GROUPINGS}
+    rows = db.session.execute(
+        select(RiceListing.rice_type, RiceListing.price_per_kg, RiceListing.quantity,
+               *[getattr(User, name) for name in fields])
+        .join(User, RiceListing.seller_id == User.id)
+        .where(RiceListing.is_available == True)
+    )
+    for rice_type, price, quantity, *values in rows:
+        seller = dict(zip(fields, values))
+        for grouping in GROUPINGS:
+            for key in grouping.keys_for(seller):
+                deltas[grouping][(rice_type,) + key].add(price, quantity, 1)
+
+    for grouping, groups in deltas.items():
+        table = grouping.table
+        db.session.execute(table.delete())
+        if groups:
+            db.session.execute(table.insert(), [
+                dict(zip(('rice_type',) + grouping.key_columns, group_key),
+                     listings_count=delta.count, price_sum=delta.price_sum,
+                     price_sum_squares=delta.price_sum_squares, total_quantity=delta.quantity,
+                     price_min=min(delta.added), price_max=max(delta.added), updated_at=datetime.utcnow())
+                for group_key, delta in groups.items()
+            ])
+    db.session.commit()
+    return sum(len(groups) for groups in deltas.values())
+
+def ensure_aggregates():
+    """Build aggregates for databases that predate an aggregate table"""
+    if not RiceListing.query.filter_by(is_available=True).first():
+        return
+    if any(db.session.execute(select(grouping.table).limit(1)).first() is None for grouping in GROUPINGS):
+        groups = rebuild()
+        logging.info(f"Built {groups} market aggregates")
+
+@event.listens_for(db.session, 'after_flush')
+def _update_aggregates(session, flush_context):
+    """Apply listing changes from this flush to the aggregates, in the same transaction"""
+    for grouping, deltas in _collect(session, GROUPINGS).items():
+        for group_key, delta in deltas.items():
+            if delta.count or delta.added or delta.removed:
+                _apply(session.connection(), grouping, group_key, delta)
+
+for name in LISTING_FIELDS:
+    _track_old_values(getattr(RiceListing, name))
+
+# Per-state aggregates behind market_summary
+register(Grouping(
+    MarketAggregate.__table__, ('region',), ('location',),
+    lambda seller: [(region_for(seller['location']),)]
+))
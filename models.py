@@ -2,9 +2,13 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from app import db
+from application import db
+from utils import calculate_distance
 import json
 
+# Seller fields shown next to a listing (cards, map markers, farmer finder)
+SELLER_CARD_FIELDS = ('id', 'full_name', 'location', 'latitude', 'longitude')
+
 class User(UserMixin, db.Model):
     """User model for authentication and profile management"""
     id = db.Column(db.Integer, primary_key=True)
@@ -18,6 +22,11 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     
+    # Composite index so bounding-box searches on seller coordinates stay in SQL
+    __table_args__ = (
+        db.Index('ix_user_latitude_longitude', 'latitude', 'longitude'),
+    )
+    
     # Relationships
     rice_listings = db.relationship('RiceListing', backref='seller', lazy=True)
     chat_messages = db.relationship('ChatMessage', backref='user', lazy=True)
@@ -35,19 +44,7 @@ class User(UserMixin, db.Model):
         if not self.latitude or not self.longitude:
             return None
         
-        import math
-        
-        # Convert latitude and longitude from degrees to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [self.latitude, self.longitude, other_lat, other_lng])
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        
-        return c * r
+        return calculate_distance(self.latitude, self.longitude, other_lat, other_lng)
     
     def to_dict(self):
         """Convert user to dictionary for JSON serialization"""
@@ -61,6 +58,10 @@ class User(UserMixin, db.Model):
             'user_type': self.user_type,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+    
+    def to_card_dict(self):
+        """Public seller fields shown with a listing; all loaded by listing_query's seller columns"""
+        return {field: getattr(self, field) for field in SELLER_CARD_FIELDS}
 
 class RiceListing(db.Model):
     """Rice listing model for marketplace"""
@@ -78,7 +79,13 @@ class RiceListing(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
-        """Convert listing to dictionary for JSON serialization"""
+        """
+        Convert listing to dictionary for JSON serialization
+        
+        Load listings through queries.listing_query so the nested seller comes
+        from the same SELECT instead of one lazy load per listing. The seller
+        is serialized as its card, so SELLER_CARD_COLUMNS is enough.
+        """
         return {
             'id': self.id,
             'seller_id': self.seller_id,
@@ -91,7 +98,7 @@ class RiceListing(db.Model):
             'image_url': self.image_url,
             'is_available': self.is_available,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'seller': self.seller.to_dict() if self.seller else None
+            'seller': self.seller.to_card_dict() if self.seller else None
         }
 
 class ChatMessage(db.Model):
@@ -133,6 +140,96 @@ class MarketAnalysis(db.Model):
         """Set analysis data as JSON"""
         self.analysis_data = json.dumps(data)
 
+class MarketAggregate(db.Model):
+    """Running price statistics over available listings per rice type and region
+
+    Maintained by market_stats on every flush that touches a listing, so market
+    snapshots read one row per group instead of scanning listings.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    rice_type = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(100), nullable=False)
+    listings_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0)
+    price_sum_squares = db.Column(db.Float, nullable=False, default=0)
+    price_min = db.Column(db.Float)
+    price_max = db.Column(db.Float)
+    total_quantity = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('rice_type', 'region', name='uq_market_aggregate_type_region'),)
+
+    @property
+    def average_price(self):
+        return self.price_sum / self.listings_count if self.listings_count else None
+
+    @property
+    def price_stddev(self):
+        """Population standard deviation of listing prices"""
+        if not self.listings_count:
+            return None
+        mean = self.price_sum / self.listings_count
+        return max(self.price_sum_squares / self.listings_count - mean * mean, 0) ** 0.5
+
+class GridMarketAggregate(db.Model):
+    """Running price statistics over available listings per rice type and geohash cell
+
+    Each listing counts towards one cell at every precision in
+    grid_stats.GRID_PRECISIONS, placed by its seller's coordinates.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.String(12), nullable=False)
+    rice_type = db.Column(db.String(50), nullable=False)
+    listings_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0)
+    price_sum_squares = db.Column(db.Float, nullable=False, default=0)
+    price_min = db.Column(db.Float)
+    price_max = db.Column(db.Float)
+    total_quantity = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('cell', 'rice_type', name='uq_grid_market_aggregate_cell_type'),)
+
+class PriceEvent(db.Model):
+    """Append-only log of listing prices, written when a listing is created or repriced"""
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, nullable=False)
+    rice_type = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(100), nullable=False)
+    quality_grade = db.Column(db.String(20))
+    price_per_kg = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    event_type = db.Column(db.String(20), nullable=False)  # listed, repriced
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class DailyPriceRollup(db.Model):
+    """Daily open/high/low/close/volume per rice type and region, built from PriceEvent"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    rice_type = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(100), nullable=False)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    volume = db.Column(db.Float, nullable=False, default=0)
+    events = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('rice_type', 'region', 'day', name='uq_daily_price_rollup_type_region_day'),
+    )
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'events': self.events
+        }
+
 def create_sample_data():
     """Create sample data for demo purposes"""
     try:
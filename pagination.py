@@ -0,0 +1,142 @@
+"""
+Keyset (cursor) pagination helpers
+
+Pages are addressed by the sort key of the last row served instead of an
+OFFSET, so fetching page 50 costs the same as fetching page 1. Cursors are
+opaque url-safe strings wrapping that sort key.
+"""
+import base64
+import json
+import math
+from bisect import bisect_right
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def page_size_from(value):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def encode_cursor(values):
+    """Encode a sort key as an opaque cursor string"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+class InvalidCursor(ValueError):
+    """A cursor that does not decode to a sort key of the expected shape"""
+
+def decode_cursor(cursor, types=None):
+    """
+    Decode a cursor string
+
+    Args:
+        cursor: Cursor from a previous page, or None/'' for the first page
+        types: Expected Python type of each sort key value; float also
+            accepts integers
+
+    Returns:
+        List of sort key values, or None for the first page
+
+    Raises:
+        InvalidCursor: the cursor is malformed or does not match types
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    if types is not None:
+        if len(values) != len(types) or not all(map(_matches, values, types)):
+            raise InvalidCursor(cursor)
+    return values
+
+def _matches(value, expected):
+    if isinstance(value, bool):
+        return expected is bool
+    if expected is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, expected)
+
+def _column_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return object
+
+def keyset_page(query, columns, cursor, page_size, descending=False):
+    """
+    Fetch one page of a query ordered by a unique column tuple
+
+    Args:
+        query: SQLAlchemy query to page through
+        columns: Columns forming the sort key; the last must be unique (e.g. id)
+        cursor: Cursor from the previous page, or None for the first page
+        page_size: Rows per page
+        descending: Sort newest/largest first
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        InvalidCursor: the cursor does not match the columns
+    """
+    values = decode_cursor(cursor, [_column_type(column) for column in columns])
+    if values is not None:
+        query = query.filter(_after(columns, values, descending))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key) for column in columns)
+    return rows, next_cursor
+
+def page_sorted(items, key, cursor, page_size, types):
+    """
+    Page through items already sorted ascending by key(item)
+
+    Used where the sort key is computed in Python (e.g. distance), so the
+    same cursor format works without the database ordering the rows. The
+    cursor position is found by binary search.
+
+    Args:
+        types: Expected Python type of each sort key value
+
+    Returns:
+        Tuple of (items, next_cursor)
+
+    Raises:
+        InvalidCursor: the cursor does not match types
+    """
+    values = decode_cursor(cursor, types)
+    if values is not None:
+        start = bisect_right(items, tuple(values), key=lambda item: tuple(key(item)))
+        items = items[start:]
+
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(key(items[-1]))
+    return items, next_cursor
+
+def _after(columns, values, descending):
+    """Row-value comparison (a, b) > (x, y) spelled out for every backend"""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
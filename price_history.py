@@ -0,0 +1,151 @@
+"""
+Price history: append-only event log and daily OHLC rollups
+
+Every listing create or price change appends a PriceEvent in the same
+transaction. rollup() (run by `flask rollup-prices`, e.g. from cron every few
+minutes) compacts events into one DailyPriceRollup row per day, rice type and
+region, plus an ALL_REGIONS row per day and rice type. Trend and forecast
+helpers read only the rollups.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, inspect, select
+
+from market_stats import seller_region
+from models import db, RiceListing, PriceEvent, DailyPriceRollup
+from snapshot_cache import snapshot_cache
+
+ALL_REGIONS = 'All'
+TREND_WINDOW_DAYS = 7
+# Relative change in close price over the window that counts as a trend
+TREND_THRESHOLD = 0.03
+MAX_RANGE_DAYS = 365
+
+def rollup(start=None, end=None):
+    """
+    Rebuild daily rollups for every day from start to end inclusive
+
+    Args:
+        start: First day to rebuild; defaults to the last day already rolled
+            up (which may have received more events since), or the first event
+        end: Last day to rebuild; defaults to today (UTC)
+
+    Returns:
+        Number of rollup rows written
+    """
+    end = end or datetime.utcnow().date()
+    if start is None:
+        last_day = db.session.query(func.max(DailyPriceRollup.day)).scalar()
+        first_event = db.session.query(func.min(PriceEvent.created_at)).scalar()
+        start = last_day or (first_event.date() if first_event else end)
+
+    events = db.session.execute(
+        select(PriceEvent.rice_type, PriceEvent.region, PriceEvent.price_per_kg,
+               PriceEvent.quantity, PriceEvent.created_at)
+        .where(PriceEvent.created_at >= datetime.combine(start, datetime.min.time()),
+               PriceEvent.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        .order_by(PriceEvent.created_at, PriceEvent.id)
+    )
+
+    bars = {}
+    for rice_type, region, price, quantity, created_at in events:
+        for bar_region in (region, ALL_REGIONS):
+            key = (created_at.date(), rice_type, bar_region)
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = {'open': price, 'high': price, 'low': price, 'close': price,
+                             'volume': quantity or 0, 'events': 1}
+            else:
+                bar['high'] = max(bar['high'], price)
+                bar['low'] = min(bar['low'], price)
+                bar['close'] = price
+                bar['volume'] += quantity or 0
+                bar['events'] += 1
+
+    table = DailyPriceRollup.__table__
+    db.session.execute(table.delete().where(table.c.day >= start, table.c.day <= end))
+    if bars:
+        db.session.execute(table.insert(), [
+            dict(bar, day=day, rice_type=rice_type, region=region)
+            for (day, rice_type, region), bar in bars.items()
+        ])
+    db.session.commit()
+    # Cached market snapshots carry trends derived from these rows
+    snapshot_cache.bump()
+    return len(bars)
+
+def price_range(rice_type, start, end, region=ALL_REGIONS):
+    """Daily OHLC rows for one rice type between two dates, oldest first"""
+    rows = DailyPriceRollup.query.filter(
+        DailyPriceRollup.rice_type == rice_type,
+        DailyPriceRollup.region == region,
+        DailyPriceRollup.day >= start,
+        DailyPriceRollup.day <= end
+    ).order_by(DailyPriceRollup.day).all()
+    return [row.to_dict() for row in rows]
+
+def recent_closes(days=TREND_WINDOW_DAYS, region=ALL_REGIONS, today=None):
+    """Daily close prices per rice type over the last `days` days, in one query"""
+    today = today or datetime.utcnow().date()
+    rows = db.session.execute(
+        select(DailyPriceRollup.rice_type, DailyPriceRollup.open, DailyPriceRollup.close)
+        .where(DailyPriceRollup.region == region,
+               DailyPriceRollup.day > today - timedelta(days=days),
+               DailyPriceRollup.day <= today)
+        .order_by(DailyPriceRollup.rice_type, DailyPriceRollup.day)
+    )
+    series = defaultdict(list)
+    for rice_type, open_price, close_price in rows:
+        if not series[rice_type]:
+            series[rice_type].append(open_price)
+        series[rice_type].append(close_price)
+    return dict(series)
+
+def trend_from_closes(closes, threshold=TREND_THRESHOLD):
+    """'increasing', 'decreasing' or 'stable' from a price series, or None if too short"""
+    if not closes or len(closes) < 2 or not closes[0]:
+        return None
+    change = (closes[-1] - closes[0]) / closes[0]
+    if change > threshold:
+        return 'increasing'
+    if change < -threshold:
+        return 'decreasing'
+    return 'stable'
+
+def forecast_from_closes(closes, steps=3):
+    """Extend a price series by `steps` points along its least-squares line"""
+    if not closes or len(closes) < 2:
+        return None
+    n = len(closes)
+    mean_x = (n - 1) / 2
+    mean_y = sum(closes) / n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(closes)) / sum((x - mean_x) ** 2 for x in range(n))
+    return [round(mean_y + slope * (n - 1 + step - mean_x), 2) for step in range(1, steps + 1)]
+
+@event.listens_for(db.session, 'after_flush')
+def _record_price_events(session, flush_context):
+    """Append a price event for each listing created or repriced in this flush"""
+    rows = []
+    now = datetime.utcnow()
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, RiceListing):
+            continue
+        if obj in session.new:
+            event_type = 'listed'
+        elif inspect(obj).attrs.price_per_kg.history.has_changes():
+            event_type = 'repriced'
+        else:
+            continue
+        rows.append({
+            'listing_id': obj.id,
+            'rice_type': obj.rice_type,
+            'region': seller_region(session, obj.seller_id),
+            'quality_grade': obj.quality_grade,
+            'price_per_kg': obj.price_per_kg,
+            'quantity': obj.quantity or 0,
+            'event_type': event_type,
+            'created_at': now
+        })
+    if rows:
+        session.connection().execute(PriceEvent.__table__.insert(), rows)
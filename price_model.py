@@ -0,0 +1,266 @@
+"""
+Trained price prediction model
+
+A ridge regression on log price over one-hot features (rice type, region,
+quality grade, quantity band and season), fit offline from the PriceEvent
+history by `flask train-price-model`. Coefficients are saved as JSON and loaded
+once per worker, so a prediction is a handful of dictionary lookups and one
+exp(); the same inputs always give the same price.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'price_model.json')
+MODEL_PATH = os.environ.get('PRICE_MODEL_PATH', DEFAULT_MODEL_PATH)
+MODEL_VERSION = 1
+RIDGE_LAMBDA = 1.0
+# Every HOLDOUT_EVERY-th event (by id) is held out for the accuracy report
+HOLDOUT_EVERY = 5
+MIN_TRAINING_ROWS = 20
+# How often workers check whether the model file was retrained
+RELOAD_CHECK_SECONDS = 60
+
+# Upper bounds (kg) of the quantity bands, matching the old bulk/small-lot rules
+QUANTITY_BANDS = ((50, 'small'), (1000, 'standard'), (5000, 'bulk'))
+
+def quantity_band(quantity):
+    for limit, band in QUANTITY_BANDS:
+        if quantity < limit:
+            return band
+    return 'wholesale'
+
+def season(month):
+    """Indian cropping season for a month: kharif, rabi or zaid"""
+    if 6 <= month <= 10:
+        return 'kharif'
+    if month >= 11 or month <= 2:
+        return 'rabi'
+    return 'zaid'
+
+def features(rice_type, region, grade, quantity, month):
+    """One-hot feature names for a single observation"""
+    return (
+        f"rice_type={rice_type}",
+        f"region={region}",
+        f"grade={grade or 'A'}",
+        f"quantity={quantity_band(quantity or 0)}",
+        f"season={season(month)}",
+    )
+
+class PriceModel:
+    """Fitted coefficients plus training metadata"""
+
+    def __init__(self, intercept, coefficients, residual_std, report=None, trained_at=None):
+        self.intercept = intercept
+        self.coefficients = coefficients
+        self.residual_std = residual_std
+        self.report = report or {}
+        self.trained_at = trained_at
+
+    def predict(self, rice_type, quantity, grade=None, region=None, when=None):
+        """
+        Predict the price per kg for one lot
+
+        Returns:
+            Dict with predicted_price, confidence, range and per-factor
+            adjustments; unseen categories contribute nothing
+        """
+        return self.predict_many([(rice_type, quantity, grade, region)], when=when)[0]
+
+    def predict_many(self, items, when=None):
+        """
+        Predict prices for many lots in one vectorized pass
+
+        Args:
+            items: Sequence of (rice_type, quantity, grade, region) tuples
+            when: Date the prices are for; defaults to now
+
+        Returns:
+            List of prediction dicts (see predict) in the order of items
+        """
+        when = when or datetime.utcnow()
+        count = len(items)
+        if not count:
+            return []
+
+        rice_types, quantities, grades, regions = zip(*items)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        bands = np.array([band for _, band in QUANTITY_BANDS] + ['wholesale'], dtype=object)
+        band_names = bands[np.searchsorted([limit for limit, _ in QUANTITY_BANDS], quantities, side='right')]
+
+        # Look coefficients up once per distinct value, then broadcast
+        factors = {}
+        for prefix, values in (('rice_type', rice_types), ('region', regions),
+                               ('grade', [grade or 'A' for grade in grades]), ('quantity', band_names)):
+            codes = {}
+            index = np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.intp, count=count)
+            weights = np.array([self.coefficients.get(f"{prefix}={value}", np.nan) for value in codes])
+            factors[prefix] = weights[index]
+        factors['season'] = np.full(count, self.coefficients.get(f"season={season(when.month)}", np.nan))
+
+        weights = np.column_stack([factors[name] for name in ('rice_type', 'region', 'grade', 'quantity', 'season')])
+        known = (~np.isnan(weights)).sum(axis=1)
+        weights = np.nan_to_num(weights)
+        prices = np.exp(self.intercept + weights.sum(axis=1))
+        base_prices = np.exp(self.intercept + weights[:, 0])
+        adjustments = (np.exp(weights) - 1) * 100
+
+        # Fewer known categories means less of the price is explained by the fit
+        confidence = np.clip(self.report.get('holdout_r2', 0.7) * (0.7 + 0.3 * known / weights.shape[1]), 0.3, 0.95)
+        spread = math.exp(1.96 * self.residual_std)
+
+        return [
+            {
+                'predicted_price': round(float(price), 2),
+                'confidence': round(float(conf), 2),
+                'range': [round(float(price) / spread, 2), round(float(price) * spread, 2)],
+                'factors': {
+                    'base_price': round(float(base), 2),
+                    'region_adjustment': f"{adjust[1]:+.1f}%",
+                    'grade_adjustment': f"{adjust[2]:+.1f}%",
+                    'quantity_adjustment': f"{adjust[3]:+.1f}%",
+                    'season_adjustment': f"{adjust[4]:+.1f}%"
+                }
+            }
+            for price, conf, base, adjust in zip(prices, confidence, base_prices, adjustments)
+        ]
+
+    def to_dict(self):
+        return {
+            'version': MODEL_VERSION,
+            'trained_at': self.trained_at,
+            'intercept': self.intercept,
+            'coefficients': self.coefficients,
+            'residual_std': self.residual_std,
+            'report': self.report
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['intercept'], data['coefficients'], data['residual_std'],
+                   data.get('report'), data.get('trained_at'))
+
+def _fit(X, y, ridge_lambda):
+    """Ridge regression with an unpenalised intercept"""
+    intercept = float(y.mean())
+    A = X.T @ X + ridge_lambda * np.eye(X.shape[1])
+    w = np.linalg.solve(A, X.T @ (y - intercept))
+    return intercept, w
+
+def _metrics(actual, predicted, baseline):
+    """Accuracy of predicted prices against actual prices, next to a per-type mean baseline"""
+    errors = np.abs(predicted - actual)
+    total = ((actual - actual.mean()) ** 2).sum()
+    r2 = 1 - ((actual - predicted) ** 2).sum() / total if total else 0.0
+    return {
+        'holdout_rows': int(actual.shape[0]),
+        'holdout_mae': round(float(errors.mean()), 3),
+        'holdout_mape': round(float((errors / actual).mean() * 100), 2),
+        'holdout_r2': round(float(r2), 3),
+        'baseline_mae': round(float(np.abs(baseline - actual).mean()), 3)
+    }
+
+def train(ridge_lambda=RIDGE_LAMBDA, holdout_every=HOLDOUT_EVERY):
+    """
+    Fit the model from the price event log
+
+    The fit is first evaluated on a deterministic holdout (every Nth event),
+    then refit on all events for the saved model.
+
+    Returns:
+        PriceModel with the holdout report attached
+
+    Raises:
+        ValueError: not enough price history to train on
+    """
+    from models import db, PriceEvent
+
+    rows = db.session.execute(
+        select(PriceEvent.id, PriceEvent.rice_type, PriceEvent.region, PriceEvent.quality_grade,
+               PriceEvent.quantity, PriceEvent.created_at, PriceEvent.price_per_kg)
+        .where(PriceEvent.price_per_kg > 0)
+    ).all()
+    if len(rows) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Need at least {MIN_TRAINING_ROWS} price events to train, found {len(rows)}")
+
+    row_features = [features(r.rice_type, r.region, r.quality_grade, r.quantity, r.created_at.month) for r in rows]
+    names = sorted({name for names in row_features for name in names})
+    column = {name: i for i, name in enumerate(names)}
+
+    X = np.zeros((len(rows), len(names)))
+    for i, names_i in enumerate(row_features):
+        X[i, [column[name] for name in names_i]] = 1.0
+    prices = np.array([r.price_per_kg for r in rows], dtype=np.float64)
+    y = np.log(prices)
+
+    holdout = np.array([r.id % holdout_every == 0 for r in rows])
+    report = {'training_rows': int((~holdout).sum())}
+    if holdout.any() and (~holdout).sum() >= len(names):
+        intercept, w = _fit(X[~holdout], y[~holdout], ridge_lambda)
+        predicted = np.exp(intercept + X[holdout] @ w)
+
+        # Baseline: mean training price of the same rice type
+        type_means = {}
+        for r, is_holdout in zip(rows, holdout):
+            if not is_holdout:
+                type_means.setdefault(r.rice_type, []).append(r.price_per_kg)
+        overall = float(prices[~holdout].mean())
+        baseline = np.array([
+            np.mean(type_means[r.rice_type]) if r.rice_type in type_means else overall
+            for r, is_holdout in zip(rows, holdout) if is_holdout
+        ])
+        report.update(_metrics(prices[holdout], predicted, baseline))
+
+    intercept, w = _fit(X, y, ridge_lambda)
+    residual_std = float(np.std(y - (intercept + X @ w)))
+    coefficients = {name: round(float(weight), 6) for name, weight in zip(names, w)}
+    return PriceModel(round(intercept, 6), coefficients, round(residual_std, 6), report,
+                      datetime.utcnow().isoformat(timespec='seconds'))
+
+def save(model, path=MODEL_PATH):
+    """Write the model atomically so workers never read a partial file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(model.to_dict(), f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+_lock = threading.Lock()
+_loaded = {'model': None, 'mtime': None, 'checked': None}
+
+def get_model(path=MODEL_PATH):
+    """
+    Return the saved model, loading it once per worker
+
+    The file's mtime is re-checked at most every RELOAD_CHECK_SECONDS so a
+    retrain reaches running workers without a restart.
+
+    Returns:
+        PriceModel, or None if no model has been trained yet
+    """
+    now = time.monotonic()
+    if _loaded['checked'] is not None and now - _loaded['checked'] < RELOAD_CHECK_SECONDS:
+        return _loaded['model']
+
+    with _lock:
+        _loaded['checked'] = now
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return _loaded['model']
+        if mtime != _loaded['mtime']:
+            try:
+                with open(path) as f:
+                    _loaded['model'] = PriceModel.from_dict(json.load(f))
+                _loaded['mtime'] = mtime
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"Could not load price model from {path}: {e}")
+        return _loaded['model']
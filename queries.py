@@ -0,0 +1,79 @@
+"""
+Shared query builders for listing read paths
+
+Every listing query goes through listing_query so sellers are always loaded in
+the same SELECT as their listings, and each view only pulls the columns it
+renders. count_queries/assert_max_queries guard routes against N+1 regressions.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.orm import contains_eager, load_only
+
+from models import db, User, RiceListing, SELLER_CARD_FIELDS
+
+# Seller fields shown next to a listing (cards, map markers, farmer finder)
+SELLER_CARD_COLUMNS = tuple(getattr(User, field) for field in SELLER_CARD_FIELDS)
+
+# Listing fields the farmer finder returns
+FARMER_LISTING_COLUMNS = (
+    RiceListing.id, RiceListing.seller_id, RiceListing.rice_type,
+    RiceListing.quantity, RiceListing.price_per_kg
+)
+
+def listing_query(listing_columns=None, seller_columns=None):
+    """
+    Build a listing query with the seller joined and eager-loaded
+
+    Args:
+        listing_columns: RiceListing columns to load, or None for all
+        seller_columns: User columns to load, or None for all
+
+    Returns:
+        Query over RiceListing joined to User, so callers may filter on either
+    """
+    seller_load = contains_eager(RiceListing.seller)
+    if seller_columns:
+        seller_load = seller_load.load_only(*seller_columns)
+
+    query = RiceListing.query.join(RiceListing.seller).options(seller_load)
+    if listing_columns:
+        query = query.options(load_only(*listing_columns))
+    return query
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Record every SQL statement executed inside the block
+
+    Yields:
+        List that fills with statement strings as they execute
+    """
+    engine = engine or db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """
+    Fail if the block runs more than limit SQL statements
+
+    Usage:
+        with assert_max_queries(3):
+            client.get('/buyer/search')
+    """
+    with count_queries(engine) as statements:
+        yield statements
+
+    if len(statements) > limit:
+        raise AssertionError(
+            f"Expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
+        )
@@ -0,0 +1,183 @@
+"""
+Cache for generated AI responses
+
+Responses are keyed on a hash of the normalized prompt, the model name and the
+market snapshot version, so any listing write retires every answer built from
+older data. A bounded in-process LRU answers repeat prompts without I/O; a
+SQLite tier shared by all workers survives restarts. Both tiers expire entries
+after the TTL, and hit/miss counters are kept per process.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from snapshot_cache import snapshot_cache
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'response_cache.db')
+RESPONSE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL', '900'))
+MEMORY_ENTRIES = 256
+DISK_ENTRIES = 5000
+# Disk eviction only needs a rough recency order, so last_used is rewritten at most this often
+TOUCH_INTERVAL_SECONDS = 60
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation and line wrapping do not change the key"""
+    return ' '.join(prompt.split())
+
+class ResponseCache:
+    """Two-tier (memory LRU, then SQLite) cache of generated text with TTL"""
+
+    def __init__(self, path, ttl=RESPONSE_TTL_SECONDS, max_entries=MEMORY_ENTRIES, disk_max_entries=DISK_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self._memory = OrderedDict()
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._local = threading.local()
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt, model='', version=0):
+        text = f"{model}\0{version}\0{normalize_prompt(prompt)}"
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_or_generate(self, prompt, generate, model=''):
+        """
+        Return the cached response for a prompt, or generate and store one
+
+        Args:
+            prompt: Prompt text sent to the model
+            generate: Zero-argument function returning the response text
+            model: Model name, so different models never share answers
+
+        Returns:
+            Response text; falsy responses are returned but not cached
+        """
+        key = self.key(prompt, model, snapshot_cache.version())
+        hit, value = self.get(key)
+        if hit:
+            return value
+
+        value = generate()
+        if value:
+            self.set(key, value)
+        return value
+
+    def get(self, key):
+        """
+        Look up a key in memory, then on disk
+
+        Returns:
+            Tuple of (hit, value)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._counts['memory_hits'] += 1
+                return True, entry[0]
+
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at, last_used FROM response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None and now - row[2] >= TOUCH_INTERVAL_SECONDS:
+                conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Response cache error: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self._memory.pop(key, None)
+                self._counts['misses'] += 1
+                return False, None
+            self._remember(key, row[0], row[1])
+            self._counts['disk_hits'] += 1
+            return True, row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now + self.ttl)
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            self._evict(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Response cache error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM response_cache")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Response cache error: {e}")
+
+    def stats(self):
+        """Hit and miss counters for this process, plus the size of each tier"""
+        with self._lock:
+            counts = dict(self._counts)
+            counts['memory_entries'] = len(self._memory)
+        lookups = counts['memory_hits'] + counts['disk_hits'] + counts['misses']
+        counts['hit_rate'] = round((counts['memory_hits'] + counts['disk_hits']) / lookups, 3) if lookups else None
+        try:
+            counts['disk_entries'] = self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Response cache error: {e}")
+        return counts
+
+    def _remember(self, key, value, expires_at):
+        # Caller holds self._lock
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        if count > self.disk_max_entries:
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM response_cache WHERE key NOT IN "
+                "(SELECT key FROM response_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.disk_max_entries,)
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS response_cache ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                        "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used)")
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+response_cache = ResponseCache(os.environ.get('RESPONSE_CACHE_PATH', DEFAULT_CACHE_PATH))
@@ -3,11 +3,25 @@ from flask_login import login_user, logout_user, login_required, current_user
 from flask_babel import _, get_locale
 from models import User, RiceListing, ChatMessage, MarketAnalysis
 from application import db
-from ai_service import get_ai_response, get_market_analysis, get_price_prediction
+from ai_service import stream_ai_response, get_market_analysis, get_price_prediction, get_price_predictions
+from sse import chat_stream, sse_response
+from chat_jobs import chat_jobs, MAX_WAIT_SECONDS, USER_NOT_FOUND
 from utils import geocode_location, calculate_distance
+from spatial_index import listing_index
+from queries import listing_query, SELLER_CARD_COLUMNS, FARMER_LISTING_COLUMNS
+from pagination import keyset_page, page_sorted, page_size_from, InvalidCursor
+from snapshot_cache import snapshot_cache
+from response_cache import response_cache
+from price_history import price_range, ALL_REGIONS, MAX_RANGE_DAYS
+from market_stats import region_for
+from grid_stats import cell_stats, stats_at, stats_in_box, MAX_CELLS
+from export import (FORMATS as EXPORT_FORMATS, LISTING_COLUMNS, MARKET_ANALYSIS_COLUMNS, column_names,
+                    export_response, listing_chunks, market_analysis_chunks, chat_activity_chunks)
+from sqlalchemy import func, case
 from werkzeug.security import check_password_hash, generate_password_hash
 import json
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
 
 # Create blueprints
 main_bp = Blueprint('main', __name__)
@@ -16,11 +30,27 @@ buyer_bp = Blueprint('buyer', __name__)
 seller_bp = Blueprint('seller', __name__)
 ai_bp = Blueprint('ai', __name__)
 
+# Map zoom used for grid market stats when the client does not send one
+DEFAULT_GRID_ZOOM = 8
+
+# Largest batch accepted by the batch price prediction endpoint
+MAX_BATCH_PREDICTIONS = 500
+
+# Farmer finder defaults: search radius and how many matches to return
+FARMER_SEARCH_RADIUS_KM = 200
+DEFAULT_FARMER_RESULTS = 10
+MAX_FARMER_RESULTS = 50
+
 @main_bp.before_request
 def before_request():
     """Set global variables for each request"""
     g.locale = str(get_locale())
 
+@main_bp.app_errorhandler(InvalidCursor)
+def invalid_cursor(error):
+    """Cursors that do not match the page's sort key are a client error"""
+    return jsonify({'error': _('Invalid cursor')}), 400
+
 # Main routes
 @main_bp.route('/')
 def index():
@@ -134,29 +164,12 @@ def search():
     rice_type = request.args.get('rice_type')
     max_distance = request.args.get('max_distance', 50, type=int)
     
-    # Base query
-    query = RiceListing.query.filter_by(is_available=True)
-    
-    if rice_type:
-        query = query.filter_by(rice_type=rice_type)
-    
-    listings = query.all()
-    
-    # Filter by distance if user has location
-    if current_user.latitude and current_user.longitude:
-        filtered_listings = []
-        for listing in listings:
-            if listing.seller.latitude and listing.seller.longitude:
-                distance = current_user.get_distance_to(
-                    listing.seller.latitude, 
-                    listing.seller.longitude
-                )
-                if distance and distance <= max_distance:
-                    listing.distance = distance
-                    filtered_listings.append(listing)
-        
-        # Sort by distance
-        listings = sorted(filtered_listings, key=lambda x: x.distance)
+    listings, next_cursor = search_listings(
+        rice_type,
+        max_distance,
+        request.args.get('cursor'),
+        page_size_from(request.args.get('page_size'))
+    )
     
     # Prepare data for map
     map_data = []
@@ -175,7 +188,80 @@ def search():
     return render_template('buyer/search.html', 
                          listings=listings, 
                          map_data=map_data,
-                         selected_rice_type=rice_type)
+                         selected_rice_type=rice_type,
+                         next_cursor=next_cursor)
+
+@buyer_bp.route('/api/search')
+@login_required
+def api_search():
+    """API endpoint for paged listing search"""
+    rice_type = request.args.get('rice_type')
+    max_distance = request.args.get('max_distance', 50, type=int)
+    
+    listings, next_cursor = search_listings(
+        rice_type,
+        max_distance,
+        request.args.get('cursor'),
+        page_size_from(request.args.get('page_size'))
+    )
+    
+    return jsonify({
+        'listings': [{
+            'id': listing.id,
+            'rice_type': listing.rice_type,
+            'quantity': listing.quantity,
+            'price_per_kg': listing.price_per_kg,
+            'quality_grade': listing.quality_grade,
+            'distance': round(listing.distance, 1) if hasattr(listing, 'distance') else None,
+            'seller': {
+                'id': listing.seller.id,
+                'name': listing.seller.full_name,
+                'location': listing.seller.location
+            }
+        } for listing in listings],
+        'next_cursor': next_cursor
+    })
+
+def search_listings(rice_type, max_distance, cursor, page_size):
+    """
+    Get one page of buyer search results
+    
+    Buyers with a location get listings within max_distance ordered by
+    (distance, id); everyone else gets every listing ordered by (price, id).
+    
+    Returns:
+        Tuple of (listings, next_cursor)
+    """
+    # Base query, with sellers loaded alongside their listings
+    query = listing_query(seller_columns=SELLER_CARD_COLUMNS).filter(RiceListing.is_available == True)
+    
+    if rice_type:
+        query = query.filter(RiceListing.rice_type == rice_type)
+    
+    if not current_user.latitude or not current_user.longitude:
+        return keyset_page(query, (RiceListing.price_per_kg, RiceListing.id), cursor, page_size)
+    
+    # Nearest first from the spatial index, or the seller bounding box in SQL while the
+    # index is cold, with id breaking ties so the cursor is unambiguous
+    nearby = listing_index.within_radius(current_user.latitude, current_user.longitude, max_distance, wait=False)
+    keys = sorted(
+        (distance, point.listing_id) for distance, point in nearby
+        if not rice_type or point.rice_type == rice_type
+    )
+    keys, next_cursor = page_sorted(keys, lambda key: key, cursor, page_size, (float, int))
+    
+    # Only this page's listings are loaded, in one query
+    listings_by_id = {
+        listing.id: listing
+        for listing in query.filter(RiceListing.id.in_([listing_id for _, listing_id in keys])).all()
+    } if keys else {}
+    listings = []
+    for distance, listing_id in keys:
+        listing = listings_by_id.get(listing_id)
+        if listing:
+            listing.distance = distance
+            listings.append(listing)
+    return listings, next_cursor
 
 @buyer_bp.route('/api/find-farmers', methods=['POST'])
 @login_required
@@ -187,46 +273,77 @@ def find_farmers():
     unit = data.get('unit')
     location_text = data.get('location')
     
+    try:
+        k = min(int(data.get('k', DEFAULT_FARMER_RESULTS)), MAX_FARMER_RESULTS)
+        max_distance = float(data.get('maxDistance', FARMER_SEARCH_RADIUS_KM))
+    except (TypeError, ValueError):
+        return jsonify({'error': _('Invalid search parameters')}), 400
+    if k < 1 or not math.isfinite(max_distance) or max_distance <= 0:
+        return jsonify({'error': _('Invalid search parameters')}), 400
+    
     # Convert quantity to kg
     if unit == 'quintal':
         quantity *= 100
     elif unit == 'ton':
         quantity *= 1000
     
-    # Find matching listings
-    query = RiceListing.query.filter_by(is_available=True)
+    if not current_user.latitude or not current_user.longitude:
+        return jsonify({'farmers': []})
     
-    if rice_type:
-        query = query.filter_by(rice_type=rice_type)
-    
-    # Filter by quantity
-    query = query.filter(RiceListing.quantity >= quantity)
+    # Nearest k matching listings, searched outward from the buyer
+    nearby = listing_index.nearest(
+        current_user.latitude,
+        current_user.longitude,
+        k,
+        max_distance=max_distance,
+        predicate=lambda point: point.quantity >= quantity and (not rice_type or point.rice_type == rice_type)
+    )
     
-    listings = query.all()
+    listings = listing_query(FARMER_LISTING_COLUMNS, SELLER_CARD_COLUMNS).filter(
+        RiceListing.id.in_([point.listing_id for distance, point in nearby])
+    ).all() if nearby else []
+    listings_by_id = {listing.id: listing for listing in listings}
     
-    # Calculate distances and prepare response
+    # Prepare response in distance order
     farmers = []
-    for listing in listings:
-        if listing.seller.latitude and listing.seller.longitude and current_user.latitude and current_user.longitude:
-            distance = current_user.get_distance_to(
-                listing.seller.latitude,
-                listing.seller.longitude
-            )
-            
-            farmers.append({
-                'id': listing.seller_id,
-                'name': listing.seller.full_name,
-                'location': listing.seller.location,
-                'distance': round(distance, 1) if distance else 0,
-                'available_quantity': listing.quantity,
-                'price_per_kg': listing.price_per_kg,
-                'listing_id': listing.id
-            })
+    for distance, point in nearby:
+        listing = listings_by_id.get(point.listing_id)
+        if not listing:
+            continue
+        
+        farmers.append({
+            'id': listing.seller_id,
+            'name': listing.seller.full_name,
+            'location': listing.seller.location,
+            'distance': round(distance, 1),
+            'available_quantity': listing.quantity,
+            'price_per_kg': listing.price_per_kg,
+            'listing_id': listing.id
+        })
     
-    # Sort by distance
-    farmers.sort(key=lambda x: x['distance'])
+    return jsonify({'farmers': farmers})
+
+@buyer_bp.route('/export/listings.<fmt>')
+@login_required
+def export_listings(fmt):
+    """
+    Stream every listing matching the search filters as CSV or NDJSON
+    
+    Takes the same rice_type and max_distance filters as search; buyers with a
+    location also get distance_km, and max_distance=0 lifts the radius limit.
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': _('Unsupported export format')}), 400
+    
+    rice_type = request.args.get('rice_type')
+    max_distance = request.args.get('max_distance', 50, type=int)
+    origin = None
+    if current_user.latitude and current_user.longitude:
+        origin = (current_user.latitude, current_user.longitude)
     
-    return jsonify({'farmers': farmers[:10]})  # Return top 10
+    columns = column_names(LISTING_COLUMNS) + (['distance_km'] if origin else [])
+    return export_response('listings', fmt, columns,
+                           listing_chunks(rice_type, origin, max_distance or None))
 
 @buyer_bp.route('/api/contact-farmer/<int:farmer_id>', methods=['POST'])
 @login_required
@@ -248,18 +365,30 @@ def contact_farmer(farmer_id):
 @login_required
 def dashboard():
     """Seller dashboard"""
-    listings = RiceListing.query.filter_by(seller_id=current_user.id).all()
+    listings, next_cursor = keyset_page(
+        RiceListing.query.filter_by(seller_id=current_user.id),
+        (RiceListing.id,),
+        request.args.get('cursor'),
+        page_size_from(request.args.get('page_size')),
+        descending=True
+    )
     
-    # Calculate statistics
-    total_listings = len(listings)
-    active_listings = len([l for l in listings if l.is_available])
-    total_quantity = sum(l.quantity for l in listings if l.is_available)
+    # Calculate statistics over all listings, not just this page
+    is_available = RiceListing.is_available == True
+    total_listings, active_listings, total_quantity, total_revenue = db.session.query(
+        func.count(RiceListing.id),
+        func.coalesce(func.sum(case((is_available, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((is_available, RiceListing.quantity), else_=0)), 0),
+        func.coalesce(func.sum(case((is_available, RiceListing.quantity * RiceListing.price_per_kg), else_=0)), 0)
+    ).filter(RiceListing.seller_id == current_user.id).one()
     
     return render_template('seller/dashboard.html',
                          listings=listings,
                          total_listings=total_listings,
                          active_listings=active_listings,
-                         total_quantity=total_quantity)
+                         total_quantity=total_quantity,
+                         total_revenue=total_revenue,
+                         next_cursor=next_cursor)
 
 @seller_bp.route('/new-listing', methods=['GET', 'POST'])
 @login_required
@@ -287,6 +416,7 @@ def new_listing():
 
         db.session.add(listing)
         db.session.commit()
+        snapshot_cache.bump()
 
         flash(_('Listing created successfully!'), 'success')
         return redirect(url_for('seller.dashboard'))
@@ -308,6 +438,7 @@ def edit_listing(listing_id):
     if 'is_available' in data:
         listing.is_available = data['is_available']
         db.session.commit()
+        snapshot_cache.bump()
         
         status = _('activated') if listing.is_available else _('deactivated')
         return jsonify({
@@ -333,30 +464,86 @@ def chat():
 @ai_bp.route('/api/chat', methods=['POST'])
 @login_required
 def api_chat():
-    """API endpoint for AI chat"""
-    data = request.get_json()
-    message = data.get('message', '').strip()
+    """
+    API endpoint for AI chat
+    
+    Queues the message as a background job and answers 202 with the job id
+    straight away; the worker saves the ChatMessage when the answer is ready.
+    Poll /ai/api/chat/jobs/<job_id> for the result.
+    """
+    data = request.get_json(silent=True) or {}
+    message = (data.get('message') or '').strip()
     
     if not message:
         return jsonify({'error': _('Message cannot be empty')}), 400
     
     try:
-        # Get AI response
-        response = get_ai_response(message, current_user)
-        
-        # Save chat message
-        chat_message = ChatMessage(
-            user_id=current_user.id,
-            message=message,
-            response=response
-        )
-        db.session.add(chat_message)
-        db.session.commit()
-        
-        return jsonify({'response': response})
-        
+        job = chat_jobs.submit(current_user.id, message)
     except Exception as e:
         return jsonify({'error': _('Sorry, I encountered an error. Please try again.')}), 500
+    
+    return jsonify(_chat_job_json(job)), 202, {'Location': url_for('ai.api_chat_job', job_id=job['id'])}
+
+@ai_bp.route('/api/chat/jobs/<job_id>')
+@login_required
+def api_chat_job(job_id):
+    """
+    Status of a chat job, with the answer once it is done
+    
+    With ?wait=N (up to MAX_WAIT_SECONDS) the request is held until the job
+    finishes or N seconds pass, so clients need not poll in a tight loop.
+    """
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'error': _('Invalid wait')}), 400
+    if not math.isfinite(wait):
+        return jsonify({'error': _('Invalid wait')}), 400
+    wait = min(max(wait, 0), MAX_WAIT_SECONDS)
+    
+    job = chat_jobs.wait(job_id, wait) if wait else chat_jobs.get(job_id)
+    if job is None or job['user_id'] != current_user.id:
+        return jsonify({'error': _('Job not found')}), 404
+    
+    return jsonify(_chat_job_json(job))
+
+def _chat_job_json(job):
+    result = {'job_id': job['id'], 'status': job['status']}
+    if job['status'] == 'done':
+        result.update(response=job['response'], message_id=job['message_id'])
+    elif job['status'] == 'failed':
+        # Jobs store an error code; the message is translated for this request
+        result['error_code'] = job['error']
+        if job['error'] == USER_NOT_FOUND:
+            result['error'] = _('User not found')
+        else:
+            result['error'] = _('Sorry, I encountered an error. Please try again.')
+    return result
+
+@ai_bp.route('/chat/stream', methods=['GET', 'POST'])
+@login_required
+def api_chat_stream():
+    """
+    AI chat answer streamed as server-sent events
+    
+    Takes the message as JSON ({"message": ...}) or, for EventSource clients,
+    as a query parameter. The ChatMessage is saved once the answer is complete.
+    """
+    data = request.get_json(silent=True) or {}
+    message = (data.get('message') or request.args.get('message', '')).strip()
+    
+    if not message:
+        return jsonify({'error': _('Message cannot be empty')}), 400
+    
+    user_id = current_user.id
+    
+    def save(response):
+        chat_message = ChatMessage(user_id=user_id, message=message, response=response)
+        db.session.add(chat_message)
+        db.session.commit()
+        return chat_message.id
+    
+    return sse_response(chat_stream(stream_ai_response(message, current_user), save))
 
 @ai_bp.route('/market-analysis')
 @login_required
@@ -374,12 +561,137 @@ def api_price_prediction():
     data = request.get_json()
     rice_type = data.get('rice_type')
     quantity = data.get('quantity', 1)
+    grade = data.get('grade')
+    region = data.get('region') or region_for(current_user.location)
     
     if not rice_type:
         return jsonify({'error': _('Rice type is required')}), 400
     
     try:
-        prediction = get_price_prediction(rice_type, quantity)
+        prediction = get_price_prediction(rice_type, float(quantity), grade=grade, region=region)
         return jsonify(prediction)
     except Exception as e:
         return jsonify({'error': _('Unable to predict price at this time')}), 500
+
+@ai_bp.route('/api/price-predictions', methods=['POST'])
+@login_required
+def api_price_predictions():
+    """Batch price prediction: one result per item, in request order"""
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': _('Items are required')}), 400
+    if len(items) > MAX_BATCH_PREDICTIONS:
+        return jsonify({'error': _('Too many items'), 'max_items': MAX_BATCH_PREDICTIONS}), 400
+
+    default_region = region_for(current_user.location)
+    lots = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            return jsonify({'error': _('Invalid item'), 'index': index}), 400
+        rice_type, grade, region = item.get('rice_type'), item.get('grade'), item.get('region')
+        if not rice_type or not isinstance(rice_type, str):
+            return jsonify({'error': _('Rice type is required'), 'index': index}), 400
+        if not all(value is None or isinstance(value, str) for value in (grade, region)):
+            return jsonify({'error': _('Invalid item'), 'index': index}), 400
+        try:
+            quantity = float(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            return jsonify({'error': _('Invalid item'), 'index': index}), 400
+        lots.append((rice_type, quantity, grade, region or default_region))
+
+    try:
+        return jsonify({'predictions': get_price_predictions(lots)})
+    except Exception as e:
+        return jsonify({'error': _('Unable to predict price at this time')}), 500
+
+@ai_bp.route('/api/response-cache')
+@login_required
+def api_response_cache():
+    """Hit/miss counters of this worker's AI response cache"""
+    return jsonify(response_cache.stats())
+
+@ai_bp.route('/api/price-history')
+@login_required
+def api_price_history():
+    """Daily open/high/low/close prices for a rice type, served from the rollups"""
+    rice_type = request.args.get('rice_type')
+    region = request.args.get('region', ALL_REGIONS)
+    days = request.args.get('days', 30, type=int)
+
+    if not rice_type:
+        return jsonify({'error': _('Rice type is required')}), 400
+
+    days = max(1, min(days, MAX_RANGE_DAYS))
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    return jsonify({
+        'rice_type': rice_type,
+        'region': region,
+        'days': price_range(rice_type, start, end, region)
+    })
+
+@ai_bp.route('/api/market-grid')
+@login_required
+def api_market_grid():
+    """
+    Market statistics per geohash cell, served from the grid aggregates
+    
+    Pass cell ids (comma-separated), a map viewport (min_lat, max_lat,
+    min_lng, max_lng and zoom), or a point (lat, lng, zoom). Without any of
+    these the cell around the current user is returned.
+    """
+    rice_types = request.args.getlist('rice_type') or None
+    zoom = request.args.get('zoom', DEFAULT_GRID_ZOOM, type=int)
+    
+    try:
+        if request.args.get('cell'):
+            cells = [cell.strip().lower() for cell in request.args['cell'].split(',') if cell.strip()]
+            if len(cells) > MAX_CELLS:
+                return jsonify({'error': _('Too many cells'), 'max_cells': MAX_CELLS}), 400
+            stats = cell_stats(cells, rice_types)
+            return jsonify({'cells': [{'cell': cell, 'rice_types': stats.get(cell, {})} for cell in cells]})
+        
+        box = [request.args.get(name, type=float) for name in ('min_lat', 'max_lat', 'min_lng', 'max_lng')]
+        if all(value is not None for value in box):
+            return jsonify({'zoom': zoom, 'cells': stats_in_box(*box, zoom, rice_types)})
+        
+        latitude = request.args.get('lat', current_user.latitude, type=float)
+        longitude = request.args.get('lng', current_user.longitude, type=float)
+        if latitude is None or longitude is None:
+            return jsonify({'error': _('Location is required')}), 400
+        return jsonify(dict(stats_at(latitude, longitude, zoom, rice_types), zoom=zoom))
+    except ValueError:
+        return jsonify({'error': _('Invalid search parameters')}), 400
+
+def _since_from(value):
+    """Parse an optional YYYY-MM-DD date filter; raises ValueError if malformed"""
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+@ai_bp.route('/export/market-analysis.<fmt>')
+@login_required
+def export_market_analysis(fmt):
+    """Stream market analysis rows as CSV or NDJSON, filtered by rice_type, region and since"""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': _('Unsupported export format')}), 400
+    try:
+        since = _since_from(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': _('Invalid search parameters')}), 400
+    
+    chunks = market_analysis_chunks(request.args.get('rice_type'), request.args.get('region'), since)
+    return export_response('market_analysis', fmt, column_names(MARKET_ANALYSIS_COLUMNS), chunks)
+
+@ai_bp.route('/export/chat-activity.<fmt>')
+@login_required
+def export_chat_activity(fmt):
+    """Stream daily chat message and user counts as CSV or NDJSON"""
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': _('Unsupported export format')}), 400
+    try:
+        since = _since_from(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': _('Invalid search parameters')}), 400
+    
+    return export_response('chat_activity', fmt, ['day', 'messages', 'users'], chat_activity_chunks(since))
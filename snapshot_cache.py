@@ -0,0 +1,108 @@
+"""
+Market snapshot cache shared by all worker processes
+
+Snapshots are JSON documents stored in a local SQLite file together with the
+value of a version counter at the time they were computed. Listing writes bump
+the counter, which invalidates every snapshot built from older data in every
+worker at once; the TTL bounds staleness for changes made elsewhere.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'snapshot_cache.db')
+SNAPSHOT_TTL_SECONDS = float(os.environ.get('SNAPSHOT_CACHE_TTL', '60'))
+
+# Version counter bumped by listing writes
+MARKET_VERSION = 'market'
+
+class SnapshotCache:
+    """Versioned JSON snapshots with TTL stored in SQLite"""
+
+    def __init__(self, path, ttl=SNAPSHOT_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def version(self, name=MARKET_VERSION):
+        row = self._connect().execute("SELECT version FROM cache_version WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name=MARKET_VERSION):
+        """Invalidate every snapshot built against this version counter"""
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO cache_version (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (name,)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Snapshot cache error: {e}")
+
+    def get_or_compute(self, key, compute, version_name=MARKET_VERSION, ttl=None):
+        """
+        Return the cached snapshot for key, or compute and store a fresh one
+
+        Args:
+            key: Snapshot name
+            compute: Zero-argument function returning a JSON-serializable value
+            version_name: Version counter the snapshot depends on
+            ttl: Maximum age in seconds, defaults to the cache TTL
+
+        Returns:
+            The snapshot value; falsy results are returned but not cached
+        """
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            conn = self._connect()
+            version = self.version(version_name)
+            row = conn.execute(
+                "SELECT value, version, created_at FROM snapshot WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] == version and time.time() - row[2] < ttl:
+                return json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"Snapshot cache error: {e}")
+            return compute()
+
+        # Stored with the version read before computing, so a write that lands
+        # meanwhile still invalidates this snapshot
+        value = compute()
+        if value:
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshot (key, version, created_at, value) VALUES (?, ?, ?, ?)",
+                    (key, version, time.time(), json.dumps(value))
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Snapshot cache error: {e}")
+        return value
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("CREATE TABLE IF NOT EXISTS cache_version (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS snapshot ("
+                        "key TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                        "created_at REAL NOT NULL, value TEXT NOT NULL)"
+                    )
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+snapshot_cache = SnapshotCache(os.environ.get('SNAPSHOT_CACHE_PATH', DEFAULT_CACHE_PATH))
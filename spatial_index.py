@@ -0,0 +1,414 @@
+"""
+In-process spatial index over seller coordinates
+
+Listings are bucketed into fixed-size latitude/longitude grid cells so radius
+queries only look at the cells around the buyer instead of every listing in the
+marketplace. The index is kept in sync through SQLAlchemy events and is fully
+rebuilt every REFRESH_SECONDS to pick up writes made by other worker processes.
+While it is cold, buyer search filters sellers in SQL by the bounding box around
+the radius instead of waiting for the rebuild, which runs on a background thread.
+"""
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import object_session
+
+from models import db, User, RiceListing
+from utils import EARTH_RADIUS_KM, bounding_box, batch_distances
+
+# ~11 km cells: small enough to prune, large enough to keep cell counts low
+CELL_SIZE_DEG = 0.1
+REFRESH_SECONDS = 300
+
+ListingPoint = namedtuple('ListingPoint', [
+    'listing_id', 'seller_id', 'latitude', 'longitude',
+    'rice_type', 'quantity', 'price_per_kg'
+])
+
+class GridIndex:
+    """Bucket points into fixed-size latitude/longitude cells"""
+
+    def __init__(self, cell_size=CELL_SIZE_DEG):
+        self.cell_size = cell_size
+        self._cells = defaultdict(dict)
+        self._cell_of = {}
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def cell_for(self, latitude, longitude):
+        """Get the cell key containing a coordinate"""
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def insert(self, key, point):
+        """Add or move a point"""
+        self.remove(key)
+        cell = self.cell_for(point.latitude, point.longitude)
+        self._cells[cell][key] = point
+        self._cell_of[key] = cell
+
+    def get(self, key):
+        """Get a point by key, or None"""
+        cell = self._cell_of.get(key)
+        if cell is None:
+            return None
+        return self._cells[cell][key]
+
+    def remove(self, key):
+        """Remove a point if present"""
+        cell = self._cell_of.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        bucket.pop(key, None)
+        if not bucket:
+            del self._cells[cell]
+
+    def clear(self):
+        """Remove every point"""
+        self._cells.clear()
+        self._cell_of.clear()
+
+    def points_in_box(self, min_lat, max_lat, min_lng, max_lng):
+        """Yield points from every cell overlapping a bounding box"""
+        min_row, min_col = self.cell_for(min_lat, min_lng)
+        max_row, max_col = self.cell_for(max_lat, max_lng)
+
+        # Iterate whichever is smaller: the cells in the box or the occupied cells
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            for (row, col), bucket in self._cells.items():
+                if min_row <= row <= max_row and min_col <= col <= max_col:
+                    yield from bucket.values()
+            return
+
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                bucket = self._cells.get((row, col))
+                if bucket:
+                    yield from bucket.values()
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """
+        Find points within a radius of a coordinate
+
+        Returns:
+            List of (distance_km, point) tuples sorted by distance
+        """
+        points = list(self.points_in_box(*bounding_box(latitude, longitude, radius_km)))
+        return _by_distance(latitude, longitude, points, radius_km)
+
+    def nearest(self, latitude, longitude, k, max_distance=None, predicate=None):
+        """
+        Find the k closest points matching a predicate
+
+        Searches outward in square rings of cells around the origin, keeping
+        the best k in a bounded heap, and stops as soon as no unvisited cell
+        can hold anything closer than the current k-th match.
+
+        Returns:
+            List of (distance_km, point) tuples sorted by distance
+        """
+        if k <= 0 or not self._cells:
+            return []
+
+        origin_row, origin_col = self.cell_for(latitude, longitude)
+        heap = []  # (-distance, tiebreak, point), worst match on top
+        tiebreak = itertools.count()
+        visited = set()
+        ring = 0
+
+        while True:
+            # Once rings outgrow the occupied cells, finish with one pass over the rest
+            if 8 * ring > len(self._cells) - len(visited):
+                cells = [cell for cell in self._cells if cell not in visited]
+                self._push_nearest(heap, tiebreak, k, latitude, longitude, max_distance, predicate, cells)
+                break
+
+            cells = [cell for cell in self._ring_cells(origin_row, origin_col, ring) if cell in self._cells]
+            visited.update(cells)
+            self._push_nearest(heap, tiebreak, k, latitude, longitude, max_distance, predicate, cells)
+
+            # Nothing outside the rings searched so far can be closer than this
+            frontier = self._frontier_distance(latitude, longitude, origin_row, origin_col, ring)
+            if max_distance is not None and frontier > max_distance:
+                break
+            if len(heap) == k and -heap[0][0] <= frontier:
+                break
+            if len(visited) == len(self._cells):
+                break
+            ring += 1
+
+        return sorted(((-negative, point) for negative, _, point in heap), key=lambda item: item[0])
+
+    def _push_nearest(self, heap, tiebreak, k, latitude, longitude, max_distance, predicate, cells):
+        points = [
+            point for cell in cells for point in self._cells[cell].values()
+            if predicate is None or predicate(point)
+        ]
+        if not points:
+            return
+
+        distances, order = batch_distances(
+            latitude, longitude,
+            [point.latitude for point in points],
+            [point.longitude for point in points],
+            max_distance=max_distance
+        )
+        for distance, i in zip(distances, order):
+            distance = float(distance)
+            if len(heap) < k:
+                heapq.heappush(heap, (-distance, next(tiebreak), points[i]))
+            elif distance < -heap[0][0]:
+                heapq.heapreplace(heap, (-distance, next(tiebreak), points[i]))
+            else:
+                # Distances arrive sorted, so the rest cannot improve the heap
+                break
+
+    @staticmethod
+    def _ring_cells(origin_row, origin_col, ring):
+        if ring == 0:
+            yield (origin_row, origin_col)
+            return
+        for col in range(origin_col - ring, origin_col + ring + 1):
+            yield (origin_row - ring, col)
+            yield (origin_row + ring, col)
+        for row in range(origin_row - ring + 1, origin_row + ring):
+            yield (row, origin_col - ring)
+            yield (row, origin_col + ring)
+
+    def _frontier_distance(self, latitude, longitude, origin_row, origin_col, ring):
+        """Lower bound on the distance to any point outside the searched square"""
+        size = self.cell_size
+        lat_gap = min(
+            latitude - (origin_row - ring) * size,
+            (origin_row + ring + 1) * size - latitude
+        )
+        lng_gap = min(
+            longitude - (origin_col - ring) * size,
+            (origin_col + ring + 1) * size - longitude
+        )
+
+        lat_km = math.radians(lat_gap) * EARTH_RADIUS_KM
+        # Shortest great-circle distance from the origin to a meridian lng_gap degrees away
+        lng_ratio = math.cos(math.radians(latitude)) * math.sin(math.radians(min(lng_gap, 90.0)))
+        lng_km = math.asin(min(lng_ratio, 1.0)) * EARTH_RADIUS_KM
+        return min(lat_km, lng_km)
+
+class ListingLocationIndex:
+    """Grid index of available listings keyed on their seller's coordinates"""
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._grid = GridIndex()
+        self._listings_by_seller = defaultdict(set)
+        self._stale_listings = set()
+        self._stale_sellers = set()
+        self._built_at = None
+        self._lock = threading.RLock()
+        self._warmer = None
+        self._warmer_lock = threading.Lock()
+
+    def mark_listings(self, listing_ids):
+        """Queue listings to be reloaded before the next query"""
+        with self._lock:
+            self._stale_listings.update(listing_ids)
+
+    def mark_sellers(self, seller_ids):
+        """Queue every listing of the given sellers to be reloaded"""
+        with self._lock:
+            self._stale_sellers.update(seller_ids)
+
+    def invalidate(self):
+        """Force a full rebuild on the next query"""
+        with self._lock:
+            self._built_at = None
+
+    def is_warm(self):
+        """Whether queries can be answered without a full rebuild first"""
+        built_at = self._built_at
+        return built_at is not None and time.monotonic() - built_at <= self.refresh_seconds
+
+    def within_radius(self, latitude, longitude, radius_km, wait=True):
+        """
+        Find available listings whose seller is within a radius
+
+        With wait=False a cold index, one never built or due for its periodic
+        rebuild, does not hold up the caller: the rebuild starts on a
+        background thread and the query is answered from the database through
+        the seller bounding box instead.
+
+        Returns:
+            List of (distance_km, ListingPoint) tuples sorted by distance
+        """
+        if not wait and not self.is_warm():
+            self._rebuild_in_background(current_app._get_current_object())
+            return self._query_radius(latitude, longitude, radius_km)
+
+        with self._lock:
+            self._ensure_fresh()
+            return self._grid.within_radius(latitude, longitude, radius_km)
+
+    def nearest(self, latitude, longitude, k, max_distance=None, predicate=None):
+        """
+        Find the k closest available listings matching a predicate
+
+        Returns:
+            List of (distance_km, ListingPoint) tuples sorted by distance
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return self._grid.nearest(latitude, longitude, k, max_distance, predicate)
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds:
+            self._rebuild()
+        elif self._stale_listings or self._stale_sellers:
+            self._refresh()
+
+    def _query_radius(self, latitude, longitude, radius_km):
+        """within_radius answered by the database, without touching the grid"""
+        points = [ListingPoint(*row) for row in self._load(*bounding_box_filter(latitude, longitude, radius_km))]
+        return _by_distance(latitude, longitude, points, radius_km)
+
+    def _rebuild_in_background(self, app):
+        """Start a full rebuild on a daemon thread unless one is already running"""
+        with self._warmer_lock:
+            if self._warmer is None or not self._warmer.is_alive():
+                self._warmer = threading.Thread(target=self._warm, args=(app,), name='listing-index', daemon=True)
+                self._warmer.start()
+
+    def _warm(self, app):
+        with app.app_context():
+            try:
+                with self._lock:
+                    if not self.is_warm():
+                        self._rebuild()
+            except Exception as e:
+                logging.error(f"Listing index rebuild failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    def _load(self, *criteria):
+        return db.session.query(
+            RiceListing.id, RiceListing.seller_id, User.latitude, User.longitude,
+            RiceListing.rice_type, RiceListing.quantity, RiceListing.price_per_kg
+        ).join(User, RiceListing.seller_id == User.id).filter(
+            RiceListing.is_available == True,
+            User.latitude.isnot(None),
+            User.longitude.isnot(None),
+            *criteria
+        ).all()
+
+    def _add(self, row):
+        point = ListingPoint(*row)
+        self._grid.insert(point.listing_id, point)
+        self._listings_by_seller[point.seller_id].add(point.listing_id)
+
+    def _remove(self, listing_id):
+        point = self._grid.get(listing_id)
+        if point is None:
+            return
+        self._grid.remove(listing_id)
+        self._listings_by_seller[point.seller_id].discard(listing_id)
+
+    def _rebuild(self):
+        self._grid.clear()
+        self._listings_by_seller.clear()
+        self._stale_listings.clear()
+        self._stale_sellers.clear()
+
+        for row in self._load():
+            self._add(row)
+        self._built_at = time.monotonic()
+
+    def _refresh(self):
+        listing_ids = set(self._stale_listings)
+        seller_ids = set(self._stale_sellers)
+        self._stale_listings.clear()
+        self._stale_sellers.clear()
+
+        for seller_id in seller_ids:
+            listing_ids.update(self._listings_by_seller.pop(seller_id, ()))
+        for listing_id in listing_ids:
+            self._remove(listing_id)
+
+        criteria = []
+        if listing_ids:
+            criteria.append(RiceListing.id.in_(listing_ids))
+        if seller_ids:
+            criteria.append(RiceListing.seller_id.in_(seller_ids))
+        for row in self._load(or_(*criteria)):
+            self._add(row)
+
+def _by_distance(latitude, longitude, points, radius_km):
+    """(distance_km, point) pairs for points within the radius, nearest first"""
+    if not points:
+        return []
+
+    distances, order = batch_distances(
+        latitude, longitude,
+        [point.latitude for point in points],
+        [point.longitude for point in points],
+        max_distance=radius_km
+    )
+    return [(float(distance), points[i]) for distance, i in zip(distances, order)]
+
+def bounding_box_filter(latitude, longitude, radius_km):
+    """
+    Build SQL criteria restricting sellers to the box around a radius
+
+    The box is a superset of the circle, so callers still check the exact
+    distance on the rows that survive. Queries must join RiceListing to User.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    return (
+        User.latitude.between(min_lat, max_lat),
+        User.longitude.between(min_lng, max_lng)
+    )
+
+# Shared per-process index used by the buyer routes
+listing_index = ListingLocationIndex()
+
+def _pending(session):
+    return session.info.setdefault('spatial_index_pending', {'listings': set(), 'sellers': set()})
+
+@event.listens_for(RiceListing, 'after_insert')
+@event.listens_for(RiceListing, 'after_update')
+@event.listens_for(RiceListing, 'after_delete')
+def _listing_changed(mapper, connection, target):
+    """Remember changed listings until the transaction commits"""
+    session = object_session(target)
+    if session is not None:
+        _pending(session)['listings'].add(target.id)
+
+@event.listens_for(User, 'after_update')
+def _seller_moved(mapper, connection, target):
+    """Remember sellers whose coordinates changed until the transaction commits"""
+    state = inspect(target)
+    if not (state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes()):
+        return
+
+    session = object_session(target)
+    if session is not None:
+        _pending(session)['sellers'].add(target.id)
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_pending(session):
+    """Mark committed changes stale so the next query reloads them"""
+    pending = session.info.pop('spatial_index_pending', None)
+    if pending:
+        listing_index.mark_listings(pending['listings'])
+        listing_index.mark_sellers(pending['sellers'])
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_pending(session):
+    """Drop changes that never made it to the database"""
+    session.info.pop('spatial_index_pending', None)
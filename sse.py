@@ -0,0 +1,58 @@
+"""
+Server-sent events for streamed chat responses
+
+A chat stream is a series of `token` events carrying {"text": ...} pieces of
+the answer as they arrive, then one `done` event with the saved message id,
+or an `error` event. Canned and fallback answers are cut into word-sized
+tokens so clients handle every answer the same way.
+"""
+import json
+import re
+
+from flask import Response, stream_with_context
+
+# Words plus their trailing whitespace, so joining the tokens restores the text
+_TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+def event(name, data):
+    """One SSE frame with a JSON payload"""
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def text_tokens(text, words_per_token=3):
+    """Split finished text into small tokens for streaming"""
+    words = _TOKEN_PATTERN.findall(text or '')
+    for start in range(0, len(words), words_per_token):
+        yield ''.join(words[start:start + words_per_token])
+
+def chat_stream(tokens, save):
+    """
+    Relay text tokens as SSE, then persist the complete answer
+
+    Args:
+        tokens: Iterable of response text pieces
+        save: Function taking the full response text and returning the saved
+            message id; not called if the client disconnects mid-stream
+
+    Yields:
+        SSE frames
+    """
+    parts = []
+    try:
+        for token in tokens:
+            if token:
+                parts.append(token)
+                yield event('token', {'text': token})
+        message_id = save(''.join(parts))
+    except Exception as e:
+        print(f"Error streaming chat response: {e}")
+        yield event('error', {'error': 'Sorry, I encountered an error. Please try again.'})
+        return
+    yield event('done', {'message_id': message_id})
+
+def sse_response(frames):
+    """Streaming text/event-stream response that proxies should not buffer"""
+    return Response(
+        stream_with_context(frames),
+        content_type='text/event-stream; charset=utf-8',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,93 @@
+"""
+Shared fixtures
+
+application.py creates the app, its database and the sample data when it is
+imported, and the caches open their files on first use, so every path is
+pointed at a temporary directory before anything imports them.
+"""
+import itertools
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix='greenbridge-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DIR, 'app.db')}"
+os.environ['SNAPSHOT_CACHE_PATH'] = os.path.join(TEST_DIR, 'snapshots.db')
+os.environ['GEOCODE_CACHE_PATH'] = os.path.join(TEST_DIR, 'geocode.db')
+os.environ['RESPONSE_CACHE_PATH'] = os.path.join(TEST_DIR, 'responses.db')
+os.environ['CHAT_JOBS_PATH'] = os.path.join(TEST_DIR, 'chat_jobs.db')
+os.environ['PRICE_MODEL_PATH'] = os.path.join(TEST_DIR, 'price_model.json')
+# Chat always takes the offline fallback path
+os.environ.pop('GOOGLE_API_KEY', None)
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from application import app as flask_app
+from models import db, User, RiceListing
+
+BUYER_ID = 8
+SELLER_ID = 1
+
+_mobile_numbers = itertools.count(7000000000)
+# Hashed once: the default scrypt hash costs ~100 ms per seller
+_PASSWORD_HASH = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+        db.session.remove()
+
+@pytest.fixture
+def client_as(app):
+    """Test client factory, logged in as the given user id"""
+    def login(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+    return login
+
+@pytest.fixture
+def make_seller(app_context):
+    """Create and commit a seller; coordinates are required so nothing is geocoded"""
+    def create(latitude, longitude, location='Hyderabad, Telangana', **fields):
+        seller = User(
+            full_name=fields.pop('full_name', 'Test Farmer'),
+            mobile_number=str(next(_mobile_numbers)),
+            location=location,
+            latitude=latitude,
+            longitude=longitude,
+            user_type='seller',
+            password_hash=_PASSWORD_HASH,
+            **fields
+        )
+        db.session.add(seller)
+        db.session.commit()
+        return seller
+    return create
+
+@pytest.fixture
+def make_listing(app_context):
+    """Create and commit a listing"""
+    def create(seller, rice_type='Basmati', price_per_kg=60.0, quantity=1000.0, **fields):
+        listing = RiceListing(
+            seller_id=seller.id,
+            rice_type=rice_type,
+            price_per_kg=price_per_kg,
+            quantity=quantity,
+            quality_grade=fields.pop('quality_grade', 'A'),
+            is_available=fields.pop('is_available', True),
+            **fields
+        )
+        db.session.add(listing)
+        db.session.commit()
+        return listing
+    return create
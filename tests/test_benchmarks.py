@@ -0,0 +1,60 @@
+import copy
+import json
+
+import pytest
+
+from benchmarks.run import compare_results, format_table
+
+CASE = {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'mean_ms': 12.0, 'queries': 2, 'peak_kb': 500.0}
+
+@pytest.fixture
+def baseline():
+    return {'scale': 'small', 'rows': {'listings': 5000}, 'iterations': 50,
+            'cases': {'api_search': dict(CASE), 'login': {'error': '/auth/login returned 500'}}}
+
+def _with(baseline, **changes):
+    current = copy.deepcopy(baseline)
+    current['cases']['api_search'].update(changes)
+    return current
+
+def test_identical_results_do_not_regress(baseline):
+    assert compare_results(baseline, copy.deepcopy(baseline), 0.25) == []
+
+@pytest.mark.parametrize('changes, expected', [
+    ({'p95_ms': 26.0}, [('api_search', 'p95_ms', 20.0, 26.0)]),
+    ({'p95_ms': 24.0}, []),
+    ({'queries': 3}, [('api_search', 'queries', 2, 3)]),
+    ({'queries': 1}, []),
+    ({'peak_kb': 700.0}, [('api_search', 'peak_kb', 500.0, 700.0)]),
+])
+def test_regressions_beyond_the_threshold(baseline, changes, expected):
+    assert compare_results(baseline, _with(baseline, **changes), 0.25) == expected
+
+def test_small_absolute_changes_are_noise(baseline):
+    baseline['cases']['api_search'].update(p50_ms=0.1, peak_kb=10.0)
+    assert compare_results(baseline, _with(baseline, p50_ms=0.5, peak_kb=60.0), 0.25) == []
+
+def test_new_failures_regress_but_new_cases_do_not(baseline):
+    current = copy.deepcopy(baseline)
+    current['cases']['api_search'] = {'error': 'boom'}
+    current['cases']['new_case'] = dict(CASE)
+    assert compare_results(baseline, current, 0.25) == [('api_search', 'error', None, 'boom')]
+
+def test_format_table_lists_every_case(baseline):
+    table = format_table(baseline)
+    assert 'api_search' in table and 'failed: /auth/login returned 500' in table
+
+def test_committed_baseline_measures_every_case(app):
+    from benchmarks.cases import build_cases
+    from benchmarks.run import baseline_path
+
+    with open(baseline_path('small')) as f:
+        cases = json.load(f)['cases']
+    assert set(cases) == {name for name, _ in build_cases(app)}
+    assert all('error' not in row and row['p95_ms'] > 0 for row in cases.values())
+
+def test_every_case_runs_against_the_app(app):
+    from benchmarks.cases import build_cases
+
+    for name, run in build_cases(app):
+        run()
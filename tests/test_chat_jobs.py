@@ -0,0 +1,67 @@
+import pytest
+
+import chat_jobs as module
+from chat_jobs import ChatJobQueue, DONE, FAILED, GENERATION_FAILED, USER_NOT_FOUND
+from conftest import BUYER_ID, SELLER_ID
+from models import db, ChatMessage
+
+@pytest.fixture
+def queue(tmp_path):
+    return ChatJobQueue(str(tmp_path / 'jobs.db'), workers=2, generate=lambda message, user: f"{user.id}: {message}")
+
+def test_jobs_are_answered_and_saved(app, app_context, queue):
+    job = queue.submit(BUYER_ID, 'price of ponni?', app=app)
+    assert job['status'] in (module.QUEUED, module.RUNNING, DONE)
+
+    job = queue.wait(job['id'], 5)
+    assert (job['status'], job['response']) == (DONE, f'{BUYER_ID}: price of ponni?')
+    assert db.session.get(ChatMessage, job['message_id']).response == job['response']
+    assert queue.counts() == {DONE: 1}
+
+def test_failures_store_an_error_code(app, app_context, queue):
+    def generate(message, user):
+        raise RuntimeError('model unavailable')
+    queue.generate = generate
+
+    assert queue.wait(queue.submit(BUYER_ID, 'hello', app=app)['id'], 5)['error'] == GENERATION_FAILED
+    assert queue.wait(queue.submit(10 ** 6, 'hello', app=app)['id'], 5)['error'] == USER_NOT_FOUND
+
+def test_wait_times_out_on_unfinished_jobs(app, queue):
+    queue.generate = lambda message, user: None
+    queue.workers = 0
+    job = queue.submit(BUYER_ID, 'hello', app=app)
+    assert queue.wait(job['id'], 0.05)['status'] == module.QUEUED
+    assert queue.wait('missing', 0.05) is None
+
+@pytest.fixture
+def client(client_as):
+    return client_as(BUYER_ID)
+
+def test_chat_api_queues_and_long_polls(client):
+    response = client.post('/ai/api/chat', json={'message': 'What is the price of Basmati?'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.headers['Location'].endswith(f'/ai/api/chat/jobs/{job_id}')
+
+    result = client.get(f'/ai/api/chat/jobs/{job_id}?wait=10').get_json()
+    assert result['status'] == DONE and 'Basmati' in result['response']
+
+@pytest.mark.parametrize('wait', ['nan', 'NaN', 'inf', '-inf', 'soon'])
+def test_non_finite_waits_are_rejected(client, wait):
+    job_id = client.post('/ai/api/chat', json={'message': 'hello'}).get_json()['job_id']
+    assert client.get(f'/ai/api/chat/jobs/{job_id}?wait={wait}').status_code == 400
+
+def test_jobs_are_private(client, client_as):
+    job_id = client.post('/ai/api/chat', json={'message': 'hello'}).get_json()['job_id']
+    assert client_as(SELLER_ID).get(f'/ai/api/chat/jobs/{job_id}').status_code == 404
+
+def test_failed_jobs_report_a_translated_message(client, monkeypatch):
+    def generate(message, user):
+        raise RuntimeError('model unavailable')
+    monkeypatch.setattr(module.chat_jobs, 'generate', generate)
+
+    job_id = client.post('/ai/api/chat', json={'message': 'hello'}).get_json()['job_id']
+    result = client.get(f'/ai/api/chat/jobs/{job_id}?wait=10', headers={'Accept-Language': 'hi'}).get_json()
+    assert result['status'] == FAILED
+    assert result['error_code'] == GENERATION_FAILED
+    assert result['error']
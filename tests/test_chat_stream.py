@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+from conftest import BUYER_ID
+from models import db, ChatMessage
+from sse import chat_stream, text_tokens
+
+def _chunk(*texts):
+    parts = [SimpleNamespace(text=text) for text in texts]
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+
+# Last chunk of a stream: a finish reason and no parts; its .text would raise ValueError
+FINAL_CHUNK = _chunk()
+
+def _events(body):
+    events = []
+    for frame in body.strip().split('\n\n'):
+        name, data = frame.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Answer Gemini calls with the given chunks, raising any exception among them"""
+    items = []
+
+    def generate_content(prompt, stream=False):
+        for item in items:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    monkeypatch.setattr(ai_service, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(ai_service.genai, 'GenerativeModel',
+                        lambda name: SimpleNamespace(generate_content=generate_content))
+    return items
+
+@pytest.fixture
+def user():
+    return SimpleNamespace(full_name='Test Buyer', user_type='buyer', location='Hyderabad')
+
+def test_streams_gemini_chunks(app_context, gemini, user):
+    gemini += [_chunk('Basmati is '), _chunk('₹65', '/kg'), FINAL_CHUNK]
+    assert list(ai_service.stream_ai_response('price of basmati', user)) == ['Basmati is ', '₹65/kg']
+
+def test_falls_back_when_gemini_fails_before_any_text(app_context, gemini, user):
+    gemini += [FINAL_CHUNK, RuntimeError('quota exceeded')]
+    answer = ''.join(ai_service.stream_ai_response('price of basmati', user))
+    assert 'Basmati' in answer
+
+def test_failure_mid_stream_raises(app_context, gemini, user):
+    gemini += [_chunk('Basmati is '), RuntimeError('connection reset')]
+    tokens = ai_service.stream_ai_response('price of basmati', user)
+    assert next(tokens) == 'Basmati is '
+    with pytest.raises(RuntimeError):
+        next(tokens)
+
+def test_chat_stream_reports_errors_without_saving():
+    def tokens():
+        yield 'Basmati is '
+        raise RuntimeError('connection reset')
+
+    saved = []
+    events = _events(''.join(chat_stream(tokens(), saved.append)))
+    assert [name for name, _ in events] == ['token', 'error']
+    assert saved == []
+
+def test_text_tokens_rejoin_to_the_text():
+    text = 'Basmati  is ₹65/kg\nin हैदराबाद today. '
+    assert ''.join(text_tokens(text)) == text
+
+def test_stream_endpoint_saves_the_complete_answer(client_as, app_context, gemini):
+    gemini += [_chunk('Ponni is '), _chunk('₹42/kg'), FINAL_CHUNK]
+    response = client_as(BUYER_ID).post('/ai/chat/stream', json={'message': 'ponni price?'})
+
+    assert response.content_type.startswith('text/event-stream')
+    events = _events(response.get_data(as_text=True))
+    assert events[-1][0] == 'done'
+    assert ''.join(data['text'] for name, data in events if name == 'token') == 'Ponni is ₹42/kg'
+    assert db.session.get(ChatMessage, events[-1][1]['message_id']).response == 'Ponni is ₹42/kg'
+
+def test_stream_endpoint_does_not_save_a_truncated_answer(client_as, app_context, gemini):
+    gemini += [_chunk('Ponni is '), RuntimeError('connection reset')]
+    before = ChatMessage.query.filter_by(user_id=BUYER_ID).count()
+    events = _events(client_as(BUYER_ID).post('/ai/chat/stream', json={'message': 'ponni?'}).get_data(as_text=True))
+
+    assert events[-1][0] == 'error'
+    assert ChatMessage.query.filter_by(user_id=BUYER_ID).count() == before
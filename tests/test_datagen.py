@@ -0,0 +1,58 @@
+import pytest
+from flask import Flask
+from sqlalchemy import select
+
+import datagen
+from market_stats import market_summary
+from models import db, User, RiceListing, ChatMessage, PriceEvent
+
+SIZES = {'users': 60, 'listings': 200, 'chat_messages': 30, 'analyses': 10, 'days': 30, 'chunk_size': 64}
+
+def _generate(path, seed):
+    """Generate a marketplace into a fresh database; returns its rows and summary"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        counts = datagen.generate(seed=seed, echo=lambda message: None, **SIZES)
+        rows = {
+            'users': db.session.execute(
+                select(User.mobile_number, User.location, User.latitude, User.longitude, User.user_type)
+                .order_by(User.id)).all(),
+            'listings': db.session.execute(
+                select(RiceListing.seller_id, RiceListing.rice_type, RiceListing.price_per_kg,
+                       RiceListing.quantity, RiceListing.quality_grade, RiceListing.is_available)
+                .order_by(RiceListing.id)).all(),
+            'messages': db.session.execute(select(ChatMessage.user_id, ChatMessage.message).order_by(ChatMessage.id)).all(),
+            'events': db.session.query(PriceEvent).count(),
+        }
+        summary = market_summary()
+        db.session.remove()
+    return counts, rows, summary
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('datagen')
+    return [_generate(directory / name, seed) for name, seed in (('a.db', 7), ('b.db', 7), ('c.db', 8))]
+
+def test_same_seed_gives_the_same_rows(generated):
+    (_, first, _), (_, second, _), (_, other, _) = generated
+    assert first == second
+    assert first['listings'] != other['listings']
+
+def test_row_counts_and_shape(generated):
+    counts, rows, summary = generated[0]
+    assert counts['listings'] == len(rows['listings']) == rows['events'] == SIZES['listings']
+    assert len(rows['users']) == SIZES['users']
+    assert len(rows['messages']) == SIZES['chat_messages']
+    assert len({mobile for mobile, *_ in rows['users']}) == SIZES['users']
+    assert all(mobile.startswith(datagen.MOBILE_PREFIX) for mobile, *_ in rows['users'])
+    sellers = {index + 1 for index, user in enumerate(rows['users']) if user.user_type == 'seller'}
+    assert {listing.seller_id for listing in rows['listings']} <= sellers
+    assert set(summary) <= set(datagen.RICE_TYPES)
+
+def test_aggregates_are_rebuilt_after_the_bulk_load(generated):
+    _, rows, summary = generated[0]
+    available = [listing for listing in rows['listings'] if listing.is_available]
+    assert sum(stats['listings_count'] for stats in summary.values()) == len(available)
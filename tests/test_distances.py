@@ -0,0 +1,31 @@
+import random
+
+import numpy as np
+
+from utils import batch_distances, calculate_distance
+
+def test_batch_distances_match_scalar_haversine():
+    rng = random.Random(3)
+    lats = [rng.uniform(-60, 60) for _ in range(500)]
+    lngs = [rng.uniform(-180, 180) for _ in range(500)]
+
+    distances, order = batch_distances(17.385, 78.4867, lats, lngs)
+
+    expected = [calculate_distance(17.385, 78.4867, lat, lng) for lat, lng in zip(lats, lngs)]
+    assert np.allclose(distances, [expected[i] for i in order])
+    assert list(distances) == sorted(distances)
+    assert sorted(order) == list(range(500))
+
+def test_max_distance_drops_far_points_and_keeps_indices():
+    lats = [17.385, 28.6139, 17.45, 13.0827]
+    lngs = [78.4867, 77.2090, 78.40, 80.2707]
+
+    distances, order = batch_distances(17.385, 78.4867, lats, lngs, max_distance=20)
+
+    assert list(order) == [0, 2]
+    assert distances[0] == 0
+    assert distances[1] <= 20
+
+def test_empty_input():
+    distances, order = batch_distances(17.385, 78.4867, [], [], max_distance=10)
+    assert len(distances) == 0 and len(order) == 0
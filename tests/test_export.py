@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import export
+from conftest import BUYER_ID
+from models import db, ChatMessage, RiceListing
+from utils import calculate_distance
+
+def _ndjson(response):
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_chat_activity_day_is_typed_as_a_date(monkeypatch):
+    monkeypatch.setattr(export, 'stream_chunks', lambda statement: statement)
+    assert export._temporal_keys(export.chat_activity_chunks()) == ['day']
+
+def test_chat_activity_counts_messages_and_users_per_day(client_as, app_context):
+    for user_id, created_at in ((1, datetime(2026, 2, 3, 9)), (2, datetime(2026, 2, 3, 18)),
+                                (1, datetime(2026, 2, 3, 20)), (1, datetime(2026, 2, 4, 8))):
+        db.session.add(ChatMessage(user_id=user_id, message='private', response='', created_at=created_at))
+    db.session.commit()
+
+    rows = _ndjson(client_as(BUYER_ID).get('/ai/export/chat-activity.ndjson?since=2026-02-03'))
+    february = [row for row in rows if row['day'].startswith('2026-02-0')]
+    assert february == [{'day': '2026-02-03', 'messages': 3, 'users': 2},
+                        {'day': '2026-02-04', 'messages': 1, 'users': 1}]
+    assert all('private' not in json.dumps(row) for row in rows)
+
+def test_listing_export_matches_the_radius_filter(client_as, make_seller, make_listing):
+    make_listing(make_seller(17.45, 78.6), rice_type='Basmati')
+    make_listing(make_seller(19.0, 78.6), rice_type='Basmati')
+    rows = _ndjson(client_as(BUYER_ID).get('/buyer/export/listings.ndjson?max_distance=100&rice_type=Basmati'))
+
+    assert rows and all(row['rice_type'] == 'Basmati' and row['distance_km'] <= 100 for row in rows)
+    assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+    expected = {
+        listing.id for listing in RiceListing.query.filter_by(rice_type='Basmati', is_available=True)
+        if listing.seller.latitude is not None
+        and calculate_distance(17.385, 78.4867, listing.seller.latitude, listing.seller.longitude) <= 100
+    }
+    assert {row['id'] for row in rows} == expected
+    datetime.fromisoformat(rows[0]['created_at'])
+
+def test_csv_export_has_a_header_and_one_line_per_row(client_as):
+    response = client_as(BUYER_ID).get('/ai/export/market-analysis.csv')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename="market_analysis.csv"'
+    header, *rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert header == export.column_names(export.MARKET_ANALYSIS_COLUMNS)
+    assert all(len(row) == len(header) for row in rows)
+
+@pytest.mark.parametrize('url', ['/buyer/export/listings.xml', '/ai/export/chat-activity.ndjson?since=yesterday'])
+def test_bad_export_requests(client_as, url):
+    assert client_as(BUYER_ID).get(url).status_code == 400
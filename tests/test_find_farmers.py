@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import BUYER_ID
+from models import db, User, RiceListing
+from utils import calculate_distance
+
+def _find(client, **payload):
+    response = client.post('/buyer/api/find-farmers', json=payload)
+    assert response.status_code == 200
+    return response.get_json()['farmers']
+
+def test_returns_k_nearest_matching_listings(client_as, make_seller, make_listing):
+    for offset in (0.05, 0.1, 0.2, 0.4, 0.8):
+        seller = make_seller(17.385 + offset, 78.4867)
+        make_listing(seller, rice_type='Jasmine', quantity=2000)
+        make_listing(seller, rice_type='Jasmine', quantity=10)
+
+    farmers = _find(client_as(BUYER_ID), riceType='Jasmine', quantity=500, k=3)
+
+    buyer = db.session.get(User, BUYER_ID)
+    candidates = sorted(
+        (calculate_distance(buyer.latitude, buyer.longitude, l.seller.latitude, l.seller.longitude), l.id)
+        for l in RiceListing.query.filter(RiceListing.rice_type == 'Jasmine', RiceListing.quantity >= 500,
+                                          RiceListing.is_available == True)
+    )
+    assert [farmer['listing_id'] for farmer in farmers] == [listing_id for _, listing_id in candidates[:3]]
+    assert all(farmer['available_quantity'] >= 500 for farmer in farmers)
+
+def test_unit_conversion_and_radius(client_as, make_seller, make_listing):
+    seller = make_seller(17.40, 78.49)
+    listing = make_listing(seller, rice_type='Parboiled', quantity=1500)
+
+    client = client_as(BUYER_ID)
+    assert listing.id in [f['listing_id'] for f in _find(client, riceType='Parboiled', quantity=1, unit='ton')]
+    assert listing.id not in [f['listing_id'] for f in _find(client, riceType='Parboiled', quantity=2, unit='ton')]
+    assert _find(client, riceType='Parboiled', quantity=1, maxDistance=0.1) == []
+
+@pytest.mark.parametrize('payload', [
+    {'k': 'many'}, {'k': 0}, {'k': -3},
+    {'maxDistance': 'inf'}, {'maxDistance': 'nan'}, {'maxDistance': '-inf'}, {'maxDistance': -5}, {'maxDistance': 0},
+])
+def test_rejects_bad_parameters(client_as, payload):
+    response = client_as(BUYER_ID).post('/buyer/api/find-farmers', json=payload)
+    assert response.status_code == 400
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import Column, Integer, String, Text, create_engine, text
+from sqlalchemy.orm import DeclarativeBase, Session
+
+from fulltext import ListingSearchIndex
+
+class Base(DeclarativeBase):
+    pass
+
+class Listing(Base):
+    __tablename__ = 'listing'
+    id = Column(Integer, primary_key=True)
+    description = Column(Text)
+    variety = Column(String(100))
+
+DESCRIPTIONS = {
+    1: ('उच्च गुणवत्ता बासमती चावल', 'बासमती'),
+    2: ('నాణ్యమైన సోనా మసూరి బియ్యం', 'సోనా మసూరి'),
+    3: ('Aged basmati, long grain', 'Basmati 1121'),
+    4: ('Café-style crème ponni', 'Ponni'),
+}
+
+@pytest.fixture
+def search(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    index = ListingSearchIndex(Listing, ('description', 'variety'))
+    with Session(engine) as session:
+        session.add_all(Listing(id=i, description=d, variety=v) for i, (d, v) in DESCRIPTIONS.items())
+        session.commit()
+    index.install(engine)
+
+    session = Session(engine)
+    def run(search_text):
+        query, rank = index.match(session.query(Listing.id), search_text)
+        return sorted(row.id for row in query.add_columns(rank).all())
+    run.engine = engine
+    run.session = session
+    yield run
+    session.close()
+
+@pytest.mark.parametrize('search_text, expected', [
+    ('बासमती', [1]),
+    ('चाव', [1]),           # prefix of चावल
+    ('गुणवत्ता चावल', [1]),
+    ('समत', []),            # fragment from inside बासमती, not a word prefix
+    ('బియ్యం', [2]),
+    ('మసూ', [2]),           # prefix of మసూరి
+    ('సూరి', []),
+    ('basmati', [3]),
+    ('cafe creme', [4]),
+    ('', []),
+])
+def test_multilingual_matching(search, search_text, expected):
+    assert search(search_text) == expected
+
+def test_words_are_indexed_whole(search):
+    with search.engine.connect() as conn:
+        conn.execute(text("CREATE VIRTUAL TABLE vocab USING fts5vocab(listing_fts, row)"))
+        terms = {row[0] for row in conn.execute(text("SELECT term FROM vocab"))}
+    assert {'बासमती', 'चावल', 'गुणवत्ता', 'బియ్యం', 'మసూరి', 'basmati'} <= terms
+
+def test_triggers_keep_the_index_in_sync(search):
+    session = search.session
+    session.add(Listing(id=5, description='ఉప్పుడు బియ్యం', variety='Parboiled'))
+    session.commit()
+    assert search('ఉప్పుడు') == [5]
+
+    session.get(Listing, 5).description = 'सेला चावल'
+    session.commit()
+    assert search('ఉప్పుడు') == []
+    assert search('सेला') == [5]
+
+    session.delete(session.get(Listing, 5))
+    session.commit()
+    assert search('सेला') == []
+
+def test_index_built_with_an_old_tokenizer_is_rebuilt(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO listing (id, description, variety) VALUES (1, 'बासमती चावल', '')"))
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE listing_fts USING fts5(description, variety, content='listing', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+        conn.execute(text("INSERT INTO listing_fts(listing_fts) VALUES ('rebuild')"))
+
+    index = ListingSearchIndex(Listing, ('description', 'variety'))
+    index.install(engine)
+
+    with Session(engine) as session:
+        query, _ = index.match(session.query(Listing.id), 'चाव')
+        assert [row.id for row in query] == [1]
+        query, _ = index.match(session.query(Listing.id), 'समत')
+        assert query.all() == []
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import gazetteer
+import utils
+from geocache import GeocodeCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(str(tmp_path / 'geocode.db'), ttl=60, negative_ttl=10, max_entries=3)
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+@pytest.fixture
+def nominatim(monkeypatch, cache):
+    """Record Nominatim calls and answer them with canned results"""
+    calls = []
+    answers = {}
+
+    def get(url, params=None, deadline=None):
+        calls.append(params)
+        return FakeResponse(answers.get(params.get('q'), []))
+
+    monkeypatch.setattr(utils, 'geocode_cache', cache)
+    monkeypatch.setattr(utils.http_client, 'get', get)
+    get.calls = calls
+    get.answers = answers
+    return get
+
+@pytest.mark.parametrize('text, expected', [
+    ('Warangal, Telangana', (17.9689, 79.5941)),
+    ('  warangal ,  TS ', (17.9689, 79.5941)),
+    ('హైదరాబాద్', (17.385, 78.4867)),
+    ('Guntur, Andhra Pradesh, India', (16.3067, 80.4365)),
+    ('Nowhere, Telangana', None),
+])
+def test_gazetteer_lookup(text, expected):
+    assert gazetteer.lookup(text) == expected
+
+def test_gazetteer_strict_lookup_rejects_ambiguous_addresses():
+    assert gazetteer.lookup('Warangal, Guntur') is None
+    assert gazetteer.lookup('Warangal, Guntur', strict=False) == (17.9689, 79.5941)
+
+def test_cache_hits_misses_and_expiry(cache, monkeypatch):
+    cache.set('search:a', [1.0, 2.0])
+    cache.set('search:b', None)
+    assert cache.get('search:a') == (True, [1.0, 2.0])
+    assert cache.get('search:b') == (True, None)
+    assert cache.get('search:c') == (False, None)
+
+    # Negative results expire first
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 30)
+    assert cache.get('search:a') == (True, [1.0, 2.0])
+    assert cache.get('search:b') == (False, None)
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert cache.get('search:a') == (False, None)
+
+def test_cache_evicts_least_recently_used(cache, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, 'time', lambda: next(clock))
+    for key in 'abc':
+        cache.set(key, key)
+    cache.get('a')
+    cache.set('d', 'd')
+
+    assert cache.get('b') == (False, None)
+    assert all(cache.get(key)[0] for key in 'acd')
+
+def test_known_places_never_reach_nominatim(nominatim):
+    assert utils.geocode_location('Karimnagar') == (18.4386, 79.1288)
+    assert utils.geocode_location('') is None
+    assert nominatim.calls == []
+
+def test_nominatim_answers_are_cached(nominatim):
+    nominatim.answers['Some Village, Nalgonda'] = [{'lat': '17.1', 'lon': '79.3'}]
+
+    assert utils.geocode_location('Some Village, Nalgonda') == (17.1, 79.3)
+    assert utils.geocode_location('some village,  nalgonda') == (17.1, 79.3)
+    assert utils.geocode_location('Atlantis') is None
+    assert utils.geocode_location('Atlantis') is None
+    assert len(nominatim.calls) == 2
+
+def test_lookup_cached_location_is_offline(nominatim):
+    assert utils.lookup_cached_location('Atlantis') == (False, None)
+    utils.geocode_location('Atlantis')
+    assert utils.lookup_cached_location('Atlantis') == (True, None)
+    assert len(nominatim.calls) == 1
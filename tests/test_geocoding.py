@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+import geocoding
+import utils
+from models import db, User
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """Fail any Nominatim call; these tests only use gazetteer places"""
+    def get(*args, **kwargs):
+        raise AssertionError('unexpected network call')
+    monkeypatch.setattr(utils.http_client, 'get', get)
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Capture what would be handed to the background worker"""
+    items = []
+    monkeypatch.setattr(geocoding.geocoding_queue, 'enqueue', lambda pending, app=None: items.extend(pending))
+    return items
+
+def test_new_users_without_coordinates_are_queued(make_seller, queued):
+    user = make_seller(None, None, location='Khammam, Telangana')
+    make_seller(17.0575, 79.2684, location='Nalgonda')
+
+    assert queued == [(user.id, 'Khammam, Telangana')]
+
+def test_relocated_users_are_queued(make_seller, queued):
+    user = make_seller(17.2473, 80.1514, location='Khammam')
+
+    user.location = 'Warangal'
+    db.session.commit()
+    user.location = 'Nizamabad'
+    user.latitude, user.longitude = 18.6725, 78.0941
+    db.session.commit()
+
+    assert queued == [(user.id, 'Warangal')]
+
+def test_rolled_back_users_are_not_queued(app_context, queued):
+    db.session.add(User(full_name='Test Farmer', mobile_number='6999999999', location='Khammam',
+                        user_type='seller', password_hash='x'))
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+
+    assert queued == []
+
+def test_queue_skips_users_that_moved_again(make_seller, queued):
+    first = make_seller(None, None, location='Khammam')
+    second = make_seller(None, None, location='Warangal')
+    second.location = 'Medak'
+    second.latitude = second.longitude = None
+    db.session.commit()
+
+    geocoding.GeocodingQueue(rate=0)._process({first.id: 'Khammam', second.id: 'Warangal'})
+
+    assert (first.latitude, first.longitude) == (17.2473, 80.1514)
+    assert second.latitude is None
+
+def test_backfill_resumes_after_the_last_finished_user(app, make_seller, queued):
+    users = [make_seller(None, None, location=location)
+             for location in ('Khammam', 'Warangal', 'Medak', 'Atlantis-on-Sea')]
+    # Atlantis is not in the gazetteer: answer it from the cache, as a known miss
+    utils.geocode_cache.set('search:atlantis on sea', None)
+
+    progress_path = os.path.join(app.instance_path, geocoding.BACKFILL_PROGRESS_FILE)
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(progress_path, 'w') as f:
+        json.dump({'last_id': users[0].id}, f)
+
+    processed, geocoded = geocoding.backfill(batch_size=2, rate=0, echo=lambda message: None)
+
+    assert users[0].latitude is None
+    assert (users[1].latitude, users[2].latitude) == (17.9689, 18.0460)
+    assert users[3].latitude is None
+    assert processed >= 3 and geocoded >= 2
+    assert not os.path.exists(progress_path)
+
+def test_rate_limiter_spaces_calls(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr(geocoding.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(geocoding.time, 'sleep', sleeps.append)
+
+    limiter = geocoding.RateLimiter(2)
+    for _ in range(3):
+        limiter.wait()
+
+    assert sleeps == [0.5, 1.0]
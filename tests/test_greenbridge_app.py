@@ -0,0 +1,42 @@
+"""Routes of the deployed app (main:app), which has its own models and database"""
+import importlib
+
+import pytest
+
+@pytest.fixture(scope='module')
+def deployed(tmp_path_factory):
+    path = tmp_path_factory.mktemp('deployed') / 'greenbridge.db'
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('DATABASE_URL', f"sqlite:///{path}")
+        module = importlib.import_module('greenbridge_app')
+    module.app.config['TESTING'] = True
+    return module
+
+@pytest.fixture(scope='module')
+def seller_client(deployed):
+    with deployed.app.app_context():
+        seller = deployed.User(full_name='Deployed Farmer', mobile_number='7888888888',
+                               location='Guntur, Andhra Pradesh', password_hash='x', user_type='seller')
+        deployed.db.session.add(seller)
+        deployed.db.session.commit()
+        seller_id = seller.id
+        deployed.db.session.remove()
+
+    client = deployed.app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(seller_id)
+        session['_fresh'] = True
+    return client
+
+@pytest.mark.parametrize('path', ['/seller/dashboard', '/api/search', '/api/search?q=basmati', '/search'])
+@pytest.mark.parametrize('cursor', ['!!not-base64!!', 'WzEsIDIsIDNd', 'ImFiYyI'])
+def test_bad_cursor_is_a_client_error(seller_client, path, cursor):
+    separator = '&' if '?' in path else '?'
+    response = seller_client.get(f"{path}{separator}cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+def test_search_without_cursor_succeeds(seller_client):
+    response = seller_client.get('/api/search')
+    assert response.status_code == 200
+    assert response.get_json()['success']
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import geohash
+import grid_stats
+from conftest import BUYER_ID
+from models import db
+
+# Remote enough (Andaman Sea) that no sample or generated seller shares its cells
+LATITUDE, LONGITUDE = 11.0, 95.0
+
+def test_geohash_known_values():
+    assert geohash.encode(42.605, -5.603, 5) == 'ezs42'
+    assert geohash.encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+
+def test_geohash_bounds_contain_the_point_and_nest():
+    cell = geohash.encode(17.385, 78.4867, 6)
+    min_lat, max_lat, min_lng, max_lng = geohash.bounds(cell)
+    assert min_lat <= 17.385 <= max_lat and min_lng <= 78.4867 <= max_lng
+    outer = geohash.bounds(cell[:4])
+    assert outer[0] <= min_lat and max_lat <= outer[1] and outer[2] <= min_lng and max_lng <= outer[3]
+    with pytest.raises(ValueError):
+        geohash.bounds('abc')  # 'a' is not in the alphabet
+
+def test_cells_in_box_cover_every_point():
+    box = (16.9, 17.8, 78.1, 79.3)
+    cells = set(geohash.cells_in_box(*box, 4))
+    rng = random.Random(3)
+    for _ in range(500):
+        latitude, longitude = rng.uniform(*box[:2]), rng.uniform(*box[2:])
+        assert geohash.encode(latitude, longitude, 4) in cells
+    with pytest.raises(ValueError):
+        geohash.cells_in_box(*box, 6, limit=10)
+
+@pytest.mark.parametrize('zoom, precision', [(0, 3), (5, 3), (6, 4), (11, 5), (18, 6)])
+def test_precision_for_zoom(zoom, precision):
+    assert grid_stats.precision_for_zoom(zoom) == precision
+
+def test_cells_follow_listings_and_sellers(make_seller, make_listing):
+    seller = make_seller(LATITUDE, LONGITUDE, location='')
+    make_listing(seller, rice_type='Ponni', price_per_kg=40.0, quantity=100)
+    make_listing(seller, rice_type='Ponni', price_per_kg=50.0, quantity=300)
+    make_listing(seller, rice_type='Basmati', price_per_kg=90.0)
+
+    for zoom in (4, 7, 10, 15):
+        stats = grid_stats.stats_at(LATITUDE, LONGITUDE, zoom)
+        ponni = stats['rice_types']['Ponni']
+        assert (ponni['listings_count'], ponni['average_price'], ponni['total_quantity']) == (2, 45.0, 400)
+        assert (ponni['min_price'], ponni['max_price']) == (40.0, 50.0)
+    assert set(grid_stats.stats_at(LATITUDE, LONGITUDE, 15, ['Basmati'])['rice_types']) == {'Basmati'}
+
+    seller.latitude, seller.longitude = LATITUDE + 2, LONGITUDE
+    db.session.commit()
+    assert grid_stats.stats_at(LATITUDE, LONGITUDE, 15)['rice_types'] == {}
+    assert grid_stats.stats_at(LATITUDE + 2, LONGITUDE, 15)['rice_types']['Ponni']['listings_count'] == 2
+
+def test_market_grid_api(client_as, make_seller, make_listing):
+    make_listing(make_seller(LATITUDE, LONGITUDE - 3, location=''), rice_type='Matta', price_per_kg=52.0)
+    cell = geohash.encode(LATITUDE, LONGITUDE - 3, 5)
+    client = client_as(BUYER_ID)
+
+    by_cell = client.get(f'/ai/api/market-grid?cell={cell},{cell[:4]}').get_json()
+    assert [entry['rice_types']['Matta']['listings_count'] for entry in by_cell['cells']] == [1, 1]
+
+    box = client.get('/ai/api/market-grid', query_string={
+        'min_lat': LATITUDE - 0.1, 'max_lat': LATITUDE + 0.1,
+        'min_lng': LONGITUDE - 3.1, 'max_lng': LONGITUDE - 2.9, 'zoom': 10}).get_json()
+    assert [entry['cell'] for entry in box['cells']] == [cell]
+
+    assert client.get('/ai/api/market-grid?min_lat=0&max_lat=40&min_lng=60&max_lng=100&zoom=18').status_code == 400
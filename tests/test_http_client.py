@@ -0,0 +1,103 @@
+import io
+import threading
+
+import pytest
+import requests
+
+import http_client as module
+from http_client import CircuitBreaker, CircuitOpenError, HttpClient
+
+URL = 'https://upstream.example/api'
+
+class FakeRaw:
+    def __init__(self, body):
+        self._body = io.BytesIO(body)
+
+    def read(self, amount=-1, decode_content=True):
+        return self._body.read(amount)
+
+class FakeSession:
+    """Stands in for requests.Session; raises or answers with the given status"""
+
+    def __init__(self, status=200, error=None):
+        self.status = status
+        self.error = error
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(kwargs)
+        if self.error:
+            raise self.error
+        response = requests.Response()
+        response.status_code = self.status
+        response.raw = FakeRaw(b'{"ok": true}')
+        return response
+
+@pytest.fixture
+def client():
+    client = HttpClient()
+    client.session = FakeSession()
+    return client
+
+def test_reads_the_body_and_records_stats(client):
+    response = client.get(URL, deadline=5)
+
+    assert response.json() == {'ok': True}
+    assert client.stats()['upstream.example']['requests'] == 1
+    assert client.stats()['upstream.example']['circuit'] == 'closed'
+
+def test_circuit_opens_after_repeated_failures_and_fails_fast(client):
+    client.session.error = requests.ConnectionError('refused')
+    for _ in range(module.FAILURE_THRESHOLD):
+        with pytest.raises(requests.ConnectionError):
+            client.get(URL)
+
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+    assert len(client.session.calls) == module.FAILURE_THRESHOLD
+    assert client.stats()['upstream.example']['rejected'] == 1
+
+def test_client_errors_do_not_count_against_the_upstream(client):
+    client.session.status = 404
+    for _ in range(module.FAILURE_THRESHOLD + 1):
+        client.get(URL)
+    assert client.stats()['upstream.example']['circuit'] == 'closed'
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+def test_trial_is_released_when_no_slot_frees_up(client):
+    breaker = client._breakers['upstream.example'] = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    semaphore = client._semaphores['upstream.example'] = threading.BoundedSemaphore(1)
+    semaphore.acquire()
+
+    with pytest.raises(requests.Timeout):
+        client.get(URL, deadline=0.01)
+    assert client.session.calls == []
+
+    # The trial was given up, so the next call may probe the upstream
+    semaphore.release()
+    assert client.get(URL).status_code == 200
+    assert breaker.state == 'closed'
+
+def test_slot_wait_uses_the_remaining_deadline(client, monkeypatch):
+    clock = iter(range(100, 200))
+    monkeypatch.setattr(module.time, 'monotonic', lambda: next(clock))
+    timeouts = []
+
+    class Semaphore:
+        def acquire(self, timeout):
+            timeouts.append(timeout)
+            return False
+
+    client._semaphores['upstream.example'] = Semaphore()
+    with pytest.raises(requests.Timeout):
+        client.get(URL, deadline=10)
+    assert timeouts and timeouts[0] < 10
@@ -0,0 +1,82 @@
+import random
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+from intents import (INTENT_KEYWORDS, INTENT_TRANSLITERATIONS, RICE_TYPE_NAMES,
+                     RICE_TYPE_TRANSLITERATIONS, KeywordAutomaton, match)
+
+SUBSTRINGS = (
+    [(keyword, ('intent', intent)) for intent, keywords in INTENT_KEYWORDS for keyword in keywords] +
+    [(name, ('rice_type', rice_type)) for rice_type, names in RICE_TYPE_NAMES.items() for name in names]
+)
+WHOLE_WORDS = (
+    [(keyword, ('intent', intent)) for intent, keywords in INTENT_TRANSLITERATIONS.items() for keyword in keywords] +
+    [(name, ('rice_type', rice_type)) for rice_type, names in RICE_TYPE_TRANSLITERATIONS.items() for name in names]
+)
+
+def _scan(text):
+    """The keyword scans the automaton replaced: substring tests and whole-word regexes"""
+    text = text.casefold()
+    found = [label for keyword, label in SUBSTRINGS for _ in re.finditer(f"(?={re.escape(keyword)})", text)]
+    found += [label for keyword, label in WHOLE_WORDS
+              for _ in re.finditer(rf"(?<![^\W_]){re.escape(keyword)}(?![^\W_])", text)]
+    return sorted(found)
+
+def _texts(count, seed=11):
+    """Random messages stitched from keywords, keyword fragments and filler"""
+    rng = random.Random(seed)
+    pieces = [keyword for keyword, _ in SUBSTRINGS + WHOLE_WORDS]
+    pieces += [piece[:rng.randint(1, len(piece))] for piece in pieces]
+    pieces += ['rice', 'hai', 'ka', 'ఎంత', 'क्या', 'selam', 'm', 'ing', '1']
+    for _ in range(count):
+        yield ''.join(rng.choice(pieces) + rng.choice(['', ' ', '', ',', '-'])
+                      for _ in range(rng.randint(1, 8)))
+
+def test_automaton_finds_what_the_scans_find():
+    automaton = KeywordAutomaton(SUBSTRINGS, whole_words=WHOLE_WORDS)
+    for text in _texts(3000):
+        assert sorted(automaton.find(text)) == _scan(text), text
+
+def test_automaton_reports_overlapping_keywords():
+    automaton = KeywordAutomaton([('he', 'a'), ('she', 'b'), ('hers', 'c'), ('his', 'd')])
+    assert automaton.find('ushers') == ['b', 'a', 'c']
+
+@pytest.mark.parametrize('message, intent, rice_types', [
+    ('What is the price of Basmati?', 'price', ['Basmati']),
+    ('बासमती का भाव क्या है?', 'price', ['Basmati']),
+    ('సోనా మసూరి ధర ఎంత?', 'price', ['Sona Masoori']),
+    ('Sona masuri kimat batao', 'price', ['Sona Masoori']),
+    ('पोन्नी बेचना है', 'sell', ['Ponni']),
+    ('జాస్మిన్ కొనాలి', 'buy', ['Jasmine']),
+    ('sela chawal kharidna hai', 'buy', ['Parboiled']),
+    ('Ukda rice ki gunvatta', 'quality', ['Parboiled']),
+    ('बाज़ार का रुझान', 'market', []),
+    ('I am selling brown rice and ponni', 'sell', ['Brown Rice', 'Ponni']),
+    ('Hello there', None, []),
+])
+def test_match_multilingual(message, intent, rice_types):
+    assert match(message) == (intent, rice_types)
+
+def test_match_prefers_higher_priority_intents():
+    assert match('I want to buy at a good price').intent == 'price'
+    assert match('grade of what I sell').intent == 'sell'
+
+@pytest.mark.parametrize('message', ['selam', 'Selam, how are you?', 'ukdaa', 'The Bhavani river', 'dharam'])
+def test_transliterations_only_match_whole_words(message):
+    assert match(message) == (None, [])
+
+def test_fallback_response_uses_matched_intent_and_rice_type():
+    market_data = {
+        rice_type: {'current_price': price, 'trend': 'stable', 'demand': 'high', 'price_range': '₹1-₹2',
+                    'listings_count': 3, 'total_quantity': 100}
+        for rice_type, price in [('Basmati', 90.0), ('Ponni', 55.0)]
+    }
+    user = SimpleNamespace(user_type='buyer')
+
+    response = ai_service.get_dynamic_fallback_response('पोन्नी का भाव?', user, market_data)
+    assert 'Ponni is currently ₹55.0/kg' in response
+    response = ai_service.get_dynamic_fallback_response('selam', user, market_data)
+    assert response.startswith('GreenBridge Live Market')
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import func, select
+
+import market_stats
+from models import db, RiceListing
+from queries import count_queries
+
+def _aggregates():
+    """Every aggregate table's rows, keyed by group, without timestamps"""
+    snapshot = {}
+    for grouping in market_stats.GROUPINGS:
+        table = grouping.table
+        for row in db.session.execute(select(table)).mappings():
+            if row['listings_count'] <= 0:
+                continue
+            key = (table.name, row['rice_type']) + tuple(row[name] for name in grouping.key_columns)
+            snapshot[key] = {
+                name: pytest.approx(row[name]) if row[name] is not None else None
+                for name in ('listings_count', 'price_sum', 'price_sum_squares', 'total_quantity',
+                             'price_min', 'price_max')
+            }
+    return snapshot
+
+def test_incremental_updates_match_a_rebuild(make_seller, make_listing):
+    seller = make_seller(17.9689, 79.5941, location='Warangal, Telangana')
+    other = make_seller(16.3067, 80.4365, location='Guntur, Andhra Pradesh')
+    cheap = make_listing(seller, rice_type='Ponni', price_per_kg=31.0, quantity=500)
+    dear = make_listing(seller, rice_type='Ponni', price_per_kg=97.0, quantity=200)
+    moved = make_listing(other, rice_type='Ponni', price_per_kg=55.0)
+    make_listing(other, rice_type='Basmati', price_per_kg=120.0)
+
+    # Remove the current extremes, reprice, toggle, move a seller and delete
+    cheap.price_per_kg = 64.0
+    dear.is_available = False
+    db.session.commit()
+    moved.rice_type = 'Jasmine'
+    other.location = 'Nellore, Andhra Pradesh'
+    other.latitude, other.longitude = 14.4426, 79.9865
+    db.session.commit()
+    dear.is_available = True
+    db.session.delete(cheap)
+    db.session.commit()
+
+    incremental = _aggregates()
+    market_stats.rebuild()
+    assert _aggregates() == incremental
+
+def test_market_summary_reflects_listing_writes(make_seller, make_listing):
+    before = market_stats.market_summary(['Jasmine']).get('Jasmine', {'listings_count': 0})
+    seller = make_seller(17.385, 78.4867)
+    listing = make_listing(seller, rice_type='Jasmine', price_per_kg=1000.0, quantity=10)
+
+    after = market_stats.market_summary(['Jasmine'])['Jasmine']
+    assert after['listings_count'] == before['listings_count'] + 1
+    assert after['max_price'] == 1000.0
+
+    listing.is_available = False
+    db.session.commit()
+    after = market_stats.market_summary(['Jasmine']).get('Jasmine', {'listings_count': 0, 'max_price': None})
+    assert after['listings_count'] == before['listings_count']
+    assert after['max_price'] != 1000.0
+
+def test_market_summary_matches_the_listings_table(app_context):
+    expected = {
+        row.rice_type: row for row in db.session.execute(
+            select(RiceListing.rice_type, func.count().label('count'), func.avg(RiceListing.price_per_kg).label('avg'),
+                   func.min(RiceListing.price_per_kg).label('min'), func.max(RiceListing.price_per_kg).label('max'),
+                   func.sum(RiceListing.quantity).label('quantity'))
+            .where(RiceListing.is_available == True).group_by(RiceListing.rice_type)
+        )
+    }
+    with count_queries(db.engine) as statements:
+        summary = market_stats.market_summary()
+
+    assert len(statements) == 1
+    assert set(summary) == set(expected)
+    for rice_type, stats in summary.items():
+        row = expected[rice_type]
+        assert stats['listings_count'] == row.count
+        assert stats['average_price'] == pytest.approx(row.avg)
+        assert (stats['min_price'], stats['max_price']) == (row.min, row.max)
+        assert stats['total_quantity'] == pytest.approx(row.quantity)
+        assert stats['price_stddev'] >= 0
+
+def test_market_summary_can_be_restricted(app_context):
+    assert set(market_stats.market_summary(['Basmati', 'Nonexistent'])) == {'Basmati'}
+
+@pytest.mark.parametrize('location, region', [
+    ('Warangal, Telangana', 'Telangana'),
+    ('Guntur', 'Andhra Pradesh'),
+    ('Somewhere', market_stats.DEFAULT_REGION),
+])
+def test_seller_regions(location, region):
+    assert market_stats.region_for(location) == region
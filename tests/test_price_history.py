@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+import pytest
+
+import price_history
+from models import db, PriceEvent, DailyPriceRollup
+
+def _event(created_at, price, quantity=100, region='Telangana', rice_type='Kalanamak'):
+    db.session.add(PriceEvent(listing_id=0, rice_type=rice_type, region=region, price_per_kg=price,
+                              quantity=quantity, event_type='listed', created_at=created_at))
+
+@pytest.fixture
+def events(app_context):
+    yield
+    PriceEvent.query.filter_by(rice_type='Kalanamak').delete()
+    DailyPriceRollup.query.filter_by(rice_type='Kalanamak').delete()
+    db.session.commit()
+
+def test_rollup_builds_daily_ohlc_bars(events):
+    _event(datetime(2026, 3, 1, 9), 50)
+    _event(datetime(2026, 3, 1, 11), 58)
+    _event(datetime(2026, 3, 1, 15), 47, region='Andhra Pradesh')
+    _event(datetime(2026, 3, 1, 17), 52)
+    _event(datetime(2026, 3, 2, 10), 55)
+    db.session.commit()
+
+    price_history.rollup(date(2026, 3, 1), date(2026, 3, 2))
+
+    bars = price_history.price_range('Kalanamak', date(2026, 3, 1), date(2026, 3, 2))
+    assert [(bar['open'], bar['high'], bar['low'], bar['close'], bar['volume']) for bar in bars] == [
+        (50, 58, 47, 52, 400),
+        (55, 55, 55, 55, 100),
+    ]
+    telangana = price_history.price_range('Kalanamak', date(2026, 3, 1), date(2026, 3, 1), region='Telangana')
+    assert (telangana[0]['low'], telangana[0]['close']) == (50, 52)
+
+def test_rollup_is_idempotent_and_picks_up_late_events(events):
+    _event(datetime(2026, 3, 1, 9), 50)
+    db.session.commit()
+    price_history.rollup(date(2026, 3, 1), date(2026, 3, 1))
+    _event(datetime(2026, 3, 1, 20), 61)
+    db.session.commit()
+    price_history.rollup(date(2026, 3, 1), date(2026, 3, 1))
+
+    bars = price_history.price_range('Kalanamak', date(2026, 3, 1), date(2026, 3, 1))
+    assert len(bars) == 1
+    assert (bars[0]['high'], bars[0]['close']) == (61, 61)
+
+def test_recent_closes_start_from_the_first_open(events):
+    for day, price in ((1, 40), (2, 42), (3, 45)):
+        _event(datetime(2026, 3, day, 12), price)
+    db.session.commit()
+    price_history.rollup(date(2026, 3, 1), date(2026, 3, 3))
+
+    closes = price_history.recent_closes(days=7, today=date(2026, 3, 3))['Kalanamak']
+    assert closes == [40, 40, 42, 45]
+    assert price_history.trend_from_closes(closes) == 'increasing'
+
+def test_listing_writes_append_price_events(make_seller, make_listing):
+    listing = make_listing(make_seller(17.9689, 79.5941, location='Warangal'), rice_type='Jasmine')
+    listing.price_per_kg = 70.0
+    db.session.commit()
+    listing.quantity = 5.0
+    db.session.commit()
+
+    events = PriceEvent.query.filter_by(listing_id=listing.id).order_by(PriceEvent.id).all()
+    assert [(event.event_type, event.price_per_kg, event.region) for event in events] == [
+        ('listed', 60.0, 'Telangana'),
+        ('repriced', 70.0, 'Telangana'),
+    ]
+
+@pytest.mark.parametrize('closes, trend', [
+    ([50, 51], 'stable'),
+    ([50, 45], 'decreasing'),
+    ([50], None),
+    (None, None),
+])
+def test_trend_from_closes(closes, trend):
+    assert price_history.trend_from_closes(closes) == trend
+
+def test_forecast_extends_the_least_squares_line():
+    assert price_history.forecast_from_closes([10, 12, 14, 16]) == [18, 20, 22]
+    assert price_history.forecast_from_closes([10]) is None
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+import ai_service
+import price_model
+from market_stats import market_summary
+from models import db, PriceEvent
+from price_model import PriceModel
+
+MODEL = PriceModel(
+    intercept=4.0,
+    coefficients={'rice_type=Basmati': 0.2, 'rice_type=Ponni': -0.3, 'region=Telangana': 0.05,
+                  'grade=A': 0.0, 'grade=B': -0.1, 'quantity=bulk': -0.05, 'season=kharif': 0.02},
+    residual_std=0.1,
+    report={'holdout_r2': 0.8},
+)
+
+def test_predictions_are_deterministic_and_batched():
+    items = [('Basmati', 2000, 'A', 'Telangana'), ('Ponni', 10, 'B', 'Kerala'), ('Unknown', 500, None, None)]
+    when = datetime(2026, 8, 1)
+
+    batch = MODEL.predict_many(items, when=when)
+    assert batch == [MODEL.predict(*item, when=when) for item in items]
+    assert batch == MODEL.predict_many(items, when=when)
+    assert batch[0]['predicted_price'] > batch[1]['predicted_price']
+    low, high = batch[0]['range']
+    assert low < batch[0]['predicted_price'] < high
+
+@pytest.mark.parametrize('quantity, band', [(10, 'small'), (50, 'standard'), (1000, 'bulk'), (5000, 'wholesale')])
+def test_quantity_bands(quantity, band):
+    assert price_model.quantity_band(quantity) == band
+
+def test_saved_models_are_loaded_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'model.json')
+    monkeypatch.setattr(price_model, '_loaded', {'model': None, 'mtime': None, 'checked': None})
+    assert price_model.get_model(path) is None
+
+    monkeypatch.setattr(price_model, '_loaded', {'model': None, 'mtime': None, 'checked': None})
+    price_model.save(MODEL, path)
+    loaded = price_model.get_model(path)
+    assert loaded.to_dict() == MODEL.to_dict()
+    assert price_model.get_model(path) is loaded
+
+def test_training_learns_relative_prices(app_context):
+    for i in range(40):
+        for rice_type, price in (('Premium Test', 90.0), ('Budget Test', 30.0)):
+            db.session.add(PriceEvent(listing_id=0, rice_type=rice_type, region='Telangana', quality_grade='A',
+                                      price_per_kg=price + i % 3, quantity=100, event_type='listed',
+                                      created_at=datetime(2026, 1 + i % 12, 1)))
+    db.session.flush()
+
+    model = price_model.train()
+    assert model.coefficients['rice_type=Premium Test'] > model.coefficients['rice_type=Budget Test']
+    assert 'holdout_mae' in model.report
+
+def test_predictions_fall_back_to_market_averages_without_a_model(app_context, monkeypatch):
+    monkeypatch.setattr(ai_service, 'get_model', lambda: None)
+    average = market_summary(['Basmati'])['Basmati']['average_price']
+
+    standard, bulk = ai_service.get_price_predictions([('Basmati', 500, None, None), ('Basmati', 6000, None, None)])
+    assert standard['predicted_price'] == round(average, 2)
+    assert bulk['predicted_price'] == round(average * 0.9, 2)
+    assert ai_service.get_price_prediction('Nonexistent', 500)['predicted_price'] == 50
+
+def test_predictions_use_the_trained_model(monkeypatch):
+    monkeypatch.setattr(ai_service, 'get_model', lambda: MODEL)
+    assert ai_service.get_price_prediction('Basmati', 2000, 'A', 'Telangana')['predicted_price'] == \
+        MODEL.predict('Basmati', 2000, 'A', 'Telangana')['predicted_price']
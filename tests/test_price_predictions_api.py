@@ -0,0 +1,50 @@
+import pytest
+
+import ai_service
+from conftest import BUYER_ID
+from price_model import PriceModel
+from routes import MAX_BATCH_PREDICTIONS
+
+MODEL = PriceModel(4.0, {'rice_type=Basmati': 0.2, 'rice_type=Ponni': -0.3, 'quantity=bulk': -0.05}, 0.1)
+
+@pytest.fixture
+def client(client_as, monkeypatch):
+    monkeypatch.setattr(ai_service, 'get_model', lambda: MODEL)
+    return client_as(BUYER_ID)
+
+def test_batch_matches_single_predictions(client):
+    items = [
+        {'rice_type': 'Basmati', 'quantity': 2000, 'grade': 'A', 'region': 'Telangana'},
+        {'rice_type': 'Ponni', 'quantity': '10'},
+    ]
+    response = client.post('/ai/api/price-predictions', json={'items': items})
+
+    assert response.status_code == 200
+    predictions = response.get_json()['predictions']
+    singles = [client.post('/ai/api/price-prediction', json=item).get_json() for item in items]
+    assert predictions == singles
+
+@pytest.mark.parametrize('item', [
+    {},
+    {'rice_type': ''},
+    {'rice_type': None, 'quantity': 10},
+    {'rice_type': 42},
+    {'rice_type': ['Basmati']},
+    {'rice_type': {'name': 'Basmati'}},
+    {'rice_type': 'Basmati', 'grade': ['A']},
+    {'rice_type': 'Basmati', 'region': {'state': 'Telangana'}},
+    {'rice_type': 'Basmati', 'quantity': 'lots'},
+    {'rice_type': 'Basmati', 'quantity': [1]},
+    'Basmati',
+    None,
+])
+def test_invalid_items_are_rejected_with_their_index(client, item):
+    response = client.post('/ai/api/price-predictions', json={'items': [{'rice_type': 'Basmati'}, item]})
+
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+
+@pytest.mark.parametrize('body', [{}, {'items': []}, {'items': 'Basmati'},
+                                  {'items': [{'rice_type': 'Basmati'}] * (MAX_BATCH_PREDICTIONS + 1)}])
+def test_invalid_batches_are_rejected(client, body):
+    assert client.post('/ai/api/price-predictions', json=body).status_code == 400
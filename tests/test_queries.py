@@ -0,0 +1,50 @@
+from conftest import BUYER_ID
+from models import db, RiceListing
+from queries import SELLER_CARD_COLUMNS, assert_max_queries, count_queries, listing_query
+
+def test_search_query_count_does_not_grow_with_results(client_as, make_seller, make_listing):
+    for offset in range(30):
+        make_listing(make_seller(17.385 + offset * 0.001, 78.4867), rice_type='Brown Rice')
+    client = client_as(BUYER_ID)
+    # Let the first request load the user and anything stale
+    client.get('/buyer/api/search', query_string={'page_size': 5})
+
+    # One query for the logged-in user, one for the page
+    for page_size in (5, 30):
+        with assert_max_queries(2):
+            response = client.get('/buyer/api/search', query_string={'page_size': page_size, 'rice_type': 'Brown Rice'})
+        assert len(response.get_json()['listings']) == page_size
+
+def test_find_farmers_query_count(client_as, make_seller, make_listing):
+    for offset in range(20):
+        make_listing(make_seller(17.385 + offset * 0.002, 78.4867), rice_type='Sona Masoori', quantity=800)
+    client = client_as(BUYER_ID)
+    payload = {'riceType': 'Sona Masoori', 'quantity': 100, 'k': 20}
+    client.post('/buyer/api/find-farmers', json=payload)
+
+    # User, then every listing found by the spatial index in one SELECT
+    with assert_max_queries(2):
+        response = client.post('/buyer/api/find-farmers', json=payload)
+    assert len(response.get_json()['farmers']) == 20
+
+def test_listing_to_dict_needs_only_the_seller_card(app_context, make_seller, make_listing):
+    for _ in range(5):
+        make_listing(make_seller(17.5, 78.5))
+    db.session.expire_all()
+
+    with count_queries() as statements:
+        listings = listing_query(seller_columns=SELLER_CARD_COLUMNS).limit(5).all()
+        payload = [listing.to_dict() for listing in listings]
+
+    assert len(statements) == 1
+    assert set(payload[0]['seller']) == {'id', 'full_name', 'location', 'latitude', 'longitude'}
+
+def test_assert_max_queries_reports_overruns(app_context):
+    try:
+        with assert_max_queries(1):
+            RiceListing.query.first()
+            RiceListing.query.first()
+    except AssertionError as e:
+        assert 'got 2' in str(e)
+    else:
+        raise AssertionError('expected the guard to fail')
@@ -0,0 +1,77 @@
+import sqlite3
+import time
+
+import pytest
+
+import response_cache as module
+from response_cache import ResponseCache
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'responses.db')
+
+def _last_used(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_used FROM response_cache").fetchone()[0]
+
+def test_repeat_prompts_are_served_from_memory_then_disk(path):
+    calls = []
+    generate = lambda: calls.append(1) or 'Basmati is ₹65/kg'
+    first = ResponseCache(path)
+    assert first.get_or_generate('price of  basmati?', generate, 'gemini') == 'Basmati is ₹65/kg'
+    assert first.get_or_generate('price of basmati?\n', generate, 'gemini') == 'Basmati is ₹65/kg'
+
+    # Another worker shares the disk tier
+    second = ResponseCache(path)
+    assert second.get_or_generate('price of basmati?', generate, 'gemini') == 'Basmati is ₹65/kg'
+    assert second.get_or_generate('price of basmati?', generate, 'other-model') == 'Basmati is ₹65/kg'
+    assert len(calls) == 2
+
+    assert first.stats()['memory_hits'] == 1
+    assert second.stats()['disk_hits'] == 1
+    assert second.stats()['disk_entries'] == 2
+
+def test_keys_change_with_the_market_version():
+    assert ResponseCache.key('prompt', 'gemini', 1) != ResponseCache.key('prompt', 'gemini', 2)
+
+def test_entries_expire(path, monkeypatch):
+    cache = ResponseCache(path, ttl=60)
+    cache.set('key', 'value')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get('key') == (False, None)
+    assert ResponseCache(path).get('key') == (False, None)
+
+def test_disk_hits_touch_last_used_at_most_once_per_interval(path, monkeypatch):
+    now = time.time()
+    clock = [now]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    ResponseCache(path).set('key', 'value')
+
+    clock[0] = now + module.TOUCH_INTERVAL_SECONDS / 2
+    assert ResponseCache(path).get('key') == (True, 'value')
+    assert _last_used(path) == now
+
+    clock[0] = now + module.TOUCH_INTERVAL_SECONDS + 1
+    assert ResponseCache(path).get('key') == (True, 'value')
+    assert _last_used(path) == clock[0]
+
+def test_disk_tier_evicts_least_recently_used(path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    cache = ResponseCache(path, ttl=10 ** 6, disk_max_entries=2)
+    for key in ('a', 'b'):
+        cache.set(key, key)
+        clock[0] += module.TOUCH_INTERVAL_SECONDS
+    ResponseCache(path).get('a')
+    cache.set('c', 'c')
+
+    assert ResponseCache(path).get('b') == (False, None)
+    assert ResponseCache(path).get('a') == (True, 'a')
+
+def test_storage_errors_are_not_raised(tmp_path):
+    # A directory cannot be opened as a database
+    cache = ResponseCache(str(tmp_path))
+    cache.set('key', 'value')
+    cache.clear()
+    assert cache.get('key') == (False, None)
@@ -0,0 +1,132 @@
+import base64
+import json
+import math
+
+import pytest
+
+from conftest import BUYER_ID
+from models import db, User, RiceListing
+from queries import count_queries
+from spatial_index import listing_index
+from utils import bounding_box, calculate_distance
+
+def _search(client, **params):
+    response = client.get('/buyer/api/search', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+def _all_pages(client, **params):
+    listings, cursor = [], None
+    while True:
+        page = _search(client, cursor=cursor, **params) if cursor else _search(client, **params)
+        listings.extend(page['listings'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return listings
+
+def test_bounding_box_encloses_the_circle():
+    for latitude in (0.0, 17.385, 45.0, 80.0):
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, 78.0, 100)
+        for step in range(360):
+            bearing = math.radians(step)
+            # Destination point 99.9 km away along the bearing
+            angular = 99.9 / 6371
+            lat1 = math.radians(latitude)
+            lat2 = math.asin(math.sin(lat1) * math.cos(angular) + math.cos(lat1) * math.sin(angular) * math.cos(bearing))
+            lng2 = math.radians(78.0) + math.atan2(
+                math.sin(bearing) * math.sin(angular) * math.cos(lat1),
+                math.cos(angular) - math.sin(lat1) * math.sin(lat2)
+            )
+            assert min_lat <= math.degrees(lat2) <= max_lat
+            assert min_lng <= math.degrees(lng2) <= max_lng
+
+@pytest.fixture
+def cold_index(monkeypatch):
+    """Listing index that needs a rebuild and never gets one in the background"""
+    rebuilds = []
+    monkeypatch.setattr(listing_index, '_rebuild_in_background', rebuilds.append)
+    listing_index.invalidate()
+    yield rebuilds
+    listing_index.invalidate()
+
+@pytest.mark.parametrize('cold', [False, True], ids=['index', 'sql'])
+def test_radius_search_matches_brute_force(request, cold, client_as, make_seller, make_listing):
+    if cold:
+        request.getfixturevalue('cold_index')
+    inside = make_seller(17.60, 78.50)    # ~24 km from the buyer
+    outside = make_seller(18.20, 78.50)   # ~90 km, inside a 100 km box only
+    near = make_listing(inside, rice_type='Ponni')
+    far = make_listing(outside, rice_type='Ponni')
+
+    found = _all_pages(client_as(BUYER_ID), max_distance=50, rice_type='Ponni')
+    ids = [listing['id'] for listing in found]
+
+    buyer = db.session.get(User, BUYER_ID)
+    expected = sorted(
+        listing.id for listing in RiceListing.query.filter_by(rice_type='Ponni', is_available=True)
+        if calculate_distance(buyer.latitude, buyer.longitude, listing.seller.latitude, listing.seller.longitude) <= 50
+    )
+    assert sorted(ids) == expected
+    assert near.id in ids and far.id not in ids
+    assert all(listing['distance'] <= 50 for listing in found)
+
+def test_cold_index_filters_sellers_by_bounding_box_in_sql(cold_index, app, client_as, make_seller, make_listing):
+    listing = make_listing(make_seller(17.40, 78.49), rice_type='Jasmine')
+
+    with count_queries(db.engine) as statements:
+        found = _search(client_as(BUYER_ID), max_distance=20, rice_type='Jasmine')
+
+    assert listing.id in [listing['id'] for listing in found['listings']]
+    assert any('latitude BETWEEN' in statement and 'longitude BETWEEN' in statement for statement in statements)
+    assert cold_index == [app]
+    assert not listing_index.is_warm()
+
+def test_cold_index_is_rebuilt_in_the_background(app, app_context):
+    listing_index.invalidate()
+    listing_index._rebuild_in_background(app)
+    listing_index._warmer.join(timeout=10)
+
+    assert listing_index.is_warm()
+
+def test_distance_pages_cover_every_result_once(client_as, make_seller, make_listing):
+    # Several listings per seller share a distance, so ids must break the ties
+    for offset in range(6):
+        seller = make_seller(17.385 + offset * 0.01, 78.4867)
+        for _ in range(3):
+            make_listing(seller, rice_type='Sona Masoori')
+    client = client_as(BUYER_ID)
+
+    everything = _search(client, rice_type='Sona Masoori', max_distance=50, page_size=100)['listings']
+    paged = _all_pages(client, rice_type='Sona Masoori', max_distance=50, page_size=4)
+
+    assert [listing['id'] for listing in paged] == [listing['id'] for listing in everything]
+    keys = [(listing['distance'], listing['id']) for listing in paged]
+    assert keys == sorted(keys)
+
+def test_price_pages_for_buyers_without_location(client_as, make_seller, make_listing):
+    seller = make_seller(17.5, 78.5)
+    for price in (40, 40, 41, 39):
+        make_listing(seller, rice_type='Jasmine', price_per_kg=price)
+    # No location text either, so the user is not queued for geocoding
+    buyer = User(full_name='Remote Buyer', mobile_number='7999999999', location='',
+                 password_hash='x', user_type='buyer')
+    db.session.add(buyer)
+    db.session.commit()
+
+    paged = _all_pages(client_as(buyer.id), rice_type='Jasmine', page_size=2)
+    keys = [(listing['price_per_kg'], listing['id']) for listing in paged]
+    assert keys == sorted(keys)
+    assert len(keys) == len(set(keys)) == RiceListing.query.filter_by(rice_type='Jasmine', is_available=True).count()
+
+@pytest.mark.parametrize('values', [[None, 1], [1], [1.0, 2, 3], ['a', 1], [1.5, 2.5], [True, 1], 'abc', {'a': 1}])
+def test_mismatched_cursor_is_rejected(client_as, values):
+    response = client_as(BUYER_ID).get('/buyer/api/search', query_string={'cursor': encode_cursor_raw(values)})
+    assert response.status_code == 400
+
+def test_malformed_cursor_is_rejected(client_as):
+    response = client_as(BUYER_ID).get('/buyer/api/search', query_string={'cursor': '!!not-base64!!'})
+    assert response.status_code == 400
+
+def encode_cursor_raw(values):
+    raw = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from snapshot_cache import SnapshotCache
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'snapshots.db')
+
+@pytest.fixture
+def compute():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'Basmati': len(calls)}
+    compute.calls = calls
+    return compute
+
+def test_snapshots_are_reused_until_the_version_changes(path, compute):
+    cache = SnapshotCache(path, ttl=60)
+    assert cache.get_or_compute('market_data', compute) == {'Basmati': 1}
+    assert cache.get_or_compute('market_data', compute) == {'Basmati': 1}
+
+    cache.bump()
+    assert cache.get_or_compute('market_data', compute) == {'Basmati': 2}
+    assert len(compute.calls) == 2
+
+def test_workers_share_snapshots_and_invalidation(path, compute):
+    first, second = SnapshotCache(path), SnapshotCache(path)
+    first.get_or_compute('market_data', compute)
+    assert second.get_or_compute('market_data', compute) == {'Basmati': 1}
+
+    second.bump()
+    assert first.get_or_compute('market_data', compute) == {'Basmati': 2}
+
+def test_snapshots_expire(path, compute, monkeypatch):
+    cache = SnapshotCache(path, ttl=60)
+    cache.get_or_compute('market_data', compute)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get_or_compute('market_data', compute) == {'Basmati': 2}
+
+def test_other_version_counters_do_not_invalidate(path, compute):
+    cache = SnapshotCache(path)
+    cache.get_or_compute('market_data', compute)
+    cache.bump('insights')
+    assert cache.get_or_compute('market_data', compute) == {'Basmati': 1}
+
+def test_empty_results_are_not_cached(path):
+    cache = SnapshotCache(path)
+    calls = []
+    assert cache.get_or_compute('market_data', lambda: calls.append(1) or {}) == {}
+    cache.get_or_compute('market_data', lambda: calls.append(1) or {})
+    assert len(calls) == 2
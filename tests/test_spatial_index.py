@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from models import db
+from spatial_index import GridIndex, ListingPoint, listing_index
+from utils import calculate_distance
+
+def _points(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        ListingPoint(i, i % 50, rng.uniform(8, 30), rng.uniform(70, 90), rng.choice(['Basmati', 'Ponni']), 100.0, 50.0)
+        for i in range(count)
+    ]
+
+@pytest.fixture
+def grid():
+    grid = GridIndex()
+    for point in _points(2000):
+        grid.insert(point.listing_id, point)
+    return grid
+
+def test_within_radius_matches_brute_force(grid):
+    origin = (17.385, 78.4867)
+    expected = sorted(
+        point.listing_id for point in _points(2000)
+        if calculate_distance(*origin, point.latitude, point.longitude) <= 150
+    )
+    found = grid.within_radius(*origin, 150)
+
+    assert sorted(point.listing_id for _, point in found) == expected
+    distances = [distance for distance, _ in found]
+    assert distances == sorted(distances)
+
+def test_nearest_matches_brute_force(grid):
+    origin = (12.9716, 77.5946)
+    by_distance = sorted(
+        (calculate_distance(*origin, point.latitude, point.longitude), point.listing_id)
+        for point in _points(2000) if point.rice_type == 'Ponni'
+    )
+    found = grid.nearest(*origin, 10, predicate=lambda point: point.rice_type == 'Ponni')
+
+    assert [point.listing_id for _, point in found] == [listing_id for _, listing_id in by_distance[:10]]
+
+def test_nearest_respects_max_distance(grid):
+    found = grid.nearest(17.385, 78.4867, 500, max_distance=150)
+    assert found
+    assert all(distance <= 150 for distance, _ in found)
+
+def test_insert_moves_and_remove_forgets_points():
+    grid = GridIndex()
+    grid.insert(1, ListingPoint(1, 1, 17.0, 78.0, 'Basmati', 1.0, 1.0))
+    grid.insert(1, ListingPoint(1, 1, 28.6, 77.2, 'Basmati', 1.0, 1.0))
+    assert len(grid) == 1
+    assert grid.within_radius(17.0, 78.0, 10) == []
+
+    grid.remove(1)
+    assert len(grid) == 0
+    assert grid.get(1) is None
+
+def test_listing_index_follows_commits(make_seller, make_listing):
+    seller = make_seller(26.9124, 75.7873, location='Jaipur, Rajasthan')
+    listing = make_listing(seller, rice_type='Jasmine')
+
+    nearby = {point.listing_id for _, point in listing_index.within_radius(26.9124, 75.7873, 5)}
+    assert listing.id in nearby
+
+    listing.is_available = False
+    db.session.commit()
+    nearby = {point.listing_id for _, point in listing_index.within_radius(26.9124, 75.7873, 5)}
+    assert listing.id not in nearby
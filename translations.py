@@ -157,6 +157,8 @@ TRANSLATIONS = {
         
         # Numbers and Counts
         'Found %(count)d listings': 'Found %(count)d listings',
+        'Next page': 'Next page',
+        'Older listings': 'Older listings',
         '1': '1',
         '2': '2',
         '3': '3',
@@ -351,6 +353,8 @@ TRANSLATIONS = {
         
         # Numbers and Counts
         'Found %(count)d listings': '%(count)d सूचियां मिलीं',
+        'Next page': 'अगला पृष्ठ',
+        'Older listings': 'पुरानी सूचियां',
         '1': '१',
         '2': '२',
         '3': '३',
@@ -545,6 +549,8 @@ TRANSLATIONS = {
         
         # Numbers and Counts
         'Found %(count)d listings': '%(count)d జాబితాలు కనుగొనబడ్డాయి',
+        'Next page': 'తదుపరి పేజీ',
+        'Older listings': 'పాత జాబితాలు',
         '1': '౧',
         '2': '౨',
         '3': '౩',
@@ -1,10 +1,26 @@
-import requests
 import math
-from typing import Tuple, Optional
+import numpy as np
+from typing import Tuple, Optional, Sequence
+
+import gazetteer
+from geocache import geocode_cache
+from http_client import http_client
+
+# Mean radius of the Earth in kilometers
+EARTH_RADIUS_KM = 6371
+
+# Total time allowed for one Nominatim call, in seconds
+NOMINATIM_DEADLINE = 10
+
+# Decimal places kept when caching reverse lookups (~110 m)
+REVERSE_GEOCODE_PRECISION = 3
 
 def geocode_location(location_text: str) -> Optional[Tuple[float, float]]:
     """
-    Geocode a location text to latitude and longitude using OpenStreetMap Nominatim API
+    Geocode a location text to latitude and longitude
+    
+    Known districts and towns are answered from the bundled gazetteer, then the
+    persistent cache, and only then the OpenStreetMap Nominatim API.
     
     Args:
         location_text: Address or location text to geocode
@@ -12,6 +28,11 @@ def geocode_location(location_text: str) -> Optional[Tuple[float, float]]:
     Returns:
         Tuple of (latitude, longitude) or None if geocoding fails
     """
+    hit, cached = lookup_cached_location(location_text)
+    if hit:
+        return cached
+    
+    key = gazetteer.normalize_place(location_text)
     try:
         # Use Nominatim API for geocoding
         url = "https://nominatim.openstreetmap.org/search"
@@ -22,27 +43,51 @@ def geocode_location(location_text: str) -> Optional[Tuple[float, float]]:
             'countrycodes': 'in'  # Restrict to India
         }
         
-        headers = {
-            'User-Agent': 'GreenBridge Rice Platform'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = http_client.get(url, params=params, deadline=NOMINATIM_DEADLINE)
         
         if response.status_code == 200:
             data = response.json()
-            if data:
-                return float(data[0]['lat']), float(data[0]['lon'])
+            result = (float(data[0]['lat']), float(data[0]['lon'])) if data else None
+            geocode_cache.set(f"search:{key}", list(result) if result else None)
+            return result
         
-        return None
+        # Service unavailable: settle for the closest known place, uncached
+        return gazetteer.lookup(key, strict=False)
         
     except Exception as e:
         print(f"Geocoding error: {e}")
-        return None
+        return gazetteer.lookup(key, strict=False)
+
+def lookup_cached_location(location_text: str) -> Tuple[bool, Optional[Tuple[float, float]]]:
+    """
+    Resolve a location from the gazetteer or geocode cache without any network call
+    
+    Args:
+        location_text: Address or location text to geocode
+        
+    Returns:
+        Tuple of (hit, coordinates); hit is False when only Nominatim can answer
+    """
+    key = gazetteer.normalize_place(location_text)
+    if not key:
+        return True, None
+    
+    place = gazetteer.lookup(key)
+    if place:
+        return True, place
+    
+    hit, cached = geocode_cache.get(f"search:{key}")
+    if hit:
+        return True, tuple(cached) if cached else None
+    return False, None
 
 def reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
     """
     Reverse geocode coordinates to get address
     
+    Results are cached on coordinates rounded to about 110 m. If Nominatim is
+    unreachable the nearest gazetteer town is returned instead.
+    
     Args:
         latitude: Latitude coordinate
         longitude: Longitude coordinate
@@ -50,6 +95,11 @@ def reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
     Returns:
         Address string or None if reverse geocoding fails
     """
+    key = "reverse:{:.{p}f},{:.{p}f}".format(latitude, longitude, p=REVERSE_GEOCODE_PRECISION)
+    hit, cached = geocode_cache.get(key)
+    if hit:
+        return cached or ''
+    
     try:
         url = "https://nominatim.openstreetmap.org/reverse"
         params = {
@@ -58,21 +108,19 @@ def reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
             'format': 'json'
         }
         
-        headers = {
-            'User-Agent': 'GreenBridge Rice Platform'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = http_client.get(url, params=params, deadline=NOMINATIM_DEADLINE)
         
         if response.status_code == 200:
             data = response.json()
-            return data.get('display_name', '')
+            address = data.get('display_name') or None
+            geocode_cache.set(key, address)
+            return address or ''
         
-        return None
+        return gazetteer.nearest(latitude, longitude)
         
     except Exception as e:
         print(f"Reverse geocoding error: {e}")
-        return None
+        return gazetteer.nearest(latitude, longitude)
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -94,10 +142,76 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
     c = 2 * math.asin(math.sqrt(a))
     
-    # Radius of Earth in kilometers
-    r = 6371
+    return c * EARTH_RADIUS_KM
+
+def batch_distances(origin_lat: float, origin_lng: float,
+                    latitudes: Sequence[float], longitudes: Sequence[float],
+                    max_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate great circle distances from one origin to many points in one pass
+    
+    Args:
+        origin_lat, origin_lng: Latitude and longitude of the origin
+        latitudes, longitudes: Coordinates of the destination points
+        max_distance: Optional radius in kilometers; points outside it are dropped
+        
+    Returns:
+        Tuple of (distances, indices) sorted by distance, where indices point
+        back into the destination arrays
+    """
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lngs = np.asarray(longitudes, dtype=np.float64)
+    indices = np.arange(lats.shape[0])
+    
+    # Cheap bounding-box prefilter before any trigonometry
+    if max_distance is not None:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(origin_lat, origin_lng, max_distance)
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+        lats, lngs, indices = lats[inside], lngs[inside], indices[inside]
+    
+    # Haversine formula, vectorized
+    lat1 = math.radians(origin_lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lngs) - math.radians(origin_lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    distances = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0))) * EARTH_RADIUS_KM
+    
+    if max_distance is not None:
+        within = distances <= max_distance
+        distances, indices = distances[within], indices[within]
     
-    return c * r
+    order = np.argsort(distances, kind='stable')
+    return distances[order], indices[order]
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Get the latitude/longitude box that encloses a circle around a point
+
+    Args:
+        latitude, longitude: Centre of the circle
+        radius_km: Radius of the circle in kilometers
+
+    Returns:
+        Tuple of (min_lat, max_lat, min_lng, max_lng)
+    """
+    # Angular radius on the same sphere used by calculate_distance
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angular_radius)
+
+    # Longitude span widens with latitude; fall back to the full circle near the poles
+    ratio = math.sin(angular_radius) / math.cos(math.radians(latitude))
+    if angular_radius >= math.pi / 2 or ratio >= 1:
+        lng_delta = 180.0
+    else:
+        lng_delta = math.degrees(math.asin(ratio))
+
+    return (
+        max(latitude - lat_delta, -90.0),
+        min(latitude + lat_delta, 90.0),
+        longitude - lng_delta,
+        longitude + lng_delta
+    )
 
 def format_price(price: float) -> str:
     """